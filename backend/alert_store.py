@@ -0,0 +1,267 @@
+# --- Bounded, Indexed Safety-Alert Store ---
+# Every alert gets a monotonically increasing id, so dashboards poll with
+# ?since=<last id seen> and only ever receive new alerts. Alerts are kept in id
+# order in one list plus per-tourist and per-type lists, each searched by
+# bisection, so a page costs O(log n + page size) however many alerts are
+# stored. At most `capacity` alerts are retained; the oldest are dropped.
+#
+# Repeats of the same (type, tourist) alert within its coalescing window (SOS
+# presses, anomaly flags) don't add entries: the stored alert's count goes up
+# and it is re-issued under a new id, so pollers see it again exactly once.
+#
+# Not thread-safe on its own; TouristStateStore calls it under its alerts lock.
+#
+# Run this file directly for a correctness and polling-cost check.
+
+from bisect import bisect_left, bisect_right
+
+from log_buffer import to_epoch_us, to_iso
+
+ALERT_CAPACITY = 10000
+COALESCE_SECONDS = {"sos": 60.0, "anomaly": 300.0}  # alert types not listed are never coalesced
+
+
+class _IdList:
+    """Alerts in id order. Removed ones leave a None behind until the list is compacted."""
+
+    def __init__(self):
+        self.ids = []
+        self.alerts = []
+        self.head = 0  # first slot that may still hold an alert
+        self.live = 0
+
+    def __len__(self):
+        return self.live
+
+    def append(self, alert):
+        self.ids.append(alert["id"])
+        self.alerts.append(alert)
+        self.live += 1
+
+    def discard(self, alert_id):
+        i = bisect_left(self.ids, alert_id)
+        if i < len(self.ids) and self.ids[i] == alert_id and self.alerts[i] is not None:
+            self.alerts[i] = None
+            self.live -= 1
+            while self.head < len(self.alerts) and self.alerts[self.head] is None:
+                self.head += 1
+            # Compacting once the holes outnumber the alerts keeps removal amortized O(1)
+            if len(self.ids) > 2 * self.live + 64:
+                kept = [(i, a) for i, a in zip(self.ids, self.alerts) if a is not None]
+                self.ids = [i for i, _ in kept]
+                self.alerts = [a for _, a in kept]
+                self.head = 0
+
+    def oldest(self):
+        return self.alerts[self.head] if self.live else None
+
+    def after(self, since=None):
+        """Alerts with an id greater than `since`, oldest first."""
+        start = self.head if since is None else bisect_right(self.ids, since, self.head)
+        for i in range(start, len(self.alerts)):
+            if self.alerts[i] is not None:
+                yield self.alerts[i]
+
+
+class AlertStore:
+    """Safety alerts with ids, tourist/type indexes, coalescing and capped retention."""
+
+    def __init__(self, capacity=ALERT_CAPACITY, coalesce_seconds=COALESCE_SECONDS):
+        self.capacity = capacity
+        self.coalesce_seconds = dict(coalesce_seconds)
+        self.next_id = 1  # never reset, so cursors stay valid across clears
+        self.clear()
+
+    def __len__(self):
+        return len(self._all)
+
+    def clear(self):
+        self._all = _IdList()
+        self._by_tourist = {}
+        self._by_type = {}
+        self._latest = {}  # (type, tourist_id) -> (stored alert, epoch µs of its latest occurrence)
+
+    def add(self, alert_type, tourist_id, message, at_us, details=None):
+        """Store an alert, or coalesce it into a recent one of the same type and tourist. Returns it.
+
+        `details` (e.g. the nearest responders of an SOS) are extra fields of the alert.
+        """
+        key = (alert_type, tourist_id)
+        window = self.coalesce_seconds.get(alert_type)
+        previous, last_us = self._latest.get(key, (None, None))
+        if previous is not None and at_us - last_us <= window * 1_000_000:
+            self._remove(previous)
+            alert = dict(previous, count=previous["count"] + 1, last_timestamp=to_iso(at_us), message=message)
+        else:
+            alert = {
+                "message": message,
+                "timestamp": to_iso(at_us),
+                "type": alert_type,
+                "tourist_id": tourist_id,
+                "count": 1,
+                "last_timestamp": to_iso(at_us),
+            }
+        if details:
+            alert.update(details)
+        alert["id"] = self.next_id
+        self.next_id += 1
+        self._insert(alert)
+        if window is not None:
+            self._latest[key] = (alert, at_us)
+        while len(self._all) > self.capacity:
+            self._remove(self._all.oldest())
+        return alert
+
+    def _insert(self, alert):
+        self._all.append(alert)
+        self._by_tourist.setdefault(alert["tourist_id"], _IdList()).append(alert)
+        self._by_type.setdefault(alert["type"], _IdList()).append(alert)
+
+    def _remove(self, alert):
+        self._all.discard(alert["id"])
+        for index, key in ((self._by_tourist, alert["tourist_id"]), (self._by_type, alert["type"])):
+            alerts = index[key]
+            alerts.discard(alert["id"])
+            if not alerts:
+                del index[key]
+        # Removal goes oldest first within a key, so losing the latest means nothing is left to coalesce into
+        key = (alert["type"], alert["tourist_id"])
+        if self._latest.get(key, (None,))[0] is alert:
+            del self._latest[key]
+
+    # --- Reads ---
+    def _select(self, since=None, tourist_id=None, alert_type=None):
+        if tourist_id is not None:
+            alerts = self._by_tourist.get(tourist_id, _IdList()).after(since)
+            if alert_type is not None:
+                alerts = (a for a in alerts if a["type"] == alert_type)
+        elif alert_type is not None:
+            alerts = self._by_type.get(alert_type, _IdList()).after(since)
+        else:
+            alerts = self._all.after(since)
+        return alerts
+
+    def query(self, since=None, limit=None, tourist_id=None, alert_type=None):
+        """Copies of the alerts after id `since`, oldest first, optionally filtered."""
+        page = []
+        for alert in self._select(since, tourist_id, alert_type):
+            if limit is not None and len(page) >= limit:
+                break
+            page.append(dict(alert))
+        return page
+
+    def remove(self, tourist_id=None, alert_type=None, up_to=None):
+        """Drop the matching alerts (all when no filter is given). Returns how many were dropped."""
+        if tourist_id is None and alert_type is None and up_to is None:
+            removed = len(self._all)
+            self.clear()
+            return removed
+        matching = []
+        for alert in self._select(tourist_id=tourist_id, alert_type=alert_type):
+            if up_to is not None and alert["id"] > up_to:
+                break
+            matching.append(alert)
+        for alert in matching:
+            self._remove(alert)
+        return len(matching)
+
+    # --- Snapshots ---
+    def export(self):
+        return {"alerts": self.query(), "next_id": self.next_id}
+
+    def load(self, alerts, next_id=None):
+        """Replace the contents with exported alerts (older snapshots have no ids or counts)."""
+        self.clear()
+        for alert in alerts:
+            alert = dict(alert)
+            alert.setdefault("count", 1)
+            alert.setdefault("last_timestamp", alert["timestamp"])
+            if "id" not in alert:
+                alert["id"] = self.next_id
+            self.next_id = max(self.next_id, alert["id"] + 1)
+            self._insert(alert)
+            if alert["type"] in self.coalesce_seconds:
+                self._latest[(alert["type"], alert["tourist_id"])] = (alert, to_epoch_us(alert["last_timestamp"]))
+        if next_id is not None:
+            self.next_id = max(self.next_id, int(next_id))
+
+
+# --- Correctness and Polling-Cost Check ---
+# Random adds, coalescing repeats and filtered removals against a plain-list
+# model, then the cost of an incremental poll versus returning everything.
+if __name__ == "__main__":
+    import json
+    import random
+    import time
+
+    rng = random.Random(11)
+    CAPACITY = 2000
+    store = AlertStore(capacity=CAPACITY)
+    model, latest, next_id = [], {}, 1  # model: alerts in id order; latest: key -> (alert, at_us)
+    tourists = [f"t{i}" for i in range(300)]
+    types = ["sos", "anomaly", "geofence_enter", "drop_off"]
+    at_us = 1_700_000_000_000_000
+    failures = []
+
+    for step in range(60000):
+        at_us += rng.randrange(0, 2_000_000)
+        roll = rng.random()
+        if roll < 0.97:
+            alert_type, tourist_id = rng.choice(types), rng.choice(tourists)
+            key = (alert_type, tourist_id)
+            window = COALESCE_SECONDS.get(alert_type)
+            previous = latest.get(key)
+            if window is not None and previous is not None and previous[0] in model \
+                    and at_us - previous[1] <= window * 1_000_000:
+                model.remove(previous[0])
+                alert = dict(previous[0], count=previous[0]["count"] + 1, last_timestamp=to_iso(at_us))
+            else:
+                alert = {"message": "m", "timestamp": to_iso(at_us), "type": alert_type,
+                         "tourist_id": tourist_id, "count": 1, "last_timestamp": to_iso(at_us)}
+            alert["id"] = next_id
+            next_id += 1
+            model.append(alert)
+            latest[key] = (alert, at_us)
+            del model[:max(0, len(model) - CAPACITY)]
+            store.add(alert_type, tourist_id, "m", at_us)
+        elif roll < 0.985:
+            tourist_id = rng.choice(tourists)
+            model = [a for a in model if a["tourist_id"] != tourist_id]
+            store.remove(tourist_id=tourist_id)
+        elif roll < 0.99:
+            up_to = next_id - rng.randrange(1, 3000)
+            model = [a for a in model if a["id"] > up_to]
+            store.remove(up_to=up_to)
+        else:
+            since = rng.choice([None, next_id - rng.randrange(1, 5000)])
+            tourist_id = rng.choice([None, rng.choice(tourists)])
+            alert_type = rng.choice([None, rng.choice(types)])
+            limit = rng.choice([None, 50])
+            expected = [a for a in model if (since is None or a["id"] > since)
+                        and (tourist_id is None or a["tourist_id"] == tourist_id)
+                        and (alert_type is None or a["type"] == alert_type)][:limit]
+            if store.query(since, limit, tourist_id, alert_type) != expected:
+                failures.append(step)
+    if store.query() != model:
+        failures.append("final")
+
+    # Polling: a dashboard that has seen everything asks for what is new
+    store = AlertStore()
+    for i in range(ALERT_CAPACITY):
+        store.add("geofence_enter", f"t{i % 500}", "Entered a zone.", at_us + i)
+    cursor = store.next_id - 1
+    runs = 1000
+    t0 = time.perf_counter()
+    for _ in range(runs):
+        json.dumps(store.query())
+    full = (time.perf_counter() - t0) / runs
+    t0 = time.perf_counter()
+    for _ in range(runs):
+        json.dumps(store.query(since=cursor - 5))
+    incremental = (time.perf_counter() - t0) / runs
+    print(f"{len(store)} alerts stored: full list {full * 1e3:.2f} ms, poll for 5 new {incremental * 1e6:.0f} us")
+
+    if failures:
+        print(f"❌ Alert store differs from the list model at steps {failures[:5]}")
+    else:
+        print("✅ Alert store matches the list model (ids, coalescing, filters, retention).")
@@ -2,112 +2,267 @@
 # Save this file as app.py
 
 # 1. Import Libraries
-import flask
+import os
+import time
 from flask import Flask, request, jsonify
-import xgboost as xgb
-import pickle
 import pandas as pd
-import numpy as np
-
-# --- 2. Define Feature Engineering Functions ---
-# These must be identical to the ones used for training.
-def haversine(lat1, lon1, lat2, lon2):
-    R = 6371
-    dLat = np.radians(lat2 - lat1); dLon = np.radians(lon2 - lon1)
-    a = np.sin(dLat / 2)**2 + np.cos(np.radians(lat1)) * np.cos(np.radians(lat2)) * np.sin(dLon / 2)**2
-    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
-    return R * c
-
-def calculate_path_features(df):
-    # Ensure timestamp is in datetime format
-    df['timestamp_dt'] = pd.to_datetime(df['timestamp'])
-    df = df.sort_values(['tourist_id', 'timestamp_dt'])
-
-    # Calculate speed and other features
-    df['time_delta'] = df.groupby('tourist_id')['timestamp_dt'].diff().dt.total_seconds().fillna(0)
-    df['lat_prev'] = df.groupby('tourist_id')['lat'].shift(1)
-    df['lon_prev'] = df.groupby('tourist_id')['lon'].shift(1)
-    df['distance'] = haversine(df['lat_prev'], df['lon_prev'], df['lat'], df['lon']).fillna(0)
-    df['speed'] = (df['distance'] / (df['time_delta'] / 3600)).fillna(0)
-    df.replace([np.inf, -np.inf], 0, inplace=True)
-    df['speed'].fillna(0, inplace=True)
-
-    # Aggregate features for the entire path
-    agg_features = df.groupby('tourist_id').agg(
-        mean_speed=('speed', 'mean'),
-        std_speed=('speed', 'std'),
-        max_speed=('speed', 'max'),
-        total_distance=('distance', 'sum'),
-        total_duration_seconds=('time_delta', 'sum'),
-        num_points=('lat', 'count')
-    ).reset_index()
-    return agg_features
+
+# --- 2. Feature Engineering Functions ---
+# Defined in features.py so the offline tools can share them with the server.
+from features import calculate_path_features, features_from_arrays, features_from_records, FeatureStateStore, PathFeatureState, STATE_CAPACITY, STATE_IDLE_SECONDS
+from batching import MicroBatcher
+from inference import load_backend
+from window_features import WindowFeatureState, WINDOW_FEATURE_COLUMNS
+from wire_format import read_payload, frames_to_arrays, is_path_frame
+from metrics import Metrics
+from prefork import PreforkServer, is_draining
+
+# Prometheus-style /metrics with route latencies and /predict stage timers
+# (metrics.py); METRICS=0 turns it off. PROFILER=1 adds /debug/profile.
+metrics = Metrics("predict", enabled=os.environ.get("METRICS", "1") == "1")
+
+# Streaming mode keeps per-tourist running aggregates instead of rebuilding
+# features from the whole path on every call. Clients can also opt in per
+# request with "stream": true.
+STREAM_FEATURES = os.environ.get("STREAM_FEATURES", "0") == "1"
+
+# With WINDOW_FEATURES=1 the per-tourist state also keeps rolling 1/5/15-minute
+# windows (window_features.py), and /predict returns them as "window_features"
+# next to the model's verdict. The model itself still scores the six aggregates.
+WINDOW_FEATURES = os.environ.get("WINDOW_FEATURES", "0") == "1"
+# Per-tourist state is dropped after FEATURE_STATE_IDLE_SECONDS without a call,
+# and beyond FEATURE_STATE_CAPACITY tourists the least recently seen go first.
+feature_states = FeatureStateStore(
+    WindowFeatureState if WINDOW_FEATURES else PathFeatureState,
+    capacity=int(os.environ.get("FEATURE_STATE_CAPACITY", STATE_CAPACITY)),
+    idle_seconds=float(os.environ.get("FEATURE_STATE_IDLE_SECONDS", STATE_IDLE_SECONDS)),
+)
+
+# Feature engine for full paths: "pandas" (the training pipeline) or "numpy"
+# (the segment kernel in features.py, same output without the DataFrame overhead).
+FEATURE_ENGINE = os.environ.get("FEATURE_ENGINE", "pandas")
+
+def engineer_features(points):
+    """Path features for a list of point dicts with the configured engine."""
+    if FEATURE_ENGINE == "numpy":
+        with metrics.stage("features"):
+            return features_from_records(points)
+    with metrics.stage("dataframe"):
+        df = pd.DataFrame(points)
+    with metrics.stage("features"):
+        return calculate_path_features(df)
+
+def engineer_features_from_frames(frames):
+    """Path features for decoded binary path frames (wire_format.py), straight from their columns."""
+    with metrics.stage("dataframe"):
+        tourist_ids, lat, lon, timestamps = frames_to_arrays(frames)
+        if FEATURE_ENGINE != "numpy":
+            df = pd.DataFrame({'tourist_id': tourist_ids, 'lat': lat, 'lon': lon, 'timestamp': timestamps})
+    with metrics.stage("features"):
+        if FEATURE_ENGINE == "numpy":
+            return features_from_arrays(tourist_ids, lat, lon, timestamps)
+        return calculate_path_features(df)
 
 # --- 3. Load the Saved Model and Scaler ---
-# These are loaded only once when the server starts up.
-print("Loading model and scaler...")
-try:
-    model = xgb.XGBClassifier()
-    model.load_model("final_tuned_xgboost_model.json")
-
-    with open('final_scaler.pkl', 'rb') as f:
-        scaler = pickle.load(f)
-
-    print("✅ Model and scaler loaded successfully.")
-except Exception as e:
-    print(f"❌ Error loading model or scaler: {e}")
-    model = None
-    scaler = None
-
-# --- 4. Initialize the Flask App ---
+# These are loaded only once when the server starts up, behind the inference
+# backend picked by INFERENCE_BACKEND (see inference.py): "sklearn" (the
+# training pipeline), "booster" (folded scaler + Booster.inplace_predict) or
+# "compiled" (folded scaler + NumPy tree walk). INFERENCE_THREADS sets the
+# booster's thread count; one dummy row is scored at startup to warm it up.
+# MODEL_FILE / SCALER_FILE pick the files; the pre-fork server reloads them
+# on SIGHUP.
+INFERENCE_BACKEND = os.environ.get("INFERENCE_BACKEND", "sklearn")
+INFERENCE_THREADS = int(os.environ.get("INFERENCE_THREADS", "1"))
+MODEL_FILE = os.environ.get("MODEL_FILE", "final_tuned_xgboost_model.json")
+SCALER_FILE = os.environ.get("SCALER_FILE", "final_scaler.pkl")
+
+inference = None
+model = None
+scaler = None
+model_loaded_at = None
+
+def load_model():
+    """(Re)load the model and scaler. On failure the current ones stay in place; returns success."""
+    global inference, model, scaler, model_loaded_at
+    print("Loading model and scaler...")
+    try:
+        backend = load_backend(
+            INFERENCE_BACKEND,
+            MODEL_FILE,
+            SCALER_FILE,
+            nthread=INFERENCE_THREADS,
+            warmup=os.environ.get("INFERENCE_WARMUP", "1") == "1",
+        )
+    except Exception as e:
+        print(f"❌ Error loading model or scaler: {e}")
+        return False
+    inference, model, scaler = backend, backend.model, backend.scaler
+    model_loaded_at = time.time()
+    print(f"✅ Model and scaler loaded successfully ({INFERENCE_BACKEND} backend).")
+    return True
+
+load_model()
+
+# --- 4. Scoring ---
+def score_features(features_df):
+    """Scale and score any number of feature rows with one scaler and one booster call."""
+    # Anomaly probabilities; the class is the same 0.5 cut XGBClassifier.predict uses
+    with metrics.stage("scaling"):
+        prepared = inference.prepare(features_df)
+    with metrics.stage("inference"):
+        anomaly = inference.predict(prepared)
+    normal = 1.0 - anomaly
+
+    results = []
+    for tourist_id, p_normal, p_anomaly in zip(features_df['tourist_id'], normal, anomaly):
+        results.append({
+            'tourist_id': tourist_id,
+            'is_anomaly': bool(p_anomaly > 0.5),
+            'confidence_normal': f"{p_normal:.2f}",
+            'confidence_anomaly': f"{p_anomaly:.2f}"
+        })
+    return results
+
+# Micro-batching: with MICRO_BATCH_MS > 0, concurrent /predict calls arriving
+# within that window are scored together in one booster call.
+MICRO_BATCH_MS = float(os.environ.get("MICRO_BATCH_MS", "0"))
+micro_batcher = MicroBatcher(score_features, window_ms=MICRO_BATCH_MS) if MICRO_BATCH_MS > 0 else None
+
+# --- 5. Initialize the Flask App ---
 app = Flask(__name__)
+metrics.instrument(app, profiler=os.environ.get("PROFILER", "0") == "1")
+metrics.gauge("feature_states", "Tourists with streaming feature state.", lambda: len(feature_states))
 
-# --- 5. Define the Prediction Endpoint ---
+# --- 6. Define the Prediction Endpoints ---
 @app.route("/predict", methods=['POST'])
 def predict():
     if not model or not scaler:
         return jsonify({"error": "Model not loaded. Check server logs."}), 500
 
-    # Get the JSON data sent from the client
-    data = request.get_json()
+    # Get the JSON data (or binary path frame) sent from the client
+    framed = is_path_frame(request.content_type)
+    try:
+        data = read_payload(request)
+    except ValueError as e:
+        return jsonify({"error": f"Invalid path frame: {e}"}), 400
     if not data or 'path' not in data:
         return jsonify({"error": "Invalid input: 'path' key is missing."}), 400
 
-    # Convert the incoming data into a DataFrame
-    path_df = pd.DataFrame(data['path'])
+    if not data['path']:
+        return jsonify({"error": "Invalid input: 'path' is empty."}), 400
+    if framed and data['path'].timestamp_ms is None:
+        return jsonify({"error": "Invalid input: path frame has no timestamps."}), 400
 
     # --- Processing Pipeline ---
     # 1. Engineer features from the raw path data
-    features_df = calculate_path_features(path_df)
+    stream = data.get('stream', STREAM_FEATURES)
+    if stream or WINDOW_FEATURES:
+        # Only the points newer than the last call are processed
+        tourist_id = data.get('tourist_id') or data['path'][0]['tourist_id']
+        with metrics.stage("stream_features"):
+            state_df = feature_states.update(tourist_id, data['path'])
+    if stream:
+        features_df = state_df
+    elif framed:
+        features_df = engineer_features_from_frames(data['frames'][:1])
+    else:
+        features_df = engineer_features(data['path'])
 
-    # 2. Prepare features for prediction
-    features_to_predict = features_df.drop(['tourist_id'], axis=1, errors='ignore')
-    features_to_predict.fillna(0, inplace=True)
+    # 2. Scale and score (together with other waiting requests when micro-batching)
+    if micro_batcher:
+        results = micro_batcher.submit(features_df)
+    else:
+        results = score_features(features_df)
 
-    # 3. Scale the features using the loaded scaler
-    scaled_features = scaler.transform(features_to_predict)
+    # --- Create the JSON Response ---
+    response = results[0]
+    if WINDOW_FEATURES:
+        window_row = state_df.iloc[0]
+        response['window_features'] = {column: float(window_row[column]) for column in WINDOW_FEATURE_COLUMNS}
+    return jsonify(response)
 
-    # 4. Make a prediction and get probabilities
-    prediction = model.predict(scaled_features)[0]
-    probability = model.predict_proba(scaled_features)[0]
+@app.route("/predict_batch", methods=['POST'])
+def predict_batch():
+    """Score many tourists at once.
 
-    # --- Create the JSON Response ---
-    is_anomaly = bool(prediction == 1)
-    response = {
-        'tourist_id': path_df['tourist_id'].iloc[0],
-        'is_anomaly': is_anomaly,
-        'confidence_normal': f"{probability[0]:.2f}",
-        'confidence_anomaly': f"{probability[1]:.2f}"
-    }
+    Accepts {"paths": {tourist_id: [points]}}, a flat "path" list whose points
+    each carry a tourist_id, or binary path frames (one per tourist). Returns
+    one result per tourist.
+    """
+    if not model or not scaler:
+        return jsonify({"error": "Model not loaded. Check server logs."}), 500
 
-    return jsonify(response)
+    framed = is_path_frame(request.content_type)
+    try:
+        data = read_payload(request)
+    except ValueError as e:
+        return jsonify({"error": f"Invalid path frame: {e}"}), 400
+    if not data or ('paths' not in data and 'path' not in data):
+        return jsonify({"error": "Invalid input: 'paths' key is missing."}), 400
+
+    if framed:
+        # Binary frames: one per tourist, features straight from the decoded columns
+        frames = [frame for frame in data['frames'] if len(frame)]
+        if any(frame.timestamp_ms is None for frame in frames):
+            return jsonify({"error": "Invalid input: path frame has no timestamps."}), 400
+        if not frames:
+            return jsonify({"results": []})
+        return jsonify({"results": score_features(engineer_features_from_frames(frames))})
 
-# --- 6. Define a simple Homepage ---
+    if 'paths' in data:
+        rows = [
+            {**point, 'tourist_id': tourist_id}
+            for tourist_id, points in data['paths'].items()
+            for point in points
+        ]
+    else:
+        rows = data['path']
+
+    if not rows:
+        return jsonify({"results": []})
+
+    # One vectorized feature pass, one scaler call and one booster call for all tourists
+    features_df = engineer_features(rows)
+    return jsonify({"results": score_features(features_df)})
+
+# --- 7. Define a simple Homepage ---
 @app.route("/")
 def home():
     return "<h1>Smart Tourist Safety - AI Server is Running!</h1>"
 
-# --- 7. Run the App ---
+@app.route("/ready")
+def ready():
+    """Readiness probe: 200 once the model is loaded, 503 while it is missing or this worker is draining."""
+    status = {
+        "model_loaded": model is not None,
+        "model_file": MODEL_FILE,
+        "model_loaded_at": model_loaded_at,
+        "pid": os.getpid(),
+    }
+    if model is None or is_draining():
+        return jsonify({**status, "ready": False}), 503
+    return jsonify({**status, "ready": True})
+
+# --- 8. Run the App ---
+# WORKERS > 1 serves from a pre-fork pool (prefork.py): the model loaded above
+# is shared by all workers, each worker's booster gets cores // WORKERS threads
+# (PIN_CPUS=1 also binds it to those cores), and SIGHUP to the parent reloads
+# MODEL_FILE without dropping requests.
+WORKERS = int(os.environ.get("WORKERS", "1"))
+PORT = int(os.environ.get("PORT", "5000"))
+
+def start_worker(index, threads):
+    """Runs in each forked worker: size the booster's thread pool and restart the micro-batcher thread."""
+    global micro_batcher
+    if inference is not None:
+        inference.set_threads(threads)
+    if micro_batcher:
+        micro_batcher = MicroBatcher(score_features, window_ms=MICRO_BATCH_MS)
+
 if __name__ == "__main__":
     # Use host='0.0.0.0' to make the server accessible on your local network
-    app.run(host='0.0.0.0', port=5000)
+    if WORKERS > 1:
+        PreforkServer(app, '0.0.0.0', PORT, WORKERS, on_worker_start=start_worker, on_reload=load_model,
+                      pin_cpus=os.environ.get("PIN_CPUS", "0") == "1").serve()
+    else:
+        app.run(host='0.0.0.0', port=PORT)
@@ -0,0 +1,41 @@
+# --- Asynchronous Inference Runner ---
+# Prediction jobs run as coroutines on a private asyncio loop in a background
+# thread, so the request thread can answer 202 straight away instead of
+# holding a worker for the whole inference latency. Results are written back
+# through the state store (status and alerts), not the HTTP response.
+
+import asyncio
+import threading
+
+MAX_PENDING = 10000  # jobs accepted but not finished; beyond this submit() refuses
+
+
+class AsyncInferenceRunner:
+    """Bounded asyncio job runner living on its own thread."""
+
+    def __init__(self, max_pending=MAX_PENDING):
+        self.max_pending = max_pending
+        self.pending = 0
+        self._lock = threading.Lock()
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="async-inference", daemon=True)
+        self._thread.start()
+
+    def submit(self, coro):
+        """Schedule a coroutine. Returns False (and drops it) when too many jobs are pending."""
+        with self._lock:
+            if self.pending >= self.max_pending:
+                coro.close()
+                return False
+            self.pending += 1
+        asyncio.run_coroutine_threadsafe(self._run(coro), self.loop)
+        return True
+
+    async def _run(self, coro):
+        try:
+            await coro
+        except Exception as e:
+            print(f"❌ Inference job failed: {e}")
+        finally:
+            with self._lock:
+                self.pending -= 1
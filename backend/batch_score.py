@@ -0,0 +1,169 @@
+# --- Parallel Offline Batch Scoring ---
+# Re-scores whole trajectory files without the HTTP server. The input (a CSV
+# shaped like simulation_paths.csv, or Parquet with the same columns) is read
+# in chunks of about --chunk-rows rows, cut only at tourist boundaries, so
+# every tourist is scored once from its complete path. Chunks go to a pool of
+# worker processes, each of which loads the scaler and XGBoost model once
+# and runs calculate_path_features (or the NumPy kernel) and the model on its
+# chunk. At most two chunks per worker are in flight and results are written
+# in input order as they come back, so memory stays bounded by the chunk
+# size however large the file is.
+#
+# Rows of one tourist must be contiguous (as in simulation_paths.csv);
+# a tourist that shows up again after its rows were scored is an error.
+#
+#   python batch_score.py simulation_paths.csv --out scores.csv
+#   python batch_score.py day.parquet --workers 8 --engine numpy --backend booster
+
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from features import calculate_path_features, calculate_path_features_numpy
+from inference import BACKENDS, MODEL_FILE, SCALER_FILE, load_backend
+
+CHUNK_ROWS = 200_000
+INPUT_COLUMNS = ['tourist_id', 'lat', 'lon', 'timestamp']
+LABEL_COLUMN = 'path_type'  # carried into the output when the input has it
+
+
+# --- Reading ---
+def _read_batches(path, chunk_rows, columns):
+    """DataFrames of about chunk_rows rows each, in file order."""
+    if path.endswith('.parquet'):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("❌ Reading Parquet needs pyarrow (pip install pyarrow).")
+        parquet = pq.ParquetFile(path)
+        names = [c for c in columns if c in parquet.schema_arrow.names]
+        for batch in parquet.iter_batches(batch_size=chunk_rows, columns=names):
+            yield batch.to_pandas()
+    else:
+        header = pd.read_csv(path, nrows=0).columns
+        names = [c for c in columns if c in header]
+        # Timestamps stay strings here; workers parse them in parallel
+        yield from pd.read_csv(path, usecols=names, dtype={'tourist_id': str, 'timestamp': str},
+                               chunksize=chunk_rows)
+
+
+def tourist_chunks(path, chunk_rows=CHUNK_ROWS):
+    """Chunks that never split a tourist: each chunk's last tourist is held back until its rows end."""
+    carry = None
+    finished = set()
+    for batch in _read_batches(path, chunk_rows, INPUT_COLUMNS + [LABEL_COLUMN]):
+        if carry is not None:
+            batch = pd.concat([carry, batch], ignore_index=True)
+        ids = batch['tourist_id'].to_numpy()
+        # The last tourist may continue in the next batch
+        cut = len(ids) - np.argmax(ids[::-1] != ids[-1]) if (ids != ids[-1]).any() else 0
+        chunk, carry = batch.iloc[:cut], batch.iloc[cut:]
+        if len(chunk):
+            starts = np.flatnonzero(np.r_[True, ids[1:cut] != ids[:cut - 1]])
+            tourists = ids[starts]
+            if len(set(tourists)) != len(tourists) or finished.intersection(tourists):
+                raise ValueError("Input rows are not grouped by tourist_id; sort the file by tourist first.")
+            finished.update(tourists)
+            yield chunk
+    if carry is not None and len(carry):
+        if carry['tourist_id'].iloc[0] in finished:
+            raise ValueError("Input rows are not grouped by tourist_id; sort the file by tourist first.")
+        yield carry
+
+
+# --- Worker Side ---
+_backend = None
+_engine = None
+
+
+def _init_worker(backend_name, model_path, scaler_path, engine):
+    global _backend, _engine
+    _backend = load_backend(backend_name, model_path, scaler_path, nthread=1)
+    _engine = engine
+
+
+def score_chunk(chunk):
+    """Feature engineering and scoring of one tourist-aligned chunk. Returns the output rows."""
+    if _engine == 'numpy':
+        features_df = calculate_path_features_numpy(chunk)
+    else:
+        features_df = calculate_path_features(chunk[INPUT_COLUMNS].copy())
+    anomaly = _backend.predict_anomaly(features_df)
+
+    counts = chunk.groupby('tourist_id', sort=False).size()
+    result = pd.DataFrame({
+        'tourist_id': features_df['tourist_id'].to_numpy(),
+        'is_anomaly': anomaly > 0.5,
+        'confidence_normal': 1.0 - anomaly,
+        'confidence_anomaly': anomaly,
+    })
+    result.insert(1, 'num_points', counts.reindex(result['tourist_id']).to_numpy())
+    if LABEL_COLUMN in chunk:
+        labels = chunk.groupby('tourist_id', sort=False)[LABEL_COLUMN].first()
+        result[LABEL_COLUMN] = labels.reindex(result['tourist_id']).to_numpy()
+    return result, len(chunk)
+
+
+# --- Driver ---
+def score_file(path, out, workers=None, chunk_rows=CHUNK_ROWS, backend='sklearn', engine='pandas',
+               model_path=MODEL_FILE, scaler_path=SCALER_FILE):
+    """Score every tourist in `path` and write one CSV row per tourist to `out`.
+
+    Returns (rows, tourists, correct); correct counts predictions matching path_type, None without labels.
+    """
+    workers = workers or os.cpu_count() or 1
+    rows = tourists = 0
+    correct = None
+    pending = deque()
+    header = True
+    with ProcessPoolExecutor(workers, initializer=_init_worker,
+                             initargs=(backend, model_path, scaler_path, engine)) as pool:
+        def write_oldest():
+            nonlocal rows, tourists, correct, header
+            result, n = pending.popleft().result()
+            if LABEL_COLUMN in result:
+                correct = (correct or 0) + int((result['is_anomaly'] == (result[LABEL_COLUMN] == 'anomaly')).sum())
+            result.to_csv(out, index=False, header=header, float_format='%.6f')
+            header = False
+            rows += n
+            tourists += len(result)
+
+        for chunk in tourist_chunks(path, chunk_rows):
+            pending.append(pool.submit(score_chunk, chunk))
+            # Bounded in-flight work: two chunks per worker
+            if len(pending) >= 2 * workers:
+                write_oldest()
+        while pending:
+            write_oldest()
+    return rows, tourists, correct
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Score every tourist of a trajectory file with the XGBoost model")
+    parser.add_argument('input', nargs='?', default='simulation_paths.csv', help="CSV or .parquet")
+    parser.add_argument('--out', default='-', help="output CSV (default: stdout)")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    parser.add_argument('--backend', choices=BACKENDS, default='sklearn')
+    parser.add_argument('--engine', choices=('pandas', 'numpy'), default='pandas',
+                        help="calculate_path_features (pandas) or the NumPy segment kernel")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.out == '-':
+        rows, tourists, correct = score_file(args.input, sys.stdout, args.workers, args.chunk_rows, args.backend, args.engine)
+    else:
+        with open(args.out, 'w', newline='') as f:
+            rows, tourists, correct = score_file(args.input, f, args.workers, args.chunk_rows, args.backend, args.engine)
+    elapsed = time.perf_counter() - start
+    print(f"✅ Scored {tourists} tourists ({rows} rows) in {elapsed:.2f}s: "
+          f"{rows / elapsed:,.0f} rows/s with {args.workers or os.cpu_count()} workers.", file=sys.stderr)
+    if correct is not None:
+        print(f"ℹ️ {correct}/{tourists} predictions match the path_type labels.", file=sys.stderr)
@@ -0,0 +1,65 @@
+# --- Micro-Batching for Model Inference ---
+# Concurrent /predict calls each score a single row. The batcher holds them for a
+# few milliseconds, scores all the waiting rows with one scaler/booster call and
+# hands every caller back its own result.
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import pandas as pd
+
+
+class MicroBatcher:
+    """Groups feature rows from concurrent requests into one scoring call."""
+
+    def __init__(self, score_fn, window_ms=5, max_batch=256):
+        # score_fn takes a features DataFrame and returns one result per row
+        self.score_fn = score_fn
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, features_df, timeout=None):
+        """Queue the rows of features_df and block until their results are ready."""
+        future = Future()
+        self._queue.put((features_df, future))
+        return future.result(timeout=timeout)
+
+    def _collect(self):
+        # Block for the first request, then keep gathering until the window closes
+        batch = [self._queue.get()]
+        rows = len(batch[0][0])
+        deadline = time.monotonic() + self.window
+        while rows < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(item)
+            rows += len(item[0])
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                frames = pd.concat([features_df for features_df, _ in batch], ignore_index=True)
+                results = self.score_fn(frames)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            # Hand each caller back the slice of results for its own rows
+            start = 0
+            for features_df, future in batch:
+                end = start + len(features_df)
+                future.set_result(results[start:end])
+                start = end
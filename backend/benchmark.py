@@ -0,0 +1,380 @@
+# --- Latency and Throughput Benchmark ---
+# Replays the tourists in simulation_paths.csv against app.py or
+# mock_api_server.py, either in-process through Flask's test client or over
+# HTTP against a running server, and reports latency percentiles and
+# requests per second per endpoint.
+#
+# Examples:
+#   python benchmark.py --server app
+#   python benchmark.py --server mock --speedup 60 --concurrency 30
+#   python benchmark.py --server app --url http://127.0.0.1:5000 --out run.json
+#   python benchmark.py --server app --compare run.json
+#   PREDICT_MODE=async python benchmark.py --server mock --capacity 100,200,400,800
+
+import argparse
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from path_store import PathStore
+
+SIMULATION_FILE = 'simulation_paths.csv'
+
+
+# --- Targets ---
+class TestClientTarget:
+    """Calls the Flask app in-process; one test client per thread."""
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self._local = threading.local()
+
+    def _client(self):
+        if not hasattr(self._local, 'client'):
+            self._local.client = self.flask_app.test_client()
+        return self._local.client
+
+    def get(self, url):
+        return self._client().get(url).status_code
+
+    def post(self, url, payload):
+        return self._client().post(url, json=payload).status_code
+
+
+class HttpTarget:
+    """Calls a running server; one keep-alive session per thread."""
+
+    def __init__(self, base_url):
+        import requests
+        self.requests = requests
+        self.base_url = base_url.rstrip('/')
+        self._local = threading.local()
+
+    def _session(self):
+        if not hasattr(self._local, 'session'):
+            self._local.session = self.requests.Session()
+        return self._local.session
+
+    def get(self, url):
+        return self._session().get(self.base_url + url).status_code
+
+    def post(self, url, payload):
+        return self._session().post(self.base_url + url, json=payload).status_code
+
+
+# --- Recording ---
+class LatencyRecorder:
+    """Thread-safe per-endpoint latency samples."""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def timed(self, endpoint, call, *args):
+        start = time.perf_counter()
+        try:
+            ok = call(*args) < 400
+        except Exception:
+            ok = False
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.samples[endpoint].append(elapsed)
+            if not ok:
+                self.errors[endpoint] += 1
+
+    def summary(self, wall_seconds):
+        report = {}
+        for endpoint, samples in sorted(self.samples.items()):
+            ms = np.array(samples) * 1000
+            report[endpoint] = {
+                'count': len(samples),
+                'errors': self.errors[endpoint],
+                'mean_ms': float(ms.mean()),
+                'p50_ms': float(np.percentile(ms, 50)),
+                'p95_ms': float(np.percentile(ms, 95)),
+                'p99_ms': float(np.percentile(ms, 99)),
+                'rps': len(samples) / wall_seconds,
+            }
+        return report
+
+
+# --- Replay ---
+def load_paths(max_points):
+    path_store = PathStore.load(SIMULATION_FILE)
+    paths = {}
+    for tourist_id in path_store.tourist_ids:
+        points = path_store.records(tourist_id)
+        timestamps = path_store.path(tourist_id).timestamp
+        if max_points:
+            points = points[:max_points]
+            timestamps = timestamps[:max_points]
+        paths[tourist_id] = {
+            'path_type': path_store.path_type(tourist_id),
+            'points': points,
+            'offsets': ((timestamps - timestamps[0]) / 1e6).tolist(),
+        }
+    return paths
+
+def replay_tourist(target, recorder, server, tourist_id, path, speedup):
+    """Send one tourist's path point by point, like the mobile app simulator does."""
+    if server == 'mock':
+        recorder.timed('/get_path', target.get, f"/get_path?id={tourist_id}")
+
+    start = time.perf_counter()
+    points = path['points']
+    for i, point in enumerate(points):
+        if speedup:
+            delay = start + path['offsets'][i] / speedup - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+        if server == 'mock':
+            recorder.timed('/update_location', target.post, '/update_location',
+                           {'tourist_id': tourist_id, 'lat': point['lat'], 'lon': point['lon'],
+                            'path_type': path['path_type']})
+            chunk = [{'lat': p['lat'], 'lon': p['lon']} for p in points[:i + 1]]
+            recorder.timed('/predict', target.post, '/predict',
+                           {'tourist_id': tourist_id, 'path_type': path['path_type'], 'path': chunk})
+        else:
+            recorder.timed('/predict', target.post, '/predict',
+                           {'tourist_id': tourist_id, 'path': points[:i + 1]})
+
+def poll_dashboard(target, recorder, stop, interval):
+    """Poll the dashboard endpoints the way live_dashbord.html does."""
+    while not stop.is_set():
+        recorder.timed('/get_live_statuses', target.get, '/get_live_statuses')
+        recorder.timed('/get_heatmap_data', target.get, '/get_heatmap_data')
+        stop.wait(interval)
+
+def run_load(target, server, paths, speedup, concurrency, poll_interval):
+    recorder = LatencyRecorder()
+    stop = threading.Event()
+    pollers = []
+    if server == 'mock':
+        target.get('/reset_simulation')
+        pollers = [threading.Thread(target=poll_dashboard, args=(target, recorder, stop, poll_interval), daemon=True)]
+    for poller in pollers:
+        poller.start()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(replay_tourist, target, recorder, server, tourist_id, path, speedup)
+                   for tourist_id, path in paths.items()]
+        for future in futures:
+            future.result()
+    wall_seconds = time.perf_counter() - start
+
+    stop.set()
+    for poller in pollers:
+        poller.join()
+    return recorder.summary(wall_seconds), wall_seconds
+
+
+# --- Pipeline Stage Breakdown ---
+def stage_breakdown(paths):
+    """Time feature engineering, scaling and the booster separately for every /predict payload (configured inference backend)."""
+    import app
+
+    timings = defaultdict(list)
+    for path in paths.values():
+        points = path['points']
+        for i in range(len(points)):
+            t0 = time.perf_counter()
+            features_df = app.engineer_features(points[:i + 1])
+            t1 = time.perf_counter()
+            prepared = app.inference.prepare(features_df)
+            t2 = time.perf_counter()
+            app.inference.predict(prepared)
+            t3 = time.perf_counter()
+            timings['feature_engineering'].append(t1 - t0)
+            timings['scaling'].append(t2 - t1)
+            timings['booster'].append(t3 - t2)
+
+    report = {}
+    for stage, samples in timings.items():
+        ms = np.array(samples) * 1000
+        report[stage] = {
+            'mean_ms': float(ms.mean()),
+            'p50_ms': float(np.percentile(ms, 50)),
+            'p95_ms': float(np.percentile(ms, 95)),
+            'total_s': float(ms.sum() / 1000),
+        }
+    return report
+
+
+# --- Capacity at a Fixed Tick Rate ---
+# Every tourist ticks once per `tick` seconds (update_location + predict, like
+# the simulator). Ticks are executed by a fixed pool of `workers` threads: with
+# the test client the handlers run on those threads, so the pool stands in for
+# the server's worker pool. A tourist count is "held" while the p95 time from a
+# tick's due time to its completion stays under one tick.
+def run_tick(target, server, tourist_id, path, step):
+    points = path['points']
+    count = min(step + 1, len(points))
+    point = points[count - 1]
+    ok = True
+    if server == 'mock':
+        ok &= target.post('/update_location', {'tourist_id': tourist_id, 'lat': point['lat'], 'lon': point['lon'],
+                                               'path_type': path['path_type']}) < 400
+        chunk = [{'lat': p['lat'], 'lon': p['lon']} for p in points[:count]]
+        ok &= target.post('/predict', {'tourist_id': tourist_id, 'path_type': path['path_type'], 'path': chunk}) < 400
+    else:
+        ok &= target.post('/predict', {'tourist_id': tourist_id, 'path': points[:count]}) < 400
+    return ok
+
+def measure_capacity(target, server, paths, tourists, tick, duration, workers):
+    # Tourists beyond the dataset reuse its paths under new ids (the mock server
+    # only tracks the dataset ids, but every request still does the same work)
+    base = list(paths.items())
+    fleet = [(tourist_id if i < len(base) else f"{tourist_id}_{i // len(base)}", path)
+             for i, (tourist_id, path) in ((i, base[i % len(base)]) for i in range(tourists))]
+    if server == 'mock':
+        target.get('/reset_simulation')
+        for tourist_id, _ in base[:tourists]:
+            target.get(f"/get_path?id={tourist_id}")
+
+    lateness = []
+    errors = 0
+    lock = threading.Lock()
+
+    def job(tourist_id, path, step, due):
+        nonlocal errors
+        try:
+            ok = run_tick(target, server, tourist_id, path, step)
+        except Exception:
+            ok = False
+        with lock:
+            lateness.append(time.perf_counter() - due)
+            errors += not ok
+
+    start = time.perf_counter() + 0.05
+    steps = int(duration / tick)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for step in range(steps):
+            for i, (tourist_id, path) in enumerate(fleet):
+                # Spread each round of ticks evenly over the tick interval
+                due = start + (step + i / len(fleet)) * tick
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                pool.submit(job, tourist_id, path, step, due)
+    wall_seconds = time.perf_counter() - start
+
+    ms = np.array(lateness) * 1000
+    p95 = float(np.percentile(ms, 95))
+    return {
+        'tourists': tourists,
+        'ticks': len(lateness),
+        'errors': errors,
+        'p50_ms': float(np.percentile(ms, 50)),
+        'p95_ms': p95,
+        'ticks_per_s': len(lateness) / wall_seconds,
+        'held': p95 <= tick * 1000 and errors == 0,
+    }
+
+def run_capacity(target, server, paths, counts, tick, duration, workers):
+    print(f"\n{'tourists':>9}{'ticks':>8}{'err':>6}{'p50 ms':>10}{'p95 ms':>10}{'ticks/s':>10}  held")
+    results = []
+    for tourists in counts:
+        stats = measure_capacity(target, server, paths, tourists, tick, duration, workers)
+        results.append(stats)
+        print(f"{stats['tourists']:>9}{stats['ticks']:>8}{stats['errors']:>6}{stats['p50_ms']:>10.1f}"
+              f"{stats['p95_ms']:>10.1f}{stats['ticks_per_s']:>10.1f}  {'✅' if stats['held'] else '❌'}")
+    held = [stats['tourists'] for stats in results if stats['held']]
+    print(f"\nMax tourists held at one tick per {tick}s with {workers} workers: {max(held) if held else 0}")
+    return results
+
+
+# --- Reporting ---
+def print_report(results, baseline=None):
+    print(f"\n{'endpoint':<22}{'count':>7}{'err':>5}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}")
+    for endpoint, stats in results['endpoints'].items():
+        line = (f"{endpoint:<22}{stats['count']:>7}{stats['errors']:>5}{stats['p50_ms']:>10.2f}"
+                f"{stats['p95_ms']:>10.2f}{stats['p99_ms']:>10.2f}{stats['rps']:>10.1f}")
+        old = baseline and baseline['endpoints'].get(endpoint)
+        if old:
+            change = (stats['p95_ms'] - old['p95_ms']) / old['p95_ms'] * 100
+            line += f"   p95 {change:+.1f}% vs baseline"
+        print(line)
+
+    if results.get('stages'):
+        print(f"\n{'/predict stage':<22}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+        for stage, stats in results['stages'].items():
+            print(f"{stage:<22}{stats['mean_ms']:>10.3f}{stats['p50_ms']:>10.3f}{stats['p95_ms']:>10.3f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark app.py / mock_api_server.py endpoints.")
+    parser.add_argument('--server', choices=['app', 'mock'], default='app', help="which server's endpoints to drive")
+    parser.add_argument('--url', help="base URL of a running server (default: in-process test client)")
+    parser.add_argument('--speedup', type=float, default=0,
+                        help="replay speed relative to the CSV timestamps (0 = as fast as possible)")
+    parser.add_argument('--concurrency', type=int, default=8, help="tourists replayed in parallel")
+    parser.add_argument('--tourists', type=int, default=0, help="limit the number of tourists (0 = all)")
+    parser.add_argument('--max-points', type=int, default=60, help="points replayed per tourist (0 = all)")
+    parser.add_argument('--poll-interval', type=float, default=2.0, help="dashboard poll interval in seconds")
+    parser.add_argument('--no-stages', action='store_true', help="skip the /predict stage breakdown")
+    parser.add_argument('--capacity', help="comma-separated tourist counts: measure how many can be held at --tick")
+    parser.add_argument('--tick', type=float, default=1.5, help="seconds between ticks per tourist (capacity mode)")
+    parser.add_argument('--duration', type=float, default=15, help="seconds to run each tourist count (capacity mode)")
+    parser.add_argument('--workers', type=int, default=16, help="worker threads executing ticks (capacity mode)")
+    parser.add_argument('--out', help="write the results as JSON to this file")
+    parser.add_argument('--compare', help="earlier results JSON to compare against")
+    args = parser.parse_args()
+
+    paths = load_paths(args.max_points)
+    if args.tourists:
+        paths = dict(list(paths.items())[:args.tourists])
+
+    if args.url:
+        target = HttpTarget(args.url)
+    elif args.server == 'app':
+        import app
+        target = TestClientTarget(app.app)
+    else:
+        os.environ["STATE_DIR"] = ""  # synthetic traffic must not reach a journaled state directory
+        import mock_api_server
+        target = TestClientTarget(mock_api_server.app)
+
+    if args.capacity:
+        counts = [int(count) for count in args.capacity.split(',')]
+        print(f"Measuring capacity against {args.url or args.server + ' (test client)'}...")
+        results = {
+            'config': vars(args),
+            'capacity': run_capacity(target, args.server, paths, counts, args.tick, args.duration, args.workers),
+        }
+        if args.out:
+            with open(args.out, 'w') as f:
+                json.dump(results, f, indent=2)
+            print(f"\n✅ Results saved to '{args.out}'.")
+        return
+
+    print(f"Replaying {len(paths)} tourists against {args.url or args.server + ' (test client)'}...")
+    endpoints, wall_seconds = run_load(target, args.server, paths, args.speedup, args.concurrency, args.poll_interval)
+
+    results = {
+        'config': vars(args),
+        'wall_seconds': wall_seconds,
+        'endpoints': endpoints,
+        'stages': None if args.no_stages or args.server != 'app' else stage_breakdown(paths),
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(results, baseline)
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✅ Results saved to '{args.out}'.")
+
+
+if __name__ == "__main__":
+    main()
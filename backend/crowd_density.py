@@ -0,0 +1,352 @@
+# --- Sliding-Window Crowd Density and Overcrowding Alerts ---
+# The heatmap counts every log point ever written, with no notion of time.
+# This monitor counts *distinct tourists* per grid cell (zoom DENSITY_ZOOM,
+# about 150 m) over sliding windows such as the last 5 and 30 minutes.
+#
+# Each cell keeps one distinct-count sketch per BUCKET_SECONDS time bucket,
+# covering only the longest window. A window's count is the union of the
+# sketches of its buckets, so windows slide by dropping whole buckets. A
+# sketch is an exact set of 64-bit tourist hashes while it is small
+# (SPARSE_LIMIT). Past that it becomes HyperLogLog registers: 2^PRECISION
+# bytes, about 3% standard error, merged by element-wise max. Cells that
+# saw nobody during the longest window are dropped, least recently touched
+# first, so memory follows the active cells and not the points seen.
+#
+# When a cell's count in ALERT_WINDOW reaches its capacity, an
+# "overcrowding" alert is raised with the cell's centre and count. The cell
+# can alert again once its count has fallen below CLEAR_RATIO * capacity.
+# The background sweep checks for that and expires idle cells.
+#
+# Run this file directly for a sketch accuracy check, a sliding-window check
+# against exact counts and memory/throughput figures.
+
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from heatmap_index import cell_size
+
+DENSITY_ZOOM = 14  # cell edge ~0.0014 degrees, ~150 m
+BUCKET_SECONDS = 60
+WINDOWS = (300, 1800)
+ALERT_WINDOW = 300
+CROWD_CAPACITY = 50  # distinct tourists per cell within ALERT_WINDOW
+CLEAR_RATIO = 0.8
+SWEEP_SECONDS = 5.0
+
+PRECISION = 10
+REGISTERS = 1 << PRECISION
+SPARSE_LIMIT = 64
+_RANK_BITS = 64 - PRECISION
+_ALPHA = 0.7213 / (1 + 1.079 / REGISTERS)
+
+OVERCROWDING_ALERT_MESSAGE = "About {count} tourists within {minutes:g} min in the area around {lat:.4f}, {lon:.4f} (capacity {capacity})."
+
+
+def tourist_hash(tourist_id):
+    """Stable 64-bit hash (Python's hash() of a str changes per process)."""
+    return int.from_bytes(hashlib.blake2b(str(tourist_id).encode(), digest_size=8).digest(), 'little')
+
+
+def _registers(hashes):
+    """HyperLogLog registers of many hashes at once."""
+    values = np.fromiter(hashes, dtype=np.uint64, count=len(hashes))
+    index = (values >> np.uint64(_RANK_BITS)).astype(np.int64)
+    rest = values & np.uint64((1 << _RANK_BITS) - 1)
+    # rank = leading zeros in the remaining bits + 1; bit_length via float log2, then corrected for rounding
+    bits = np.zeros(len(values), dtype=np.int64)
+    nonzero = rest > 0
+    bits[nonzero] = np.floor(np.log2(rest[nonzero].astype(np.float64))).astype(np.int64) + 1
+    too_long = nonzero & (np.left_shift(np.uint64(1), np.maximum(bits - 1, 0).astype(np.uint64)) > rest)
+    bits[too_long] -= 1
+    registers = np.zeros(REGISTERS, dtype=np.uint8)
+    np.maximum.at(registers, index, (_RANK_BITS - bits + 1).astype(np.uint8))
+    return registers
+
+
+def estimate(registers):
+    """HyperLogLog cardinality estimate, with linear counting for small counts."""
+    raw = _ALPHA * REGISTERS * REGISTERS / float(np.sum(np.ldexp(1.0, -registers.astype(np.int64))))
+    zeros = int(np.count_nonzero(registers == 0))
+    if raw <= 2.5 * REGISTERS and zeros:
+        return REGISTERS * math.log(REGISTERS / zeros)
+    return raw
+
+
+class DistinctSketch:
+    """Distinct tourists seen in one cell during one time bucket."""
+
+    __slots__ = ('hashes', 'registers')
+
+    def __init__(self):
+        self.hashes = set()
+        self.registers = None
+
+    def add(self, h):
+        """Count a tourist hash. Returns whether the sketch changed."""
+        if self.registers is None:
+            if h in self.hashes:
+                return False
+            self.hashes.add(h)
+            if len(self.hashes) > SPARSE_LIMIT:
+                self.registers = _registers(self.hashes)
+                self.hashes = None
+            return True
+        index = h >> _RANK_BITS
+        rank = _RANK_BITS - (h & ((1 << _RANK_BITS) - 1)).bit_length() + 1
+        if rank <= self.registers[index]:
+            return False
+        self.registers[index] = rank
+        return True
+
+    def nbytes(self):
+        return self.registers.nbytes if self.registers is not None else 8 * len(self.hashes)
+
+
+def union_count(sketches):
+    """Distinct tourists across sketches: exact while all are small sets, estimated otherwise."""
+    dense = [sketch.registers for sketch in sketches if sketch.registers is not None]
+    sparse = set().union(*(sketch.hashes for sketch in sketches if sketch.registers is None))
+    if not dense:
+        return len(sparse)
+    merged = np.maximum.reduce(dense) if len(dense) > 1 else dense[0].copy()
+    if sparse:
+        np.maximum(merged, _registers(sparse), out=merged)
+    return estimate(merged)
+
+
+class _Cell:
+    __slots__ = ('buckets', 'last')
+
+    def __init__(self):
+        self.buckets = {}  # bucket number -> DistinctSketch
+        self.last = None  # newest bucket with a report
+
+
+class CrowdMonitor:
+    """Distinct tourists per grid cell over sliding windows, with overcrowding alerts."""
+
+    def __init__(self, state=None, capacity=CROWD_CAPACITY, windows=WINDOWS, alert_window=ALERT_WINDOW,
+                 bucket_seconds=BUCKET_SECONDS, zoom=DENSITY_ZOOM, clear_ratio=CLEAR_RATIO, clock=time.time):
+        self.state = state
+        self.capacity = capacity
+        self.windows = tuple(sorted(set(windows) | {alert_window}))
+        self.alert_window = alert_window
+        self.bucket_seconds = bucket_seconds
+        self.horizon = math.ceil(max(self.windows) / bucket_seconds)  # buckets kept per cell
+        self.cell_degrees = cell_size(zoom)
+        self.clear_ratio = clear_ratio
+        self.clock = clock
+        self.cells = OrderedDict()  # (ix, iy) -> _Cell, least recently reported first
+        self.crowded = {}  # (ix, iy) -> count when the alert was raised
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _cell(self, lat, lon):
+        return int((lon + 180.0) // self.cell_degrees), int((lat + 90.0) // self.cell_degrees)
+
+    def center(self, key):
+        ix, iy = key
+        return (iy + 0.5) * self.cell_degrees - 90.0, (ix + 0.5) * self.cell_degrees - 180.0
+
+    def _count(self, cell, bucket, window):
+        first = bucket - math.ceil(window / self.bucket_seconds)
+        return union_count([sketch for b, sketch in cell.buckets.items() if b > first])
+
+    def _expire(self, bucket):
+        """Drop cells with no report in the longest window (the oldest are first in line)."""
+        oldest = bucket - self.horizon
+        while self.cells:
+            key, cell = next(iter(self.cells.items()))
+            if cell.last > oldest:
+                break
+            del self.cells[key]
+            self.crowded.pop(key, None)
+
+    def observe(self, tourist_id, lat, lon, at=None):
+        """Count a report. Raises (and returns) an overcrowding alert when the cell reaches capacity."""
+        if lat is None or lon is None:
+            return None
+        at = self.clock() if at is None else at
+        bucket = int(at // self.bucket_seconds)
+        key = self._cell(lat, lon)
+        h = tourist_hash(tourist_id)
+        with self._lock:
+            self._expire(bucket)
+            cell = self.cells.get(key)
+            if cell is None:
+                cell = self.cells[key] = _Cell()
+            else:
+                self.cells.move_to_end(key)
+            cell.last = bucket if cell.last is None else max(cell.last, bucket)
+            sketch = cell.buckets.get(bucket)
+            if sketch is None:
+                sketch = cell.buckets[bucket] = DistinctSketch()
+                for old in [b for b in cell.buckets if b <= bucket - self.horizon]:
+                    del cell.buckets[old]
+            # The count only moves when this bucket gained a tourist
+            if not sketch.add(h) or key in self.crowded:
+                return None
+            count = round(self._count(cell, bucket, self.alert_window))
+            if count < self.capacity:
+                return None
+            self.crowded[key] = count
+        lat, lon = self.center(key)
+        details = {"lat": lat, "lon": lon, "crowd_count": count, "capacity": self.capacity,
+                   "window_seconds": self.alert_window}
+        message = OVERCROWDING_ALERT_MESSAGE.format(count=count, minutes=self.alert_window / 60, lat=lat, lon=lon,
+                                                    capacity=self.capacity)
+        if self.state is not None:
+            self.state.add_alert("overcrowding", None, message, details=details)
+        return {"message": message, **details}
+
+    def sweep(self, at=None):
+        """Expire idle cells and re-arm crowded cells that have thinned out. Returns the cells re-armed."""
+        at = self.clock() if at is None else at
+        bucket = int(at // self.bucket_seconds)
+        rearmed = []
+        with self._lock:
+            self._expire(bucket)
+            for key in list(self.crowded):
+                if self._count(self.cells[key], bucket, self.alert_window) < self.capacity * self.clear_ratio:
+                    del self.crowded[key]
+                    rearmed.append(key)
+        return rearmed
+
+    # --- Reads ---
+    def density(self, window=None, bbox=None, min_count=1, at=None):
+        """Cells with at least min_count distinct tourists in the window, busiest first.
+
+        bbox is (south, west, north, east) as returned by heatmap_index.parse_bbox.
+        """
+        window = window or self.windows[0]
+        at = self.clock() if at is None else at
+        bucket = int(at // self.bucket_seconds)
+        cells = []
+        with self._lock:
+            self._expire(bucket)
+            for key, cell in self.cells.items():
+                lat, lon = self.center(key)
+                if bbox and not (bbox[0] <= lat <= bbox[2] and bbox[1] <= lon <= bbox[3]):
+                    continue
+                count = round(self._count(cell, bucket, window))
+                if count >= min_count:
+                    cells.append({"lat": lat, "lon": lon, "count": count, "crowded": key in self.crowded})
+        cells.sort(key=lambda cell: -cell["count"])
+        return cells
+
+    def stats(self):
+        with self._lock:
+            sketches = [sketch for cell in self.cells.values() for sketch in cell.buckets.values()]
+            return {
+                "cells": len(self.cells),
+                "sketches": len(sketches),
+                "dense_sketches": sum(sketch.registers is not None for sketch in sketches),
+                "sketch_bytes": sum(sketch.nbytes() for sketch in sketches),
+                "crowded_cells": len(self.crowded),
+            }
+
+    def reset(self):
+        with self._lock:
+            self.cells.clear()
+            self.crowded.clear()
+
+    # --- Background Thread ---
+    def start(self, interval=SWEEP_SECONDS):
+        self._thread = threading.Thread(target=self._run, args=(interval,), name="crowd-monitor", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"❌ Crowd density sweep failed: {e}")
+
+
+# --- Accuracy, Window and Memory Check ---
+if __name__ == "__main__":
+    import random
+
+    rng = random.Random(11)
+
+    # 1. Sketch accuracy at a range of cardinalities (several buckets merged, like a window)
+    worst = 0.0
+    for n in (10, 64, 65, 200, 1000, 5000, 50000):
+        sketches = [DistinctSketch() for _ in range(5)]
+        for i in range(n):
+            for _ in range(3):  # every tourist reports in several buckets
+                sketches[rng.randrange(5)].add(tourist_hash(f"t{n}-{i}"))
+        error = abs(union_count(sketches) - n) / n
+        worst = max(worst, error if n > SPARSE_LIMIT else error * 100)  # small sets must be exact
+        print(f"{n:>6} distinct: estimate {union_count(sketches):>9.1f} ({error * 100:.2f}% off)")
+
+    # 2. Sliding windows against exact counts on a simulated clock
+    class RecordingState:
+        def __init__(self):
+            self.alerts = []
+
+        def add_alert(self, alert_type, tourist_id, message, at_us=None, details=None):
+            self.alerts.append(details)
+
+    state = RecordingState()
+    monitor = CrowdMonitor(state, capacity=40, windows=(300, 1800))
+    reports = []  # (at, tourist, key)
+    hotspot = (27.3290, 88.6120)
+    mismatches = 0
+    for minute in range(120):
+        # A crowd builds up at the hotspot between minutes 30 and 60; elsewhere tourists drift
+        crowd = 60 if 30 <= minute < 60 else 5
+        for k in range(crowd):
+            at = minute * 60 + rng.uniform(0, 60)
+            lat, lon = hotspot[0] + rng.uniform(-0.0004, 0.0004), hotspot[1] + rng.uniform(-0.0004, 0.0004)
+            monitor.observe(f"crowd{k}", lat, lon, at)
+            reports.append((at, f"crowd{k}", monitor._cell(lat, lon)))
+        for k in range(200):
+            at = minute * 60 + rng.uniform(0, 60)
+            lat, lon = 27.2 + rng.uniform(0, 0.2), 88.4 + rng.uniform(0, 0.3)
+            monitor.observe(f"walker{k}", lat, lon, at)
+            reports.append((at, f"walker{k}", monitor._cell(lat, lon)))
+        monitor.sweep(minute * 60 + 59.9)
+        if minute % 10 == 9:
+            now = (minute + 1) * 60 - 0.001
+            bucket = int(now // monitor.bucket_seconds)
+            for window in (300, 1800):
+                first = (bucket - window // monitor.bucket_seconds + 1) * monitor.bucket_seconds
+                exact = {}
+                for at, tourist, key in reports:
+                    if first <= at <= now:
+                        exact.setdefault(key, set()).add(tourist)
+                got = {(cell["lat"], cell["lon"]): cell["count"] for cell in monitor.density(window, at=now)}
+                want = {monitor.center(key): len(tourists) for key, tourists in exact.items()}
+                mismatches += got != want
+    print(f"{len(state.alerts)} overcrowding alert(s): {[(round(a['lat'], 4), round(a['lon'], 4), a['crowd_count']) for a in state.alerts]}")
+
+    # 3. Memory follows active cells: a long stream of moving tourists
+    monitor = CrowdMonitor(capacity=10**9)
+    points = 0
+    start = time.perf_counter()
+    for minute in range(600):
+        for k in range(1000):
+            lat = 27.0 + (k % 50) * 0.01 + minute * 0.0005
+            lon = 88.0 + (k // 50) * 0.01
+            monitor.observe(f"t{k}", lat, lon, minute * 60 + k * 0.06)
+            points += 1
+        if minute in (60, 300, 599):
+            stats = monitor.stats()
+            print(f"after {points:>7} points: {stats['cells']} cells, {stats['sketches']} sketches, "
+                  f"{stats['sketch_bytes'] / 1024:.0f} KiB of sketches")
+    print(f"observe(): {(time.perf_counter() - start) / points * 1e6:.1f} us per report")
+
+    ok = worst < 0.1 and not mismatches and len(state.alerts) == 1
+    print("✅ Sketches, sliding windows and alerts check out." if ok
+          else f"❌ worst error {worst:.3f}, {mismatches} window mismatches, {len(state.alerts)} alerts")
@@ -0,0 +1,361 @@
+# --- Path Feature Engineering ---
+# Shared by the prediction server and the offline tools.
+# These must be identical to the ones used for training.
+
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Column order expected by the scaler and the model
+FEATURE_COLUMNS = [
+    'mean_speed',
+    'std_speed',
+    'max_speed',
+    'total_distance',
+    'total_duration_seconds',
+    'num_points',
+]
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    R = 6371
+    dLat = np.radians(lat2 - lat1); dLon = np.radians(lon2 - lon1)
+    a = np.sin(dLat / 2)**2 + np.cos(np.radians(lat1)) * np.cos(np.radians(lat2)) * np.sin(dLon / 2)**2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    return R * c
+
+def calculate_path_features(df):
+    # Ensure timestamp is in datetime format
+    df['timestamp_dt'] = pd.to_datetime(df['timestamp'])
+    df = df.sort_values(['tourist_id', 'timestamp_dt'])
+
+    # Calculate speed and other features
+    df['time_delta'] = df.groupby('tourist_id')['timestamp_dt'].diff().dt.total_seconds().fillna(0)
+    df['lat_prev'] = df.groupby('tourist_id')['lat'].shift(1)
+    df['lon_prev'] = df.groupby('tourist_id')['lon'].shift(1)
+    df['distance'] = haversine(df['lat_prev'], df['lon_prev'], df['lat'], df['lon']).fillna(0)
+    df['speed'] = (df['distance'] / (df['time_delta'] / 3600)).fillna(0)
+    df.replace([np.inf, -np.inf], 0, inplace=True)
+    df['speed'].fillna(0, inplace=True)
+
+    # Aggregate features for the entire path
+    agg_features = df.groupby('tourist_id').agg(
+        mean_speed=('speed', 'mean'),
+        std_speed=('speed', 'std'),
+        max_speed=('speed', 'max'),
+        total_distance=('distance', 'sum'),
+        total_duration_seconds=('time_delta', 'sum'),
+        num_points=('lat', 'count')
+    ).reset_index()
+    return agg_features
+
+
+# --- NumPy Feature Kernel ---
+# Same six aggregates as calculate_path_features, computed on contiguous float64
+# arrays with segment boundaries instead of pandas groupby. Selected in app.py
+# with FEATURE_ENGINE=numpy.
+
+def to_epoch_seconds(timestamps):
+    """Parse timestamps into float64 seconds, relative to the earliest one to keep precision."""
+    try:
+        ns = np.asarray(timestamps, dtype='datetime64[ns]').astype(np.int64)
+    except ValueError:
+        # Formats numpy does not understand are left to pandas
+        ns = pd.to_datetime(pd.Series(timestamps)).to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    return (ns - ns.min()) / 1e9
+
+def path_feature_kernel(lat, lon, t, starts):
+    """Aggregates for time-sorted points grouped into contiguous segments.
+
+    lat, lon and t (seconds) are float64 arrays; starts holds the index of the
+    first point of each tourist's segment. Returns a dict of per-segment arrays.
+    """
+    n = len(lat)
+    counts = np.diff(np.append(starts, n))
+
+    # Deltas to the previous point; the first point of every segment has none
+    time_delta = np.empty(n)
+    time_delta[0] = 0.0
+    np.subtract(t[1:], t[:-1], out=time_delta[1:])
+    time_delta[starts] = 0.0
+
+    distance = np.empty(n)
+    distance[0] = 0.0
+    distance[1:] = haversine(lat[:-1], lon[:-1], lat[1:], lon[1:])
+    distance[starts] = 0.0
+
+    # 0/0 and x/0 speeds are zeroed, as the pandas version does with fillna/replace
+    with np.errstate(divide='ignore', invalid='ignore'):
+        speed = distance / (time_delta / 3600)
+    speed[~np.isfinite(speed)] = 0.0
+
+    mean_speed = np.add.reduceat(speed, starts) / counts
+    deviation = speed - np.repeat(mean_speed, counts)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        std_speed = np.sqrt(np.add.reduceat(deviation * deviation, starts) / (counts - 1))
+    std_speed[counts < 2] = np.nan
+
+    return {
+        'mean_speed': mean_speed,
+        'std_speed': std_speed,
+        'max_speed': np.maximum.reduceat(speed, starts),
+        'total_distance': np.add.reduceat(distance, starts),
+        'total_duration_seconds': np.add.reduceat(time_delta, starts),
+        'num_points': counts,
+    }
+
+def features_from_arrays(tourist_ids, lat, lon, timestamps):
+    """Sort the points by tourist and time, then run the kernel over each tourist's segment."""
+    tourist_ids = np.asarray(tourist_ids)
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    t = to_epoch_seconds(timestamps)
+
+    ids, codes = np.unique(tourist_ids, return_inverse=True)
+    order = np.lexsort((t, codes))
+    codes = codes[order]
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+
+    columns = path_feature_kernel(
+        np.ascontiguousarray(lat[order]),
+        np.ascontiguousarray(lon[order]),
+        np.ascontiguousarray(t[order]),
+        starts,
+    )
+    return pd.DataFrame({'tourist_id': ids[codes[starts]], **columns}, columns=['tourist_id'] + FEATURE_COLUMNS)
+
+def features_from_records(points):
+    """NumPy engine for a list of point dicts, as posted to /predict."""
+    n = len(points)
+    return features_from_arrays(
+        [p['tourist_id'] for p in points],
+        np.fromiter((p['lat'] for p in points), dtype=np.float64, count=n),
+        np.fromiter((p['lon'] for p in points), dtype=np.float64, count=n),
+        [p['timestamp'] for p in points],
+    )
+
+def calculate_path_features_numpy(df):
+    """Drop-in replacement for calculate_path_features built on the NumPy kernel."""
+    return features_from_arrays(df['tourist_id'], df['lat'], df['lon'], df['timestamp'].astype(str))
+
+
+# --- Streaming Feature State ---
+# The simulator re-sends the whole path on every tick. Instead of rebuilding the
+# DataFrame each time, keep running aggregates per tourist and fold in only the
+# points that are newer than the last one seen (O(1) work per new point).
+# A point with the same timestamp as the previous one is a 0-speed segment, as
+# in calculate_path_features (distance / 0 becomes 0 there).
+
+STATE_CAPACITY = 100_000  # tourists with streaming state; least recently used beyond this are dropped
+STATE_IDLE_SECONDS = 3600  # state of a tourist not seen for this long is dropped
+
+class PathFeatureState:
+    """Running path aggregates for one tourist."""
+
+    columns = FEATURE_COLUMNS  # keys of features(), in order
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self.num_points = 0
+        self.speed_sum = 0.0
+        self.speed_mean = 0.0
+        self.speed_m2 = 0.0  # Welford: sum of squared deviations from the mean
+        self.max_speed = 0.0
+        self.total_distance = 0.0
+        self.total_duration_seconds = 0.0
+        self.last_time = None
+        self.last_time_points = 0  # points folded in at last_time
+        self.last_lat = None
+        self.last_lon = None
+
+    def add_point(self, lat, lon, timestamp):
+        """Fold one point into the aggregates. Points older than the last one are ignored."""
+        ts = pd.Timestamp(timestamp)
+        if self.last_time is not None and ts < self.last_time:
+            return False
+
+        if self.num_points == 0:
+            # First point of a path: no previous point, so speed is 0 (as in the batch version)
+            distance = 0.0
+            time_delta = 0.0
+            speed = 0.0
+        else:
+            time_delta = (ts - self.last_time).total_seconds()
+            distance = float(haversine(self.last_lat, self.last_lon, lat, lon))
+            speed = distance / (time_delta / 3600) if time_delta else 0.0
+
+        self.num_points += 1
+        self.speed_sum += speed
+        delta = speed - self.speed_mean
+        self.speed_mean += delta / self.num_points
+        self.speed_m2 += delta * (speed - self.speed_mean)
+        self.max_speed = max(self.max_speed, speed)
+        self.total_distance += distance
+        self.total_duration_seconds += time_delta
+
+        self.last_time_points = self.last_time_points + 1 if ts == self.last_time else 1
+        self.last_time = ts
+        self.last_lat = lat
+        self.last_lon = lon
+        return True
+
+    def is_restart(self, points):
+        """True if a path ends before the stored one, i.e. the tourist started a new walk."""
+        return self.last_time is not None and pd.Timestamp(points[-1]['timestamp']) < self.last_time
+
+    def update(self, points):
+        """Add the new points of a path. A path that ends before the stored one is a restarted walk."""
+        with self.lock:
+            if not points:
+                return 0
+            if self.is_restart(points):
+                self.clear()
+
+            # Clients re-send the whole path in time order, so the new points are a
+            # tail: walk back from the end until we reach one we have already seen.
+            # Of the points stamped last_time, the first last_time_points were seen.
+            new_points, same_time = [], []
+            for point in reversed(points):
+                ts = pd.Timestamp(point['timestamp'])
+                if self.last_time is not None and ts <= self.last_time:
+                    if ts < self.last_time:
+                        break
+                    same_time.append((ts, point))
+                else:
+                    new_points.append((ts, point))
+            new_points += same_time[:max(len(same_time) - self.last_time_points, 0)]
+            new_points.reverse()
+            new_points.sort(key=lambda item: item[0])  # stable, so equal timestamps keep path order
+
+            added = 0
+            for ts, point in new_points:
+                if self.add_point(point['lat'], point['lon'], ts):
+                    added += 1
+            return added
+
+    def features(self):
+        """The same six aggregates calculate_path_features returns for this path."""
+        n = self.num_points
+        return {
+            'mean_speed': self.speed_sum / n if n else np.nan,
+            # Sample std (ddof=1) like pandas; undefined for a single point
+            'std_speed': np.sqrt(self.speed_m2 / (n - 1)) if n > 1 else np.nan,
+            'max_speed': self.max_speed if n else np.nan,
+            'total_distance': self.total_distance,
+            'total_duration_seconds': self.total_duration_seconds,
+            'num_points': n,
+        }
+
+
+class FeatureStateStore:
+    """Per-tourist PathFeatureState registry used by the streaming mode of /predict.
+
+    Bounded: states idle for idle_seconds, and the least recently used beyond
+    capacity, are dropped. A dropped tourist starts over from its next full path.
+    """
+
+    def __init__(self, state_cls=PathFeatureState, capacity=STATE_CAPACITY, idle_seconds=STATE_IDLE_SECONDS,
+                 clock=time.monotonic):
+        self.state_cls = state_cls
+        self.capacity = capacity
+        self.idle_seconds = idle_seconds
+        self.clock = clock
+        self._states = OrderedDict()  # tourist_id -> (state, last used), least recently used first
+        self._lock = threading.Lock()
+
+    def get(self, tourist_id):
+        now = self.clock()
+        with self._lock:
+            entry = self._states.pop(tourist_id, None)
+            state = entry[0] if entry is not None else self.state_cls()
+            self._states[tourist_id] = (state, now)
+            self._evict(now)
+            return state
+
+    def _evict(self, now):
+        # Caller holds the lock; the oldest entries are at the front
+        while self._states:
+            _, (_, last_used) = next(iter(self._states.items()))
+            if len(self._states) <= self.capacity and now - last_used < self.idle_seconds:
+                break
+            self._states.popitem(last=False)
+
+    def update(self, tourist_id, points):
+        """Fold new points into a tourist's state and return a one-row features DataFrame."""
+        state = self.get(tourist_id)
+        if points and state.is_restart(points):
+            # A new walk starts from a fresh state rather than the old one's history
+            self.reset(tourist_id)
+            state = self.get(tourist_id)
+        state.update(points)
+        with state.lock:
+            row = {'tourist_id': tourist_id, **state.features()}
+        return pd.DataFrame([row], columns=['tourist_id'] + self.state_cls.columns)
+
+    def reset(self, tourist_id=None):
+        with self._lock:
+            if tourist_id is None:
+                self._states.clear()
+            else:
+                self._states.pop(tourist_id, None)
+
+    def __len__(self):
+        return len(self._states)
+
+
+# --- Parity Check ---
+# Run this file directly to compare the NumPy engine and the streaming state
+# with the pandas one.
+if __name__ == "__main__":
+    df = pd.read_csv('simulation_paths.csv')
+
+    expected = calculate_path_features(df.copy()).set_index('tourist_id')[FEATURE_COLUMNS]
+    actual = calculate_path_features_numpy(df).set_index('tourist_id')[FEATURE_COLUMNS]
+
+    same_ids = expected.index.equals(actual.index)
+    close = same_ids and np.allclose(actual.to_numpy(float), expected.to_numpy(float), rtol=1e-9, atol=1e-9, equal_nan=True)
+    max_diff = np.nanmax(np.abs(actual.to_numpy(float) - expected.to_numpy(float))) if same_ids else float('nan')
+
+    print(f"Tourists compared: {len(expected)}, max abs difference: {max_diff:.3e}")
+    if close:
+        print("✅ NumPy feature kernel matches calculate_path_features.")
+    else:
+        print("❌ NumPy feature kernel does NOT match calculate_path_features.")
+
+    # Streaming: every path re-sent tick by tick, with some points sharing the
+    # previous point's timestamp (moved or not), as a client clock can produce
+    ticked = df.copy()
+    previous = ticked.groupby('tourist_id')['timestamp'].shift(1)
+    repeat = (np.arange(len(ticked)) % 7 == 3) & previous.notna().to_numpy()
+    ticked.loc[repeat, 'timestamp'] = previous[repeat]
+    ticked = pd.concat([ticked, ticked[np.arange(len(ticked)) % 11 == 5]]).sort_index(kind='stable')
+    expected = calculate_path_features(ticked.copy()).set_index('tourist_id')[FEATURE_COLUMNS]
+    store = FeatureStateStore()
+    for tourist_id, group in ticked.groupby('tourist_id', sort=False):
+        points = group[['lat', 'lon', 'timestamp']].to_dict('records')
+        for i in range(len(points)):
+            store.update(tourist_id, points[:i + 1])
+    streamed = pd.concat([store.update(t, []) for t in expected.index]).set_index('tourist_id')[FEATURE_COLUMNS]
+    if np.allclose(streamed.to_numpy(float), expected.to_numpy(float), rtol=1e-9, atol=1e-9, equal_nan=True):
+        print(f"✅ Streaming state matches calculate_path_features ({int(repeat.sum())} repeated timestamps).")
+    else:
+        print("❌ Streaming state does NOT match calculate_path_features.")
+
+    # Bounded state: idle tourists and the least recently used beyond capacity are dropped
+    now = [0.0]
+    store = FeatureStateStore(capacity=100, idle_seconds=60, clock=lambda: now[0])
+    for i in range(500):
+        store.get(f"t{i}")
+    full = len(store)
+    now[0] = 61
+    store.get("t0")
+    if full == 100 and len(store) == 1:
+        print("✅ Streaming state is evicted by capacity and idle time.")
+    else:
+        print(f"❌ Streaming state eviction kept {full} and {len(store)} tourists (expected 100 and 1).")
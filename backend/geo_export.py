@@ -0,0 +1,191 @@
+# --- Bulk GeoJSON / NDJSON Export with Path Simplification ---
+# json_generate.py writes one random tourist as pretty-printed JSON. This
+# exporter writes every tourist (or a filtered subset) of simulation_paths.csv
+# as one FeatureCollection, or as NDJSON with one Feature per line. Features
+# are formatted one at a time and written straight to the output, so the
+# document is never built in memory.
+#
+# Paths can be simplified first, with the tolerance in meters:
+#   "dp"  Douglas-Peucker: drop points within `tolerance` of the kept polyline
+#   "vw"  Visvalingam-Whyatt: drop points whose triangle is smaller than tolerance²
+# Coordinates are written with `precision` decimals (6 ~ 0.1 m) and no padding.
+# mock_api_server.py uses the same simplifier to serve long live logs to maps.
+#
+#   python geo_export.py --out paths.geojson --tolerance 10
+#   python geo_export.py --format ndjson --type anomaly --out - | head
+
+import heapq
+import json
+import math
+
+import numpy as np
+
+METHODS = ('dp', 'vw')
+DEFAULT_PRECISION = 6
+METERS_PER_DEGREE = 111_320.0
+
+
+def _project(lat, lon):
+    """Local equirectangular x/y in meters, good enough for a path a few km across."""
+    scale = math.cos(math.radians(float(np.mean(lat)))) if len(lat) else 1.0
+    return np.asarray(lon) * METERS_PER_DEGREE * scale, np.asarray(lat) * METERS_PER_DEGREE
+
+
+def douglas_peucker(x, y, tolerance):
+    """Boolean mask of the points Douglas-Peucker keeps (endpoints always)."""
+    n = len(x)
+    keep = np.zeros(n, dtype=bool)
+    if n == 0:
+        return keep
+    keep[[0, -1]] = True
+    tolerance_sq = tolerance * tolerance
+    stack = [(0, n - 1)]
+    while stack:
+        a, b = stack.pop()
+        if b - a < 2:
+            continue
+        # Distance of every point in between to the segment a-b, in one vector op
+        dx, dy = x[b] - x[a], y[b] - y[a]
+        px, py = x[a + 1:b] - x[a], y[a + 1:b] - y[a]
+        length_sq = dx * dx + dy * dy
+        t = np.clip((px * dx + py * dy) / length_sq, 0.0, 1.0) if length_sq else 0.0
+        distance_sq = (px - t * dx) ** 2 + (py - t * dy) ** 2
+        i = int(np.argmax(distance_sq))
+        if distance_sq[i] > tolerance_sq:
+            middle = a + 1 + i
+            keep[middle] = True
+            stack.append((a, middle))
+            stack.append((middle, b))
+    return keep
+
+
+def visvalingam(x, y, tolerance):
+    """Boolean mask of the points Visvalingam-Whyatt keeps for an area threshold of tolerance²."""
+    n = len(x)
+    keep = np.ones(n, dtype=bool)
+    if n < 3:
+        return keep
+    threshold = tolerance * tolerance
+    previous = np.arange(-1, n - 1)
+    following = np.arange(1, n + 1)
+
+    def area(i):
+        a, c = previous[i], following[i]
+        return abs((x[a] - x[i]) * (y[c] - y[i]) - (x[c] - x[i]) * (y[a] - y[i])) / 2
+
+    areas = [math.inf] + [area(i) for i in range(1, n - 1)] + [math.inf]
+    heap = [(areas[i], i) for i in range(1, n - 1)]
+    heapq.heapify(heap)
+    while heap:
+        value, i = heapq.heappop(heap)
+        if not keep[i] or value != areas[i]:
+            continue  # removed already, or re-queued with a new area
+        if value >= threshold:
+            break
+        keep[i] = False
+        a, c = previous[i], following[i]
+        following[a], previous[c] = c, a
+        # A neighbour's effective area never drops below the one just removed
+        for j in (a, c):
+            if 0 < j < n - 1:
+                areas[j] = max(area(j), value)
+                heapq.heappush(heap, (areas[j], j))
+    return keep
+
+
+def simplify(lat, lon, tolerance, method='dp'):
+    """Indices of the points to keep, in order. tolerance in meters; 0 keeps everything."""
+    lat, lon = np.asarray(lat, dtype=np.float64), np.asarray(lon, dtype=np.float64)
+    if method not in METHODS:
+        raise ValueError(f"Unknown simplification method '{method}'; use one of {METHODS}")
+    if not tolerance or len(lat) < 3:
+        return np.arange(len(lat))
+    x, y = _project(lat, lon)
+    keep = douglas_peucker(x, y, tolerance) if method == 'dp' else visvalingam(x, y, tolerance)
+    return np.flatnonzero(keep)
+
+
+# --- Formatting ---
+def format_coordinates(lat, lon, precision=DEFAULT_PRECISION):
+    """GeoJSON [lon, lat] pairs as compact JSON text."""
+    def number(value):
+        text = f"{value:.{precision}f}"
+        if '.' not in text:  # precision 0: the zeros are significant
+            return text
+        text = text.rstrip('0')
+        return text[:-1] if text.endswith('.') else text
+    return '[' + ','.join(f"[{number(x)},{number(y)}]" for x, y in zip(lon.tolist(), lat.tolist())) + ']'
+
+
+def line_feature(lat, lon, properties, tolerance=0, method='dp', precision=DEFAULT_PRECISION):
+    """One LineString Feature as compact JSON text; properties gain the point counts."""
+    kept = simplify(lat, lon, tolerance, method)
+    properties = dict(properties, points=len(lat), simplified_points=len(kept))
+    return (f'{{"type":"Feature","properties":{json.dumps(properties, separators=(",", ":"))},'
+            f'"geometry":{{"type":"LineString","coordinates":{format_coordinates(lat[kept], lon[kept], precision)}}}}}')
+
+
+def path_features(store, tourist_ids=None, path_type=None, **options):
+    """Feature texts for the selected tourists of a PathStore, one at a time."""
+    for tourist_id in tourist_ids if tourist_ids is not None else store.tourist_ids:
+        if tourist_id not in store.index:
+            continue
+        path = store.path(tourist_id)
+        if path_type and path.path_type != path_type:
+            continue
+        yield line_feature(path.lat, path.lon, {'tourist_id': tourist_id, 'path_type': path.path_type}, **options)
+
+
+def write_feature_collection(out, features):
+    """Stream features into a FeatureCollection. Returns the number written."""
+    count = 0
+    out.write('{"type":"FeatureCollection","features":[\n')
+    for feature in features:
+        out.write(',\n' if count else '')
+        out.write(feature)
+        count += 1
+    out.write('\n]}\n')
+    return count
+
+
+def write_ndjson(out, features):
+    """One Feature per line. Returns the number written."""
+    count = 0
+    for feature in features:
+        out.write(feature)
+        out.write('\n')
+        count += 1
+    return count
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+    import time
+    from path_store import PathStore, SIMULATION_FILE
+
+    parser = argparse.ArgumentParser(description="Export simulation paths as GeoJSON or NDJSON")
+    parser.add_argument('--csv', default=SIMULATION_FILE)
+    parser.add_argument('--out', default='simulation_paths.geojson', help="output file, or - for stdout")
+    parser.add_argument('--format', choices=('geojson', 'ndjson'), default='geojson')
+    parser.add_argument('--type', dest='path_type', help="only this path_type (normal, anomaly)")
+    parser.add_argument('--ids', nargs='+', help="only these tourist ids")
+    parser.add_argument('--tolerance', type=float, default=0.0, help="simplification tolerance in meters (0 = off)")
+    parser.add_argument('--method', choices=METHODS, default='dp')
+    parser.add_argument('--precision', type=int, default=DEFAULT_PRECISION, help="coordinate decimals")
+    args = parser.parse_args()
+
+    store = PathStore.load(args.csv)
+    features = path_features(store, args.ids, args.path_type,
+                             tolerance=args.tolerance, method=args.method, precision=args.precision)
+    write = write_feature_collection if args.format == 'geojson' else write_ndjson
+
+    start = time.perf_counter()
+    if args.out == '-':
+        count = write(sys.stdout, features)
+    else:
+        with open(args.out, 'w') as f:
+            count = write(f, features)
+    elapsed = time.perf_counter() - start
+    if args.out != '-':
+        print(f"✅ Wrote {count} paths to '{args.out}' in {elapsed:.2f}s.")
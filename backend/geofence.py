@@ -0,0 +1,310 @@
+# --- Geofence Engine ---
+# Polygon zones (restricted / high-risk areas) are loaded from a GeoJSON
+# FeatureCollection and indexed on a uniform lat/lon grid. A point is only
+# tested against the zones registered in its grid cell whose bounding box it
+# falls in, and all of a batch's (point, zone) candidates are tested together:
+# each pair expands to one row per zone edge and a single NumPy expression does
+# the even-odd ray casting (so polygon holes work too). The parts of a
+# MultiPolygon are indexed as separate polygons that map back to one zone.
+#
+# A tourist leaves a zone only after EXIT_FIXES consecutive reports outside it,
+# so GPS jitter along a boundary does not raise an enter/exit pair per report.
+#
+# Run this file directly for a throughput benchmark on synthetic zones.
+
+import json
+import threading
+from collections import defaultdict
+
+import numpy as np
+
+GEOFENCE_FILE = 'geofences.geojson'
+GRID_CELL_DEGREES = 0.05  # about 5 km; zones are registered in every cell their bbox overlaps
+MAX_EDGE_TESTS = 1_000_000  # point/edge tests evaluated per vectorized chunk
+EXIT_FIXES = 3  # consecutive reports outside a zone before its exit event
+
+
+class GeofenceIndex:
+    """Grid-indexed polygon zones with vectorized point-in-polygon tests."""
+
+    def __init__(self, zones, cell_size=GRID_CELL_DEGREES):
+        # zones: list of dicts with "id", "name", "zone_type" and "rings"
+        # (each ring a list of [lon, lat]; all rings of an entry are combined even-odd).
+        # Entries sharing an id are parts of one zone.
+        self.cell_size = cell_size
+        self.zones = []  # one per zone id: "id", "name", "zone_type", "bbox" (union of its parts)
+        self.part_zone = []  # polygon part index -> zone index
+        self.grid = defaultdict(list)  # (cx, cy) -> part indexes
+        zone_index = {}
+        part_bboxes = []
+        edges = []
+        edge_ranges = []
+        for zone in zones:
+            start = sum(len(e) for e in edges)
+            zone_edges = []
+            for ring in zone['rings']:
+                ring = np.asarray(ring, dtype=np.float64)
+                if len(ring) < 3:
+                    continue
+                if not np.array_equal(ring[0], ring[-1]):
+                    ring = np.vstack([ring, ring[:1]])
+                zone_edges.append(np.hstack([ring[:-1], ring[1:]]))  # x1, y1, x2, y2
+            if not zone_edges:
+                continue
+            zone_edges = np.vstack(zone_edges)
+            edges.append(zone_edges)
+            edge_ranges.append((start, start + len(zone_edges)))
+
+            index = len(part_bboxes)
+            min_lon, min_lat = zone_edges[:, :2].min(axis=0)
+            max_lon, max_lat = zone_edges[:, :2].max(axis=0)
+            part_bboxes.append((min_lat, min_lon, max_lat, max_lon))
+            if zone['id'] not in zone_index:
+                zone_index[zone['id']] = len(self.zones)
+                self.zones.append({
+                    'id': zone['id'],
+                    'name': zone.get('name', zone['id']),
+                    'zone_type': zone.get('zone_type', 'restricted'),
+                    'bbox': (min_lat, min_lon, max_lat, max_lon),
+                })
+            else:
+                entry = self.zones[zone_index[zone['id']]]
+                a = entry['bbox']
+                entry['bbox'] = (min(a[0], min_lat), min(a[1], min_lon), max(a[2], max_lat), max(a[3], max_lon))
+            self.part_zone.append(zone_index[zone['id']])
+            for cx in range(self._cell(min_lon), self._cell(max_lon) + 1):
+                for cy in range(self._cell(min_lat), self._cell(max_lat) + 1):
+                    self.grid[(cx, cy)].append(index)
+
+        self.edges = np.vstack(edges) if edges else np.empty((0, 4))
+        self.edge_starts = np.array([start for start, _ in edge_ranges], dtype=np.int64)
+        self.edge_counts = np.array([end - start for start, end in edge_ranges], dtype=np.int64)
+        self.bboxes = np.array(part_bboxes, dtype=np.float64).reshape(-1, 4)  # per part
+
+    def _cell(self, value):
+        return int(value // self.cell_size)
+
+    def __len__(self):
+        return len(self.zones)
+
+    # --- Loading ---
+    @classmethod
+    def from_geojson(cls, geojson, cell_size=GRID_CELL_DEGREES):
+        """Zones from the Polygon / MultiPolygon features of a FeatureCollection."""
+        zones = []
+        for i, feature in enumerate(geojson.get('features', [])):
+            geometry = feature.get('geometry') or {}
+            properties = feature.get('properties') or {}
+            if geometry.get('type') == 'Polygon':
+                polygons = [geometry['coordinates']]
+            elif geometry.get('type') == 'MultiPolygon':
+                polygons = geometry['coordinates']
+            else:
+                continue  # LineStrings (exported paths) and points are not zones
+            zone_id = str(properties.get('id', feature.get('id', f"zone_{i}")))
+            for rings in polygons:
+                zones.append({
+                    # Parts of a MultiPolygon are separate polygons of the same zone
+                    'id': zone_id,
+                    'name': properties.get('name', zone_id),
+                    'zone_type': properties.get('zone_type', 'restricted'),
+                    'rings': rings,
+                })
+        return cls(zones, cell_size)
+
+    @classmethod
+    def load(cls, path=GEOFENCE_FILE, cell_size=GRID_CELL_DEGREES):
+        with open(path) as f:
+            return cls.from_geojson(json.load(f), cell_size)
+
+    # --- Queries ---
+    def _candidates(self, lats, lons):
+        """(point, part) pairs whose grid cell and bounding box both match."""
+        cxs = np.floor(lons / self.cell_size).astype(np.int64).tolist()
+        cys = np.floor(lats / self.cell_size).astype(np.int64).tolist()
+        pair_points, pair_zones = [], []
+        for point, key in enumerate(zip(cxs, cys)):
+            zones = self.grid.get(key)
+            if zones:
+                pair_points.extend([point] * len(zones))
+                pair_zones.extend(zones)
+        pair_points = np.asarray(pair_points, dtype=np.int64)
+        pair_zones = np.asarray(pair_zones, dtype=np.int64)
+
+        bbox = self.bboxes[pair_zones]
+        py, px = lats[pair_points], lons[pair_points]
+        keep = (py >= bbox[:, 0]) & (px >= bbox[:, 1]) & (py <= bbox[:, 2]) & (px <= bbox[:, 3])
+        return pair_points[keep], pair_zones[keep]
+
+    def locate(self, lats, lons):
+        """Zone ids containing each point, as a list of sets (one per point)."""
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        result = [set() for _ in range(len(lats))]
+        if not self.zones or not len(lats):
+            return result
+
+        pair_points, pair_zones = self._candidates(lats, lons)
+        if not len(pair_points):
+            return result
+
+        # Every candidate pair expands to one row per edge of its zone; chunks keep
+        # the expanded arrays around MAX_EDGE_TESTS elements for large batches.
+        counts = self.edge_counts[pair_zones]
+        ends = np.cumsum(counts)
+        first = 0
+        while first < len(pair_points):
+            last = int(np.searchsorted(ends, ends[first] - counts[first] + MAX_EDGE_TESTS, side='right'))
+            last = max(last, first + 1)
+            self._test_pairs(pair_points[first:last], pair_zones[first:last], counts[first:last],
+                             lats, lons, result)
+            first = last
+        return result
+
+    def _test_pairs(self, pair_points, pair_zones, counts, lats, lons, result):
+        # Even-odd ray casting: count edges crossed by a ray running east from the point
+        offsets = np.cumsum(counts) - counts
+        edge_index = np.repeat(self.edge_starts[pair_zones] - offsets, counts) + np.arange(counts.sum())
+        x1, y1, x2, y2 = self.edges[edge_index].T
+        px = np.repeat(lons[pair_points], counts)
+        py = np.repeat(lats[pair_points], counts)
+        straddles = (y1 > py) != (y2 > py)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x_cross = x1 + (py - y1) * (x2 - x1) / (y2 - y1)
+        crossings = np.add.reduceat((straddles & (px < x_cross)).astype(np.int32), offsets)
+        inside = crossings % 2 == 1
+        for point, part in zip(pair_points[inside].tolist(), pair_zones[inside].tolist()):
+            result[point].add(self.zones[self.part_zone[part]]['id'])
+
+    def contains(self, lat, lon):
+        """Zone ids containing a single point."""
+        return self.locate([lat], [lon])[0]
+
+    def zone_info(self):
+        """Zone id -> (name, zone_type)."""
+        return {zone['id']: (zone['name'], zone['zone_type']) for zone in self.zones}
+
+
+class GeofenceTracker:
+    """Remembers which zones each tourist is in and turns moves into enter/exit events."""
+
+    def __init__(self, index, exit_fixes=EXIT_FIXES):
+        self.index = index
+        self.exit_fixes = exit_fixes
+        self.inside = {}  # tourist_id -> {zone_id: consecutive reports outside it}
+        self._info = index.zone_info()
+        self._lock = threading.Lock()
+
+    def update(self, tourist_ids, lats, lons):
+        """Check a batch of positions. Returns (zones per point, [(event, tourist_id, zone_id, name, zone_type)])."""
+        located = self.index.locate(lats, lons)
+        return located, self.record(tourist_ids, located)
+
+    def record(self, tourist_ids, located):
+        """Enter/exit events for zone sets already found with index.locate()."""
+        events = []
+        with self._lock:
+            for tourist_id, zones in zip(tourist_ids, located):
+                previous = self.inside.get(tourist_id, {})
+                current = {}
+                for zone_id in sorted(zones | previous.keys()):
+                    if zone_id in zones:
+                        if zone_id not in previous:
+                            events.append(("enter", tourist_id, zone_id, *self._info[zone_id]))
+                        current[zone_id] = 0
+                    elif previous[zone_id] + 1 >= self.exit_fixes:
+                        events.append(("exit", tourist_id, zone_id, *self._info[zone_id]))
+                    else:
+                        current[zone_id] = previous[zone_id] + 1
+                if current:
+                    self.inside[tourist_id] = current
+                else:
+                    self.inside.pop(tourist_id, None)
+        return events
+
+    def reset(self):
+        with self._lock:
+            self.inside.clear()
+
+
+def load_tracker(path=GEOFENCE_FILE, exit_fixes=EXIT_FIXES):
+    """Tracker for the zones in `path`; None (geofencing off) if the file is missing."""
+    try:
+        index = GeofenceIndex.load(path)
+    except FileNotFoundError:
+        print(f"ℹ️ No geofence file '{path}' found; geofencing disabled.")
+        return None
+    print(f"✅ Loaded {len(index)} geofence zones from '{path}'.")
+    return GeofenceTracker(index, exit_fixes)
+
+
+# --- Benchmark ---
+if __name__ == "__main__":
+    import time
+
+    NUM_ZONES = 5000
+    NUM_POINTS = 100000
+    rng = np.random.default_rng(0)
+
+    # Random convex-ish polygons (12 vertices, 0.5-3 km radius) over the dataset's area
+    zones = []
+    for i in range(NUM_ZONES):
+        lat, lon = rng.uniform(27.1, 27.95), rng.uniform(88.1, 88.85)
+        angles = np.sort(rng.uniform(0, 2 * np.pi, 12))
+        radius = rng.uniform(0.005, 0.03, 12)
+        ring = np.column_stack([lon + radius * np.cos(angles), lat + radius * np.sin(angles)]).tolist()
+        zones.append({'id': f"zone_{i}", 'rings': [ring]})
+
+    start = time.perf_counter()
+    index = GeofenceIndex(zones)
+    print(f"Indexed {len(index)} zones in {time.perf_counter() - start:.2f}s")
+
+    lats = rng.uniform(27.1, 27.95, NUM_POINTS)
+    lons = rng.uniform(88.1, 88.85, NUM_POINTS)
+    start = time.perf_counter()
+    located = index.locate(lats, lons)
+    elapsed = time.perf_counter() - start
+    print(f"Batch: {NUM_POINTS} points in {elapsed:.2f}s ({NUM_POINTS / elapsed:,.0f} points/s), "
+          f"{sum(map(len, located))} containments")
+
+    start = time.perf_counter()
+    for lat, lon in zip(lats[:2000], lons[:2000]):
+        index.contains(lat, lon)
+    elapsed = time.perf_counter() - start
+    print(f"Single: {2000 / elapsed:,.0f} updates/s")
+
+    # Spot-check against a plain per-point, per-zone loop
+    def slow_contains(lat, lon):
+        found = set()
+        for zone in zones:
+            ring = zone['rings'][0]
+            inside = False
+            for (x1, y1), (x2, y2) in zip(ring, ring[1:] + ring[:1]):
+                if (y1 > lat) != (y2 > lat) and lon < x1 + (lat - y1) * (x2 - x1) / (y2 - y1):
+                    inside = not inside
+            if inside:
+                found.add(zone['id'])
+        return found
+
+    mismatches = sum(slow_contains(lats[i], lons[i]) != located[i] for i in range(300))
+    if mismatches:
+        print(f"❌ {mismatches} of 300 points disagree with the reference check.")
+    else:
+        print("✅ Vectorized results match the reference check.")
+
+    # A two-part zone is listed once, and boundary jitter raises one enter and no exit
+    square = lambda x, y: [[x, y], [x + 1, y], [x + 1, y + 1], [x, y + 1]]
+    multi = GeofenceIndex.from_geojson({'features': [{
+        'properties': {'id': 'park'},
+        'geometry': {'type': 'MultiPolygon', 'coordinates': [[square(0, 0)], [square(5, 5)]]},
+    }]})
+    tracker = GeofenceTracker(multi)
+    jitter = [tracker.update(['t'], [lat], [lon])[1]
+              for lat, lon in ((0.5, 0.5), (1.01, 0.5), (0.99, 0.5), (1.01, 0.5), (0.99, 0.5), (5.5, 5.5))]
+    events = [event[0] for batch in jitter for event in batch]
+    exits = [tracker.update(['t'], [3.0], [3.0])[1] for _ in range(EXIT_FIXES)]
+    if (len(multi) == 1 and multi.zones[0]['bbox'] == (0, 0, 6, 6) and events == ['enter']
+            and [len(batch) for batch in exits] == [0] * (EXIT_FIXES - 1) + [1]):
+        print("✅ MultiPolygon zones are listed once; exits wait for EXIT_FIXES reports outside.")
+    else:
+        print(f"❌ Zones {multi.zones}, events {events}, exits {exits}.")
@@ -0,0 +1,137 @@
+# --- Grid Density Index for the Heatmap ---
+# Log points are bucketed into lat/lon grid cells as they are written, at every
+# zoom level the dashboard can show. /get_heatmap_data then only has to read the
+# cells of one level inside the visible bounding box, so its cost depends on the
+# number of visible cells, not on the number of log points.
+
+import math
+import threading
+
+import numpy as np
+
+# Heatmap intensity contributed by one log point of each status
+STATUS_WEIGHTS = {"normal": 0.3, "anomaly": 0.6, "sos": 1.0}
+
+MIN_ZOOM = 4
+MAX_ZOOM = 16
+DEFAULT_ZOOM = 12
+
+
+def cell_size(zoom):
+    """Cell edge in degrees: 1/16 of a 256px map tile at this zoom (about 16px on screen)."""
+    return 360.0 / 2 ** (zoom + 4)
+
+
+class GridDensityIndex:
+    """Status-weighted point counts per grid cell, kept for every zoom level."""
+
+    def __init__(self, min_zoom=MIN_ZOOM, max_zoom=MAX_ZOOM):
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom
+        # zoom -> {(ix, iy): [count, weight]}
+        self.levels = {zoom: {} for zoom in range(min_zoom, max_zoom + 1)}
+        self._finest = cell_size(max_zoom)
+        self._lock = threading.Lock()
+
+    def _finest_cell(self, lat, lon):
+        return int((lon + 180.0) // self._finest), int((lat + 90.0) // self._finest)
+
+    def _apply(self, lat, lon, status, sign):
+        if lat is None or lon is None:
+            return
+        weight = STATUS_WEIGHTS.get(status, STATUS_WEIGHTS["normal"])
+        ix, iy = self._finest_cell(lat, lon)
+        with self._lock:
+            # Cells nest by powers of two, so coarser cells are a bit shift away
+            for zoom, cells in self.levels.items():
+                shift = self.max_zoom - zoom
+                key = (ix >> shift, iy >> shift)
+                cell = cells.get(key)
+                if cell is None:
+                    if sign < 0:
+                        continue
+                    cell = cells[key] = [0, 0.0]
+                cell[0] += sign
+                cell[1] += sign * weight
+                if cell[0] <= 0:
+                    del cells[key]
+
+    def add(self, lat, lon, status):
+        """Count a new log point."""
+        self._apply(lat, lon, status, 1)
+
+    def add_many(self, lats, lons, weights):
+        """Count many points at once (e.g. logs restored from a snapshot). Skips NaN coordinates."""
+        lats, lons, weights = np.asarray(lats, dtype=np.float64), np.asarray(lons, dtype=np.float64), np.asarray(weights)
+        valid = ~(np.isnan(lats) | np.isnan(lons))
+        ix = ((lons[valid] + 180.0) // self._finest).astype(np.int64)
+        iy = ((lats[valid] + 90.0) // self._finest).astype(np.int64)
+        # Aggregate the points into finest cells once; coarser levels only merge those cells
+        keys, inverse = np.unique((ix << 32) | iy, return_inverse=True)
+        counts = np.bincount(inverse, minlength=len(keys))
+        sums = np.bincount(inverse, weights=weights[valid], minlength=len(keys))
+        with self._lock:
+            for zoom, cells in self.levels.items():
+                shift = self.max_zoom - zoom
+                level_keys, level_inverse = np.unique(((keys >> 32) >> shift << 32) | ((keys & 0xFFFFFFFF) >> shift),
+                                                      return_inverse=True)
+                level_counts = np.bincount(level_inverse, weights=counts, minlength=len(level_keys)).astype(np.int64)
+                level_sums = np.bincount(level_inverse, weights=sums, minlength=len(level_keys))
+                new_cells = zip(zip((level_keys >> 32).tolist(), (level_keys & 0xFFFFFFFF).tolist()),
+                                level_counts.tolist(), level_sums.tolist())
+                if not cells:
+                    cells.update({key: [count, weight] for key, count, weight in new_cells})
+                    continue
+                for key, count, weight in new_cells:
+                    cell = cells.get(key)
+                    if cell is None:
+                        cell = cells[key] = [0, 0.0]
+                    cell[0] += count
+                    cell[1] += weight
+
+    def remove(self, lat, lon, status):
+        """Forget a log point that was dropped from the logs."""
+        self._apply(lat, lon, status, -1)
+
+    def query(self, zoom=DEFAULT_ZOOM, bbox=None):
+        """Cells of one zoom level as [lat, lon, intensity] at the cell centres.
+
+        bbox is (south, west, north, east) in degrees; None means everything.
+        """
+        zoom = max(self.min_zoom, min(self.max_zoom, int(zoom)))
+        size = cell_size(zoom)
+
+        with self._lock:
+            cells = self.levels[zoom]
+            if bbox is None:
+                keys = list(cells)
+            else:
+                south, west, north, east = bbox
+                x0, x1 = int((west + 180.0) // size), int((east + 180.0) // size)
+                y0, y1 = int((south + 90.0) // size), int((north + 90.0) // size)
+                # Walk whichever is smaller: the visible cell range or the occupied cells
+                if (x1 - x0 + 1) * (y1 - y0 + 1) < len(cells):
+                    keys = [(x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1) if (x, y) in cells]
+                else:
+                    keys = [(x, y) for (x, y) in cells if x0 <= x <= x1 and y0 <= y <= y1]
+            values = [cells[key][1] for key in keys]
+
+        return [
+            [(y + 0.5) * size - 90.0, (x + 0.5) * size - 180.0, round(weight, 4)]
+            for (x, y), weight in zip(keys, values)
+        ]
+
+    def clear(self):
+        with self._lock:
+            for cells in self.levels.values():
+                cells.clear()
+
+
+def parse_bbox(value):
+    """Parse a "south,west,north,east" query parameter; None if absent. Raises ValueError if malformed."""
+    if not value:
+        return None
+    south, west, north, east = (float(part) for part in value.split(","))
+    if any(math.isnan(v) for v in (south, west, north, east)) or south > north:
+        raise ValueError("bbox must be south,west,north,east")
+    return south, west, north, east
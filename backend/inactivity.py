@@ -0,0 +1,274 @@
+# --- Inactivity and Drop-off Detection ---
+# A tourist whose phone goes silent never calls the API again, so nothing
+# would ever look at its record. Instead every report (re)arms two deadlines
+# per tourist in a hierarchical timer wheel:
+#   "drop_off":   no location update for DROP_OFF_SECONDS
+#   "inactivity": no movement beyond STATIONARY_RADIUS_KM for INACTIVITY_SECONDS
+# A background thread advances the wheel once per tick and raises an alert for
+# every deadline that expires. Rescheduling is O(1) and each tick only touches
+# the deadlines due in it (plus an occasional cascade from a coarser level),
+# so the cost follows the number of expiring deadlines, not the tourist count.
+# A drop-off ends the tourist's tracking here (its anchor and inactivity
+# deadline go) until it reports again, so silent tourists cost no memory.
+#
+# Run this file directly for a correctness and cost check on a simulated clock.
+
+import threading
+import time
+from math import ceil
+
+from features import haversine
+
+DROP_OFF_SECONDS = 60.0
+INACTIVITY_SECONDS = 120.0
+STATIONARY_RADIUS_KM = 0.025
+TICK_SECONDS = 1.0
+
+DROP_OFF_ALERT_MESSAGE = "No location update for {seconds:.0f}s. The tourist's device may be off or out of coverage."
+INACTIVITY_ALERT_MESSAGE = "Tourist has not moved more than {meters:.0f} m in {seconds:.0f}s."
+
+
+class TimerWheel:
+    """Hierarchical timer wheel: `levels` wheels of `slots` slots, each level `slots` times coarser.
+
+    Keys have at most one deadline; scheduling a key again moves it. Deadlines
+    further out than the wheel's span are parked in the top level and
+    re-placed when that slot cascades.
+    """
+
+    def __init__(self, tick=TICK_SECONDS, slots=64, levels=3, now=0.0):
+        self.tick = tick
+        self.slots = slots
+        self.levels = levels
+        self.origin = now
+        self.current = 0  # ticks since origin that have been processed
+        self.wheels = [[{} for _ in range(slots)] for _ in range(levels)]
+        self.where = {}  # key -> (level, slot)
+        self.span = slots ** levels
+
+    def __len__(self):
+        return len(self.where)
+
+    def __contains__(self, key):
+        return key in self.where
+
+    def _place(self, key, deadline):
+        due = max(ceil((deadline - self.origin) / self.tick), self.current + 1)
+        delta = min(due - self.current, self.span - 1)
+        level = 0
+        while delta >= self.slots ** (level + 1):
+            level += 1
+        slot = ((self.current + delta) // self.slots ** level) % self.slots
+        self.wheels[level][slot][key] = deadline
+        self.where[key] = (level, slot)
+
+    def schedule(self, key, deadline):
+        self.cancel(key)
+        self._place(key, deadline)
+
+    def cancel(self, key):
+        location = self.where.pop(key, None)
+        if location is not None:
+            level, slot = location
+            del self.wheels[level][slot][key]
+
+    def advance(self, now):
+        """Process every tick up to `now`. Returns the expired (key, deadline) pairs."""
+        target = int((now - self.origin) // self.tick)
+        expired = []
+        while self.current < target:
+            self.current += 1
+            # Cascade coarser levels first, so their entries can land in this tick's slot
+            for level in range(self.levels - 1, 0, -1):
+                block = self.slots ** level
+                if self.current % block == 0:
+                    self._cascade(level, (self.current // block) % self.slots)
+            entries = self.wheels[0][self.current % self.slots]
+            if entries:
+                self.wheels[0][self.current % self.slots] = {}
+                for key, deadline in entries.items():
+                    del self.where[key]
+                    expired.append((key, deadline))
+        return expired
+
+    def _cascade(self, level, slot):
+        entries = self.wheels[level][slot]
+        self.wheels[level][slot] = {}
+        for key, deadline in entries.items():
+            self._place(key, deadline)
+
+    def clear(self):
+        for wheel in self.wheels:
+            for slot in wheel:
+                slot.clear()
+        self.where.clear()
+
+
+class InactivityDetector:
+    """Raises drop_off / inactivity alerts for tourists that stop reporting or stop moving."""
+
+    def __init__(self, state, drop_off_seconds=DROP_OFF_SECONDS, inactivity_seconds=INACTIVITY_SECONDS,
+                 stationary_radius_km=STATIONARY_RADIUS_KM, tick=TICK_SECONDS, clock=time.monotonic):
+        self.state = state
+        self.drop_off_seconds = drop_off_seconds
+        self.inactivity_seconds = inactivity_seconds
+        self.stationary_radius_km = stationary_radius_km
+        self.clock = clock
+        self.wheel = TimerWheel(tick, now=clock())
+        self.anchors = {}  # tourist_id -> (lat, lon) where it was last seen moving
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def seen(self, tourist_id, lat, lon):
+        """A report from a tourist: re-arm its drop-off deadline, and its inactivity one if it moved."""
+        now = self.clock()
+        with self._lock:
+            self.wheel.schedule((tourist_id, "drop_off"), now + self.drop_off_seconds)
+            if lat is None or lon is None:
+                return
+            # Still within the radius: the running deadline stands (or has already fired once)
+            anchor = self.anchors.get(tourist_id)
+            if anchor is None or float(haversine(anchor[0], anchor[1], lat, lon)) > self.stationary_radius_km:
+                self.anchors[tourist_id] = (lat, lon)
+                self.wheel.schedule((tourist_id, "inactivity"), now + self.inactivity_seconds)
+
+    def forget(self, tourist_id):
+        with self._lock:
+            self._forget(tourist_id)
+
+    def _forget(self, tourist_id):
+        # Caller holds the lock
+        self.wheel.cancel((tourist_id, "drop_off"))
+        self.wheel.cancel((tourist_id, "inactivity"))
+        self.anchors.pop(tourist_id, None)
+
+    def check(self):
+        """Advance to now and alert on expired deadlines. Returns the number of alerts raised."""
+        with self._lock:
+            expired = self.wheel.advance(self.clock())
+            for (tourist_id, kind), _ in expired:
+                if kind == "drop_off":
+                    # A silent tourist is no longer judged for movement; its next report starts over
+                    self._forget(tourist_id)
+        raised = 0
+        for (tourist_id, kind), _ in expired:
+            # Untracked (reset) tourists and open SOS cases need no extra alert
+            record = self.state.get(tourist_id)
+            if record is None:
+                self.forget(tourist_id)
+                continue
+            if record["status"] == "sos":
+                continue
+            if kind == "drop_off":
+                message = DROP_OFF_ALERT_MESSAGE.format(seconds=self.drop_off_seconds)
+            else:
+                message = INACTIVITY_ALERT_MESSAGE.format(
+                    meters=self.stationary_radius_km * 1000, seconds=self.inactivity_seconds)
+            self.state.add_alert(kind, tourist_id, message)
+            raised += 1
+        return raised
+
+    def reset(self):
+        with self._lock:
+            self.wheel.clear()
+            self.anchors.clear()
+
+    # --- Background Thread ---
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="inactivity-detector", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.wheel.tick):
+            try:
+                self.check()
+            except Exception as e:
+                print(f"❌ Inactivity check failed: {e}")
+
+
+# --- Simulated-Clock Check ---
+# 20k tourists with random report/move behaviour on a fake clock. Every alert
+# must match a brute-force replay, and the wheel work per tick must follow the
+# expiring deadlines rather than the tourist count.
+if __name__ == "__main__":
+    import random
+
+    class FakeClock:
+        def __init__(self):
+            self.now = 0.0
+
+        def __call__(self):
+            return self.now
+
+    class RecordingState:
+        def __init__(self):
+            self.alerts = []
+
+        def get(self, tourist_id):
+            return {"status": "normal"}
+
+        def add_alert(self, alert_type, tourist_id, message):
+            self.alerts.append((self.clock(), alert_type, tourist_id))
+
+    NUM_TOURISTS = 20000
+    SECONDS = 600
+    rng = random.Random(7)
+    clock = FakeClock()
+    state = RecordingState()
+    state.clock = clock
+    detector = InactivityDetector(state, clock=clock)
+
+    positions = {f"t{i}": (27 + rng.random(), 88 + rng.random()) for i in range(NUM_TOURISTS)}
+    # Each tourist reports every `period` seconds, goes silent at `silent_at`, and stops moving at `still_at`
+    plans = {
+        tourist_id: (rng.choice([2, 5, 15]), rng.uniform(0, 2 * SECONDS), rng.uniform(0, 2 * SECONDS))
+        for tourist_id in positions
+    }
+    last_report, last_move, expected = {}, {}, set()
+
+    start = time.perf_counter()
+    check_time = 0.0
+    for second in range(SECONDS + 1):
+        clock.now = float(second)
+        for tourist_id, (period, silent_at, still_at) in plans.items():
+            if second % period or second >= silent_at:
+                continue
+            lat, lon = positions[tourist_id]
+            if second < still_at or tourist_id not in last_report:
+                lat += 0.001  # about 110 m per report; the first report always anchors
+                positions[tourist_id] = (lat, lon)
+                last_move[tourist_id] = second
+            last_report[tourist_id] = second
+            detector.seen(tourist_id, lat, lon)
+        t0 = time.perf_counter()
+        detector.check()
+        check_time += time.perf_counter() - t0
+
+    # Brute force: a tourist is alerted once per episode, DROP_OFF / INACTIVITY seconds after its last report /
+    # move; an inactivity deadline later than the drop-off is cancelled by it
+    dropped = set()
+    for tourist_id in plans:
+        if tourist_id in last_report and last_report[tourist_id] + DROP_OFF_SECONDS <= SECONDS:
+            expected.add(("drop_off", tourist_id))
+            dropped.add(tourist_id)
+        if (tourist_id in last_move and last_move[tourist_id] + INACTIVITY_SECONDS <= SECONDS
+                and last_move[tourist_id] + INACTIVITY_SECONDS <= last_report[tourist_id] + DROP_OFF_SECONDS):
+            expected.add(("inactivity", tourist_id))
+    actual = [(kind, tourist_id) for _, kind, tourist_id in state.alerts]
+
+    print(f"{NUM_TOURISTS} tourists, {SECONDS}s simulated in {time.perf_counter() - start:.1f}s; "
+          f"checks took {check_time * 1000:.0f} ms total ({check_time / (SECONDS + 1) * 1e6:.0f} us per tick)")
+    print(f"{len(actual)} alerts raised, {len(expected)} expected, {len(detector.wheel)} deadlines pending")
+    if set(actual) == expected and len(actual) == len(expected):
+        print("✅ Alerts match the brute-force replay.")
+    else:
+        print(f"❌ Alerts differ: {len(set(actual) - expected)} unexpected, {len(expected - set(actual))} missing.")
+    if set(detector.anchors) == set(last_report) - dropped:
+        print(f"✅ Anchors are kept only for the {len(detector.anchors)} tourists still reporting.")
+    else:
+        print(f"❌ {len(detector.anchors)} anchors kept, {len(set(last_report) - dropped)} tourists still reporting.")
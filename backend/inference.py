@@ -0,0 +1,232 @@
+# --- Inference Backends ---
+# Scaling + XGBoost scoring behind one interface, so app.py can switch between
+# the training-time sklearn path and a leaner booster path:
+#   "sklearn": StandardScaler.transform + XGBClassifier.predict_proba (reference)
+#   "booster": the scaler's affine transform written into a preallocated
+#              per-thread float32 buffer, then Booster.inplace_predict with a
+#              fixed thread count. No DataFrame validation, no DMatrix.
+#   "compiled": the same buffer, with the tree ensemble flattened into NumPy
+#              node arrays and walked level by level for all trees at once
+#              (no call into the XGBoost library per request).
+# All of them return the anomaly-class probability per row.
+#
+# Run this file directly for a parity check on simulation_paths.csv and a
+# per-row latency comparison of the backends.
+
+import json
+import pickle
+import threading
+
+import numpy as np
+import xgboost as xgb
+
+from features import FEATURE_COLUMNS
+
+MODEL_FILE = 'final_tuned_xgboost_model.json'
+SCALER_FILE = 'final_scaler.pkl'
+BACKENDS = ('sklearn', 'booster', 'compiled')
+
+
+class SklearnBackend:
+    """The original path: scaler.transform on a DataFrame, then predict_proba."""
+
+    name = 'sklearn'
+
+    def __init__(self, model, scaler):
+        self.model = model
+        self.scaler = scaler
+
+    def prepare(self, features_df):
+        features = features_df[FEATURE_COLUMNS].fillna(0)
+        return self.scaler.transform(features)
+
+    def predict(self, prepared):
+        return self.model.predict_proba(prepared)[:, 1]
+
+    def predict_anomaly(self, features_df):
+        return self.predict(self.prepare(features_df))
+
+    def set_threads(self, nthread):
+        self.model.set_params(n_jobs=nthread)
+
+
+class BoosterBackend:
+    """Folded scaler + raw Booster.inplace_predict on a reused float32 buffer."""
+
+    name = 'booster'
+
+    def __init__(self, model, scaler, nthread=1):
+        self.model = model
+        self.scaler = scaler
+        self.booster = model.get_booster()
+        self.booster.set_param({'nthread': nthread})
+        self.nthread = nthread
+        # StandardScaler is x' = (x - mean) / scale; identity where it was fitted without one
+        n = len(FEATURE_COLUMNS)
+        self.mean = scaler.mean_ if scaler.with_mean else np.zeros(n)
+        self.scale = scaler.scale_ if scaler.with_std else np.ones(n)
+        self._local = threading.local()  # per-thread buffers; Flask serves requests on many threads
+
+    def _buffers(self, rows):
+        local = self._local
+        if getattr(local, 'capacity', 0) < rows:
+            local.capacity = max(rows, 2 * getattr(local, 'capacity', 0), 16)
+            local.work = np.empty((local.capacity, len(FEATURE_COLUMNS)), dtype=np.float64)
+            local.input = np.empty((local.capacity, len(FEATURE_COLUMNS)), dtype=np.float32)
+        return local.work[:rows], local.input[:rows]
+
+    def prepare(self, features_df):
+        work, buffer = self._buffers(len(features_df))
+        for j, column in enumerate(FEATURE_COLUMNS):
+            work[:, j] = features_df[column].to_numpy(dtype=np.float64)
+        np.nan_to_num(work, copy=False, nan=0.0)  # e.g. std_speed of a one-point path
+        # Same float64 arithmetic as StandardScaler.transform, then one cast to float32
+        np.subtract(work, self.mean, out=work)
+        np.divide(work, self.scale, out=work)
+        buffer[...] = work
+        return buffer
+
+    def predict(self, prepared):
+        return self.booster.inplace_predict(prepared, validate_features=False)
+
+    def predict_anomaly(self, features_df):
+        return self.predict(self.prepare(features_df))
+
+    def set_threads(self, nthread):
+        self.booster.set_param({'nthread': nthread})
+        self.nthread = nthread
+
+
+class CompiledBackend(BoosterBackend):
+    """Folded scaler + the trees as flat NumPy arrays, evaluated without XGBoost."""
+
+    name = 'compiled'
+
+    def __init__(self, model, scaler, nthread=1):
+        super().__init__(model, scaler, nthread)
+        dump = json.loads(self.booster.save_raw('json'))['learner']
+        if dump['objective']['name'] != 'binary:logistic':
+            raise ValueError(f"Compiled backend only supports binary:logistic, not {dump['objective']['name']}")
+        base_score = float(dump['learner_model_param']['base_score'].strip('[]'))
+        self.base_margin = np.float32(np.log(base_score / (1 - base_score)))
+
+        # Every tree padded to the same node count; tree t's node i is flat index t * width + i.
+        # Leaves point to themselves, so walking max-depth levels parks every row on its leaf.
+        trees = dump['gradient_booster']['model']['trees']
+        width = max(len(tree['left_children']) for tree in trees)
+        self.feature = np.zeros((len(trees), width), dtype=np.int64)
+        self.threshold = np.zeros((len(trees), width), dtype=np.float32)
+        self.left = np.zeros((len(trees), width), dtype=np.int64)
+        self.right = np.zeros((len(trees), width), dtype=np.int64)
+        self.leaf_value = np.zeros((len(trees), width), dtype=np.float32)
+        self.depth = 0
+        for t, tree in enumerate(trees):
+            left = np.asarray(tree['left_children'])
+            right = np.asarray(tree['right_children'])
+            n = len(left)
+            leaf = left == -1
+            own = t * width + np.arange(n)
+            self.feature[t, :n] = tree['split_indices']
+            self.threshold[t, :n] = tree['split_conditions']
+            self.left[t, :n] = np.where(leaf, own, t * width + left)
+            self.right[t, :n] = np.where(leaf, own, t * width + right)
+            self.leaf_value[t, :n] = np.where(leaf, tree['split_conditions'], 0)
+            self.depth = max(self.depth, _tree_depth(left, right))
+        # Missing values never reach the trees (prepare() fills them with 0), so default directions are not needed
+        self.feature, self.threshold, self.left, self.right, self.leaf_value = (
+            a.ravel() for a in (self.feature, self.threshold, self.left, self.right, self.leaf_value))
+        self.roots = np.arange(len(trees)) * width
+
+    def predict(self, prepared):
+        rows = np.arange(len(prepared))[:, None]
+        node = np.broadcast_to(self.roots, (len(prepared), len(self.roots)))
+        for _ in range(self.depth):
+            goes_left = prepared[rows, self.feature[node]] < self.threshold[node]
+            node = np.where(goes_left, self.left[node], self.right[node])
+        margin = self.leaf_value[node].sum(axis=1, dtype=np.float32) + self.base_margin
+        return 1 / (1 + np.exp(-margin))
+
+
+def _tree_depth(left, right):
+    depth = np.zeros(len(left), dtype=np.int64)
+    for i in range(len(left)):  # children always come after their parent in XGBoost's node order
+        if left[i] != -1:
+            depth[left[i]] = depth[right[i]] = depth[i] + 1
+    return int(depth.max())
+
+
+def load_backend(name='sklearn', model_path=MODEL_FILE, scaler_path=SCALER_FILE, nthread=1, warmup=True):
+    """Load the model and scaler into the named backend, optionally scoring one dummy row first."""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{name}' (expected one of {', '.join(BACKENDS)})")
+    model = xgb.XGBClassifier(n_jobs=nthread)
+    model.load_model(model_path)
+    with open(scaler_path, 'rb') as f:
+        scaler = pickle.load(f)
+
+    if name == 'sklearn':
+        backend = SklearnBackend(model, scaler)
+    elif name == 'booster':
+        backend = BoosterBackend(model, scaler, nthread)
+    else:
+        backend = CompiledBackend(model, scaler, nthread)
+    if warmup:
+        warm_up(backend)
+    return backend
+
+
+def warm_up(backend):
+    """Score a dummy row so the first real request doesn't pay for lazy initialization."""
+    import pandas as pd
+    backend.predict_anomaly(pd.DataFrame([np.ones(len(FEATURE_COLUMNS))], columns=FEATURE_COLUMNS))
+
+
+# --- Parity Check and Latency Benchmark ---
+if __name__ == "__main__":
+    import time
+    import pandas as pd
+    from features import calculate_path_features_numpy
+
+    df = pd.read_csv('simulation_paths.csv')
+    features_df = calculate_path_features_numpy(df)
+    # Prefix features too, so the check covers the partial paths /predict sees
+    prefixes = [
+        calculate_path_features_numpy(group.head(n))
+        for _, group in df.groupby('tourist_id', sort=False)
+        for n in (1, 2, 10, 50)
+    ]
+    features_df = pd.concat([features_df, *prefixes], ignore_index=True)
+
+    start = time.perf_counter()
+    reference = load_backend('sklearn')
+    print(f"sklearn backend loaded + warmed in {(time.perf_counter() - start) * 1000:.1f} ms")
+    backends = {'sklearn': reference}
+    for name in BACKENDS[1:]:
+        start = time.perf_counter()
+        backends[name] = load_backend(name)
+        print(f"{name} backend loaded + warmed in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    # The float32 leaf sums of the compiled walk may round differently from XGBoost's (~1e-7)
+    expected = reference.predict_anomaly(features_df)
+    for name in BACKENDS[1:]:
+        actual = backends[name].predict_anomaly(features_df)
+        max_diff = float(np.abs(expected - actual).max())
+        same_class = np.array_equal(expected > 0.5, actual > 0.5)
+        print(f"Parity over {len(features_df)} rows: max |p diff| = {max_diff:.2e}, same classes: {same_class}")
+        if max_diff > 1e-6 or not same_class:
+            print(f"❌ {name} backend disagrees with the sklearn path.")
+        else:
+            print(f"✅ {name} backend matches the sklearn path.")
+
+    # One row per call, as /predict scores it
+    rows = [features_df.iloc[[i]] for i in range(len(features_df))]
+    backends['booster nthread=4'] = load_backend('booster', nthread=4)
+    print(f"\n{'backend':<22}{'mean us':>10}{'p50 us':>10}{'p95 us':>10}")
+    for label, backend in backends.items():
+        samples = []
+        for row in rows * 3:
+            t0 = time.perf_counter()
+            backend.predict_anomaly(row)
+            samples.append(time.perf_counter() - t0)
+        us = np.array(samples) * 1e6
+        print(f"{label:<22}{us.mean():>10.1f}{np.percentile(us, 50):>10.1f}{np.percentile(us, 95):>10.1f}")
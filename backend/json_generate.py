@@ -1,35 +1,36 @@
 # --- Script to Convert a Simulated Path to GeoJSON Format ---
 
-import pandas as pd
 import json
 import random
+import numpy as np
+from path_store import PathStore
 
 # --- Configuration ---
 SIMULATION_FILE = 'simulation_paths.csv'
 
 # 1. Load the curated simulation paths
 try:
-    df = pd.read_csv(SIMULATION_FILE)
+    path_store = PathStore.load(SIMULATION_FILE)
 except FileNotFoundError:
     print(f"❌ Error: '{SIMULATION_FILE}' not found. Please create it first.")
     exit()
 
 # 2. Select one random tourist path to convert
-if df.empty:
+if len(path_store) == 0:
     print("❌ Error: The simulation file is empty.")
     exit()
 
-tourist_id = random.choice(df['tourist_id'].unique())
-path_df = df[df['tourist_id'] == tourist_id]
+tourist_id = random.choice(path_store.tourist_ids)
+path = path_store.path(tourist_id)
 
 print(f"Converting path for tourist: {tourist_id}")
-print(f"Path Type: {path_df['path_type'].iloc[0]}")
-print(f"Number of points in path: {len(path_df)}")
+print(f"Path Type: {path.path_type}")
+print(f"Number of points in path: {len(path.lat)}")
 
 
 # 3. Extract the coordinates into the required format
 # GeoJSON format requires [longitude, latitude] for each point
-coordinates = path_df[['lon', 'lat']].values.tolist()
+coordinates = np.column_stack((path.lon, path.lat)).tolist()
 
 # 4. Create the GeoJSON structure for a 'LineString'
 geojson_data = {
@@ -39,7 +40,7 @@ geojson_data = {
             "type": "Feature",
             "properties": {
                 "tourist_id": tourist_id,
-                "path_type": path_df['path_type'].iloc[0],
+                "path_type": path.path_type,
                 # --- ADDED: Styling hints for viewers like geojson.io ---
                 "stroke": "#FF5733",  # An orange-red color
                 "stroke-width": 2,
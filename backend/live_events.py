@@ -0,0 +1,82 @@
+# --- Live Status Event Broker ---
+# Changes to live tourist state are published here once, with a sequence
+# number, and every Server-Sent Events connection reads them from a shared
+# history. Dashboards get pushed only what changed, so the cost follows the
+# rate of changes rather than polls x tourists.
+
+import json
+import threading
+from collections import deque
+from itertools import islice
+
+EVENT_HISTORY = 2000  # events kept for reconnecting clients (Last-Event-ID)
+KEEPALIVE_SECONDS = 15
+
+
+class LiveEventBroker:
+    """Sequenced, bounded history of live-state events with blocking reads."""
+
+    def __init__(self, history=EVENT_HISTORY):
+        self.seq = 0
+        self._history = deque(maxlen=history)  # (seq, event, data)
+        self._cond = threading.Condition()
+
+    def publish(self, event, data):
+        with self._cond:
+            self.seq += 1
+            self._history.append((self.seq, event, data))
+            self._cond.notify_all()
+
+    def events_after(self, seq, timeout=KEEPALIVE_SECONDS):
+        """Events newer than seq, waiting up to timeout for one to arrive.
+
+        Returns [] on timeout and None if seq is too old to resume from (the
+        caller should send a fresh snapshot).
+        """
+        with self._cond:
+            if self.seq <= seq:
+                self._cond.wait_for(lambda: self.seq > seq, timeout=timeout)
+            if self.seq <= seq:
+                return []
+            oldest = self._history[0][0]
+            if seq < oldest - 1:
+                return None
+            # Seqs are consecutive, so the new events are the last self.seq - seq entries;
+            # read them from the tail instead of copying the whole history
+            return list(islice(reversed(self._history), self.seq - seq))[::-1]
+
+    def can_resume(self, seq):
+        with self._cond:
+            return seq == self.seq or (self._history and self._history[0][0] - 1 <= seq <= self.seq)
+
+
+def format_sse(event, data, seq=None):
+    """One Server-Sent Events message."""
+    message = ""
+    if seq is not None:
+        message += f"id: {seq}\n"
+    return message + f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def event_stream(broker, snapshot_fn, last_event_id=None):
+    """SSE generator: a snapshot on connect (unless resuming), then deltas as they happen.
+
+    Deltas carry the tourist's full record, so replaying one that the snapshot
+    already reflects is harmless.
+    """
+    seq = last_event_id if last_event_id is not None and broker.can_resume(last_event_id) else None
+    while True:
+        if seq is None:
+            # Read the sequence number first: anything published while copying is re-sent
+            seq = broker.seq
+            yield format_sse("snapshot", snapshot_fn(), seq)
+
+        events = broker.events_after(seq)
+        if events is None:
+            seq = None
+            continue
+        if not events:
+            yield ": keep-alive\n\n"
+            continue
+        for event_seq, event, data in events:
+            yield format_sse(event, data, event_seq)
+            seq = event_seq
@@ -0,0 +1,560 @@
+# --- Synthetic Fleet Load Generator ---
+# simulation_paths.csv has 30 tourists and the browser simulator drives one
+# setInterval per tourist. This generator synthesizes a whole fleet around
+# the dataset's points of interest and drives it headlessly against
+# mock_api_server.py or app.py at production-like tourist counts.
+#
+# Trajectories: every tourist travels between POIs taken from the CSV
+# (at_poi rows) at road speeds and dwells at each one for a while, reporting
+# on arrival and then pausing until it moves on, as in the CSV. The
+# anomalous share, and the mix of anomaly types among them, follow the CSV.
+# After a random onset time:
+#   "inactivity"  the tourist stops off-POI and keeps reporting the same place
+#   "drop_off"    the device goes silent
+#   "deviation"   the tourist leaves the POI network on a wandering heading
+# Each tick advances the simulated clock by --sim-seconds (about the CSV's
+# sampling interval) for all tourists at once, in NumPy. Reports carry a
+# few meters of GPS noise.
+#
+# Load: every tourist reports once per --tick (1.5 s, like the simulator) at
+# its own phase within the tick, so requests arrive evenly instead of in
+# bursts. Requests go out from asyncio over pooled keep-alive connections
+# (a small stdlib HTTP/1.1 client; no aiohttp needed). --processes splits
+# the fleet over several client processes, because one Python event loop
+# tops out at a few thousand requests per second. --tourists gives the ramp,
+# e.g. 1000,10000,100000, and each step runs for --duration seconds.
+#
+# Per step the report shows:
+#   - offered request rate (the reports due; dwelling tourists are silent) and achieved rate
+#   - error rate
+#   - client latency percentiles per endpoint
+#   - "late": reports skipped because the tourist's previous tick was still in flight
+#   - server-side mean and p99 latency from the server's /metrics histogram (METRICS=1)
+#
+#   python loadgen.py --server mock --url http://127.0.0.1:5000 --tourists 1000,10000,100000
+#   python loadgen.py --server app --url http://127.0.0.1:5000 --tourists 500,2000 --window 0
+#   python loadgen.py --export 300 --ticks 240 --out synthetic_paths.csv   # trajectories only
+
+import asyncio
+import json
+import math
+import os
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit
+
+import numpy as np
+import pandas as pd
+
+SIMULATION_FILE = 'simulation_paths.csv'
+ANOMALY_TYPES = ('inactivity', 'drop_off', 'deviation')
+KM_PER_DEGREE = 6371 * math.pi / 180
+GPS_NOISE_M = 5.0
+TICK_SECONDS = 1.5
+SIM_SECONDS = 70.0  # median spacing of the CSV's points
+SLOTS_PER_TICK = 50
+CONNECTIONS = 64  # per client process
+LATENCY_BUCKETS_MS = np.concatenate([np.arange(0, 10, 0.1), np.arange(10, 100, 1), np.arange(100, 10000, 10)])
+
+
+# --- Trajectory Synthesis ---
+def dataset_profile(path=SIMULATION_FILE):
+    """POI coordinates, the anomalous share and the anomaly type mix of the CSV."""
+    df = pd.read_csv(path, usecols=['tourist_id', 'lat', 'lon', 'at_poi', 'anomaly_type', 'path_type'])
+    pois = df.loc[df['at_poi'], ['lat', 'lon']].round(3).drop_duplicates().to_numpy()
+    per_tourist = df.groupby('tourist_id').agg(path_type=('path_type', 'first'), anomaly_type=('anomaly_type', 'first'))
+    anomalous = per_tourist[per_tourist['path_type'] == 'anomaly']
+    mix = anomalous['anomaly_type'].value_counts(normalize=True).reindex(ANOMALY_TYPES, fill_value=0)
+    return pois, len(anomalous) / len(per_tourist), mix.to_numpy()
+
+
+class SyntheticFleet:
+    """Positions of `count` tourists, advanced one tick at a time.
+
+    Kinds: 0 normal, then 1 + the index in ANOMALY_TYPES. The last `window`
+    reported points per tourist are kept for /predict payloads.
+    """
+
+    def __init__(self, count, pois, anomaly_share, anomaly_mix, seed=0, first_id=0,
+                 sim_seconds=SIM_SECONDS, window=32, start=None):
+        rng = self.rng = np.random.default_rng(seed)
+        self.count, self.pois, self.sim_seconds = count, pois, sim_seconds
+        anomalous = rng.random(count) < anomaly_share
+        self.kind = np.where(anomalous, 1 + rng.choice(len(ANOMALY_TYPES), count, p=anomaly_mix), 0)
+        self.ids = [f"{'anomalous' if kind else 'normal'}_syn{first_id + i}" for i, kind in enumerate(self.kind)]
+        self.path_type = np.where(anomalous, 'anomaly', 'normal')
+
+        origin = rng.integers(len(pois), size=count)
+        self.lat = pois[origin, 0] + rng.normal(0, 0.002, count)
+        self.lon = pois[origin, 1] + rng.normal(0, 0.002, count)
+        self.destination = self._new_destination(origin)
+        self.speed_kmh = np.clip(rng.normal(40, 15, count), 5, 80)
+        self.dwell_left = np.zeros(count)  # everyone starts out on the road
+        self.heading = rng.uniform(0, 2 * math.pi, count)
+        self.onset = rng.uniform(1800, 4 * 3600, count)  # simulated seconds until the anomaly starts
+        self.reporting = np.ones(count, dtype=bool)  # False once a drop_off tourist went silent
+        self.visible = np.ones(count, dtype=bool)  # reports in the current tick
+        self.phase = rng.random(count)  # when in each tick the tourist reports
+
+        self.clock = 0.0  # simulated seconds since start
+        self.start = start or datetime.now().replace(microsecond=0)
+        self.ticks = 0
+        self.window = max(window, 1)
+        self.history_lat = np.zeros((count, self.window))
+        self.history_lon = np.zeros((count, self.window))
+        self.history_t = np.zeros(self.window)  # all tourists report within the same tick
+        self.report_lat, self.report_lon = self.lat, self.lon
+
+    def _new_destination(self, current):
+        step = self.rng.integers(1, len(self.pois), size=len(current))
+        return (current + step) % len(self.pois)  # never the POI it is at
+
+    def step(self):
+        """Advance every tourist by sim_seconds and record the reported positions."""
+        rng, dt = self.rng, self.sim_seconds
+        self.clock += dt
+        started = self.clock >= self.onset
+        inactive = started & (self.kind == 1 + ANOMALY_TYPES.index('inactivity'))
+        deviating = started & (self.kind == 1 + ANOMALY_TYPES.index('deviation'))
+        self.reporting &= ~(started & (self.kind == 1 + ANOMALY_TYPES.index('drop_off')))
+
+        self.dwell_left -= dt
+        travelling = (self.dwell_left <= 0) & ~inactive & ~deviating
+        step_km = self.speed_kmh * rng.uniform(0.3, 1.7, self.count) * dt / 3600  # traffic, bends, stops
+        cos_lat = np.cos(np.radians(self.lat))
+
+        # Along the road network: straight towards the next POI, then dwell there
+        t = np.flatnonzero(travelling)
+        north = (self.pois[self.destination[t], 0] - self.lat[t]) * KM_PER_DEGREE
+        east = (self.pois[self.destination[t], 1] - self.lon[t]) * KM_PER_DEGREE * cos_lat[t]
+        remaining = np.hypot(north, east)
+        arrived = remaining <= step_km[t]
+        scale = np.where(arrived, 1.0, step_km[t] / np.maximum(remaining, 1e-9))
+        self.lat[t] += north * scale / KM_PER_DEGREE
+        self.lon[t] += east * scale / (KM_PER_DEGREE * cos_lat[t])
+        done = t[arrived]
+        self.dwell_left[done] = rng.uniform(1800, 5400, len(done))
+        self.destination[done] = self._new_destination(self.destination[done])
+        self.speed_kmh[done] = np.clip(rng.normal(40, 15, len(done)), 5, 80)  # walk, taxi or bus to the next one
+        # Silent while dwelling, apart from the arrival report
+        self.visible = self.reporting & ((self.dwell_left <= 0) | inactive | deviating)
+        self.visible[done] = self.reporting[done]
+
+        # Off the network: a wandering heading
+        d = np.flatnonzero(deviating)
+        self.heading[d] += rng.normal(0, 0.3, len(d))
+        self.lat[d] += np.cos(self.heading[d]) * step_km[d] / KM_PER_DEGREE
+        self.lon[d] += np.sin(self.heading[d]) * step_km[d] / (KM_PER_DEGREE * cos_lat[d])
+
+        noise = GPS_NOISE_M / 1000 / KM_PER_DEGREE
+        self.report_lat = self.lat + rng.normal(0, noise, self.count)
+        self.report_lon = self.lon + rng.normal(0, noise, self.count) / cos_lat
+        slot = self.ticks % self.window
+        self.history_lat[:, slot] = self.report_lat
+        self.history_lon[:, slot] = self.report_lon
+        self.history_t[slot] = self.clock
+        self.ticks += 1
+
+    def recent(self, i, points):
+        """The last `points` reports of tourist i as (lat, lon, simulated seconds), oldest first."""
+        n = min(points, self.ticks, self.window)
+        slots = [(self.ticks - n + k) % self.window for k in range(n)]
+        return self.history_lat[i, slots], self.history_lon[i, slots], self.history_t[slots]
+
+    def timestamp(self, seconds):
+        return (self.start + timedelta(seconds=float(seconds))).isoformat(sep=' ')
+
+
+def export_paths(fleet, ticks, path):
+    """Write `ticks` steps of the fleet in the layout of simulation_paths.csv."""
+    frames = []
+    types = np.array((None,) + ANOMALY_TYPES, dtype=object)[fleet.kind]  # every point of a path carries its type
+    for _ in range(ticks):
+        fleet.step()
+        on = fleet.visible
+        frames.append(pd.DataFrame({
+            'tourist_id': np.array(fleet.ids)[on],
+            'lat': fleet.report_lat[on],
+            'lon': fleet.report_lon[on],
+            'timestamp': fleet.timestamp(fleet.clock),
+            'at_poi': (fleet.dwell_left > 0)[on],
+            'anomaly_type': types[on],
+            'path_type': fleet.path_type[on],
+        }))
+    df = pd.concat(frames, ignore_index=True)
+    df.sort_values(['tourist_id', 'timestamp'], kind='stable').to_csv(path, index=False)
+    return len(df)
+
+
+# --- Keep-Alive HTTP Client ---
+class HttpPool:
+    """Up to `size` pooled HTTP/1.1 connections to one host, for asyncio."""
+
+    def __init__(self, host, port, size=CONNECTIONS):
+        self.host, self.port = host, port
+        self.idle = []
+        self.slots = asyncio.Semaphore(size)
+
+    async def request(self, method, path, body=b'', content_type='application/json'):
+        """Returns (status, body bytes). A stale keep-alive connection is retried once on a new one."""
+        head = (f"{method} {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+                f"Content-Type: {content_type}\r\nContent-Length: {len(body)}\r\n\r\n").encode()
+        async with self.slots:
+            for attempt in range(2):
+                reused = bool(self.idle)
+                reader, writer = self.idle.pop() if reused else await asyncio.open_connection(self.host, self.port)
+                try:
+                    writer.write(head + body)
+                    status, keep_alive, payload = await self._response(reader)
+                except (ConnectionError, asyncio.IncompleteReadError) as e:
+                    writer.close()
+                    if reused and attempt == 0:
+                        continue  # the server closed an idle connection
+                    raise e
+                if keep_alive:
+                    self.idle.append((reader, writer))
+                else:
+                    writer.close()
+                return status, payload
+
+    async def _response(self, reader):
+        status_line = await reader.readuntil(b'\r\n')
+        version, status = status_line.split(b' ', 2)[:2]
+        headers = {}
+        while True:
+            line = await reader.readuntil(b'\r\n')
+            if line == b'\r\n':
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip().lower()
+        keep_alive = version == b'HTTP/1.1' and headers.get('connection') != 'close'
+        if headers.get('transfer-encoding') == 'chunked':
+            chunks = []
+            while True:
+                size = int((await reader.readuntil(b'\r\n')).split(b';')[0], 16)
+                chunks.append(await reader.readexactly(size + 2))
+                if size == 0:
+                    break
+            payload = b''.join(chunk[:-2] for chunk in chunks)
+        elif 'content-length' in headers:
+            payload = await reader.readexactly(int(headers['content-length']))
+        else:
+            payload, keep_alive = await reader.read(), False
+        return int(status), keep_alive, payload
+
+    def close(self):
+        for _, writer in self.idle:
+            writer.close()
+        self.idle.clear()
+
+
+# --- Payloads ---
+def _points_json(lat, lon, timestamps=None, tourist_id=None):
+    if timestamps is None:
+        return ','.join(f'{{"lat":{a:.7f},"lon":{b:.7f}}}' for a, b in zip(lat.tolist(), lon.tolist()))
+    return ','.join(f'{{"tourist_id":"{tourist_id}","lat":{a:.7f},"lon":{b:.7f},"timestamp":"{t}"}}'
+                    for a, b, t in zip(lat.tolist(), lon.tolist(), timestamps))
+
+
+def visit_requests(fleet, i, server, window):
+    """(endpoint, body) pairs one tourist sends for the current tick, in order."""
+    tourist_id, path_type = fleet.ids[i], fleet.path_type[i]
+    lat, lon = fleet.report_lat[i], fleet.report_lon[i]
+    if server == 'mock':
+        update = (f'{{"tourist_id":"{tourist_id}","lat":{lat:.7f},"lon":{lon:.7f},'
+                  f'"path_type":"{path_type}"}}')
+        path_lat, path_lon, _ = fleet.recent(i, window)
+        predict = (f'{{"tourist_id":"{tourist_id}","path_type":"{path_type}",'
+                   f'"path":[{_points_json(path_lat, path_lon)}]}}')
+        return [('/update_location', update), ('/predict', predict)]
+    # app.py: the newest point with streaming features, or the last `window` points
+    path_lat, path_lon, seconds = fleet.recent(i, window or 1)
+    points = _points_json(path_lat, path_lon, [fleet.timestamp(s) for s in seconds], tourist_id)
+    stream = ',"stream":true' if not window else ''
+    return [('/predict', f'{{"tourist_id":"{tourist_id}"{stream},"path":[{points}]}}')]
+
+
+# --- Driving One Shard ---
+class StageRecorder:
+    """Client-side results of one ramp step in one process."""
+
+    def __init__(self):
+        self.latency = defaultdict(lambda: np.zeros(len(LATENCY_BUCKETS_MS) + 1, dtype=np.int64))
+        self.errors = Counter()
+        self.requests = Counter()
+        self.late = 0
+        self.visits = 0
+        self.seconds = 0.0
+
+    def record(self, endpoint, seconds, error=None):
+        self.requests[endpoint] += 1
+        self.latency[endpoint][np.searchsorted(LATENCY_BUCKETS_MS, seconds * 1000)] += 1
+        if error is not None:
+            self.errors[f"{endpoint} {error}"] += 1
+
+    def export(self):
+        return {'latency': {k: v.tolist() for k, v in self.latency.items()}, 'errors': dict(self.errors),
+                'requests': dict(self.requests), 'late': self.late, 'visits': self.visits,
+                'seconds': self.seconds}
+
+
+async def _visit(pool, recorder, requests, busy, i):
+    try:
+        for endpoint, body in requests:
+            start = time.perf_counter()
+            try:
+                status, _ = await pool.request('POST', endpoint, body.encode())
+                error = None if status < 400 else str(status)
+            except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+                error = type(e).__name__
+            recorder.record(endpoint, time.perf_counter() - start, error)
+            if error is not None:
+                break
+    finally:
+        busy.discard(i)
+
+
+async def _register(pool, fleet, indices):
+    """Start tracking synthetic tourists on the mock server (it only moves tourists it knows)."""
+    async def one(i):
+        body = json.dumps({'tourist_id': fleet.ids[i], 'lat': float(fleet.report_lat[i]),
+                           'lon': float(fleet.report_lon[i]), 'path_type': str(fleet.path_type[i])})
+        await pool.request('POST', '/start_tourist', body.encode())
+    for start in range(0, len(indices), 1000):
+        await asyncio.gather(*(one(i) for i in indices[start:start + 1000]))
+
+
+async def drive_stage(fleet, url, server, active, registered, duration, tick, window, connections):
+    """Run `active` tourists of this shard for `duration` seconds. Returns the exported StageRecorder."""
+    parts = urlsplit(url)
+    pool = HttpPool(parts.hostname, parts.port or 80, connections)
+    recorder = StageRecorder()
+    if server == 'mock' and active > registered:
+        await _register(pool, fleet, range(registered, active))
+    order = np.argsort(fleet.phase[:active], kind='stable')
+    bounds = np.searchsorted(fleet.phase[order], np.linspace(0, 1, SLOTS_PER_TICK + 1))
+    busy, tasks = set(), set()
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    for k in range(max(1, round(duration / tick))):
+        fleet.step()
+        for s in range(SLOTS_PER_TICK):
+            delay = start + (k + s / SLOTS_PER_TICK) * tick - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            for i in order[bounds[s]:bounds[s + 1]].tolist():
+                if not fleet.visible[i]:
+                    continue
+                recorder.visits += 1
+                if i in busy:
+                    recorder.late += 1
+                    continue
+                busy.add(i)
+                task = asyncio.create_task(_visit(pool, recorder, visit_requests(fleet, i, server, window), busy, i))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+    if tasks:
+        await asyncio.wait(tasks, timeout=max(tick, 10))
+    recorder.seconds = loop.time() - start
+    for task in list(tasks):
+        task.cancel()
+    pool.close()
+    return recorder.export()
+
+
+def run_shard(shard, config, commands, results):
+    """Client process: owns one slice of the fleet and runs each ramp step it is told to."""
+    pois, share, mix = dataset_profile()
+    fleet = SyntheticFleet(config['shard_size'], pois, share, mix, seed=config['seed'] + shard,
+                           first_id=shard * config['shard_size'], sim_seconds=config['sim_seconds'],
+                           window=max(config['window'], 1))
+    registered = 0
+    while True:
+        active = commands.get()
+        if active is None:
+            return
+        results.put(asyncio.run(drive_stage(fleet, config['url'], config['server'], active, registered,
+                                            config['duration'], config['tick'], config['window'],
+                                            config['connections'])))
+        registered = max(registered, active)
+
+
+# --- Server-Side Latency ---
+def scrape_latency(url):
+    """{route: (bucket bounds, cumulative counts, sum)} of http_request_duration_seconds, or {} without /metrics."""
+    from urllib.request import urlopen
+    try:
+        with urlopen(url.rstrip('/') + '/metrics', timeout=10) as response:
+            text = response.read().decode()
+    except OSError:
+        return {}
+    series, sums = defaultdict(dict), Counter()
+    for line in text.splitlines():
+        name, _, rest = line.partition('{')
+        if name not in ('http_request_duration_seconds_bucket', 'http_request_duration_seconds_sum'):
+            continue
+        labels, value = rest.rsplit('} ', 1)
+        fields = {key: value.strip('"') for key, value in (item.split('=', 1) for item in labels.split(','))}
+        if name.endswith('_sum'):
+            sums[fields['route']] += float(value)
+        else:
+            bound = float('inf') if fields['le'] == '+Inf' else float(fields['le'])
+            buckets = series[fields['route']]
+            buckets[bound] = buckets.get(bound, 0.0) + float(value)  # summed over methods
+    return {route: (sorted(buckets), [buckets[b] for b in sorted(buckets)], sums[route])
+            for route, buckets in series.items()}
+
+
+def histogram_quantile(bounds, cumulative, q):
+    """Quantile of a cumulative bucket histogram, interpolated within the bucket (Prometheus style)."""
+    total = cumulative[-1]
+    if total <= 0:
+        return None
+    rank = q * total
+    i = next(i for i, count in enumerate(cumulative) if count >= rank)
+    if math.isinf(bounds[i]):
+        return bounds[i - 1] if i else None
+    lower = bounds[i - 1] if i else 0.0
+    below = cumulative[i - 1] if i else 0.0
+    inside = cumulative[i] - below
+    return lower + (bounds[i] - lower) * ((rank - below) / inside if inside else 1.0)
+
+
+def server_side(before, after):
+    """Mean and p99 (bucket-interpolated) in ms per route for the requests served between two scrapes."""
+    report = {}
+    for route, (bounds, counts, total) in after.items():
+        old_bounds, old_counts, old_total = before.get(route, ([], [], 0.0))
+        old = dict(zip(old_bounds, old_counts))
+        delta = [count - old.get(bound, 0) for bound, count in zip(bounds, counts)]
+        if delta and delta[-1] > 0:
+            report[route] = {'count': int(delta[-1]),
+                             'mean_ms': (total - old_total) / delta[-1] * 1000,
+                             'p99_ms': histogram_quantile(bounds, delta, 0.99) * 1000}
+    return report
+
+
+# --- Reporting ---
+def client_percentile(counts, q):
+    cumulative = np.cumsum(counts)
+    i = int(np.searchsorted(cumulative, q * cumulative[-1]))
+    return float(LATENCY_BUCKETS_MS[min(i, len(LATENCY_BUCKETS_MS) - 1)])
+
+
+def merge(shard_results):
+    merged = {'latency': {}, 'errors': Counter(), 'requests': Counter(), 'late': 0, 'visits': 0, 'seconds': 0.0}
+    for result in shard_results:
+        for endpoint, counts in result['latency'].items():
+            merged['latency'][endpoint] = merged['latency'].get(endpoint, 0) + np.array(counts)
+        merged['errors'].update(result['errors'])
+        merged['requests'].update(result['requests'])
+        merged['late'] += result['late']
+        merged['visits'] += result['visits']
+        merged['seconds'] = max(merged['seconds'], result['seconds'])
+    return merged
+
+
+def print_step(tourists, merged, per_visit, server):
+    seconds = merged['seconds']
+    offered = merged['visits'] * per_visit / seconds
+    requests = sum(merged['requests'].values())
+    errors = sum(merged['errors'].values())
+    late = merged['late'] / max(merged['visits'], 1) * 100
+    print(f"\n{tourists} tourists: offered {offered:,.0f} req/s, achieved {requests / seconds:,.0f} req/s, "
+          f"errors {errors / max(requests, 1) * 100:.2f}%, late {late:.1f}%")
+    print(f"  {'endpoint':<20}{'count':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'srv mean':>10}{'srv p99':>10}")
+    for endpoint, counts in sorted(merged['latency'].items()):
+        side = server.get(endpoint, {})
+        print(f"  {endpoint:<20}{int(counts.sum()):>9}{client_percentile(counts, 0.5):>10.1f}"
+              f"{client_percentile(counts, 0.95):>10.1f}{client_percentile(counts, 0.99):>10.1f}"
+              + (f"{side['mean_ms']:>10.1f}{side['p99_ms']:>10.1f}" if side else f"{'-':>10}{'-':>10}"))
+    for error, count in merged['errors'].most_common(5):
+        print(f"  ❌ {error}: {count}")
+
+
+def main():
+    import argparse
+    from multiprocessing import Process, Queue
+
+    parser = argparse.ArgumentParser(description="Drive a synthetic tourist fleet against the mock or AI server")
+    parser.add_argument('--server', choices=['mock', 'app'], default='mock', help="which server's endpoints to drive")
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--tourists', default='1000,10000,100000', help="comma-separated ramp of fleet sizes")
+    parser.add_argument('--duration', type=float, default=30, help="seconds per ramp step")
+    parser.add_argument('--tick', type=float, default=TICK_SECONDS, help="seconds between reports per tourist")
+    parser.add_argument('--sim-seconds', type=float, default=SIM_SECONDS, help="simulated seconds per tick")
+    parser.add_argument('--window', type=int, default=None,
+                        help="points per /predict (mock default 32; app default 0 = newest point with stream=true)")
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 1, help="client processes")
+    parser.add_argument('--connections', type=int, default=CONNECTIONS, help="keep-alive connections per process")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-reset', action='store_true', help="don't call /reset_simulation first (mock)")
+    parser.add_argument('--export', type=int, metavar='N', help="only write N synthetic tourists to --out as CSV")
+    parser.add_argument('--ticks', type=int, default=240, help="ticks to export")
+    parser.add_argument('--out', help="results JSON (load mode) or CSV (--export)")
+    args = parser.parse_args()
+
+    if args.export:
+        pois, share, mix = dataset_profile()
+        fleet = SyntheticFleet(args.export, pois, share, mix, seed=args.seed, sim_seconds=args.sim_seconds)
+        out = args.out or 'synthetic_paths.csv'
+        rows = export_paths(fleet, args.ticks, out)
+        print(f"✅ Wrote {rows} points of {args.export} synthetic tourists to '{out}'.")
+        return
+
+    ramp = [int(count) for count in args.tourists.split(',')]
+    window = args.window if args.window is not None else (32 if args.server == 'mock' else 0)
+    processes = max(1, min(args.processes, ramp[-1]))
+    config = {'url': args.url, 'server': args.server, 'shard_size': -(-ramp[-1] // processes),
+              'seed': args.seed, 'sim_seconds': args.sim_seconds, 'window': window, 'duration': args.duration,
+              'tick': args.tick, 'connections': args.connections}
+
+    if args.server == 'mock' and not args.no_reset:
+        from urllib.request import urlopen
+        urlopen(args.url.rstrip('/') + '/reset_simulation', timeout=30).read()
+
+    results = Queue()
+    shards = []
+    for s in range(processes):
+        commands = Queue()
+        shards.append((commands, Process(target=run_shard, args=(s, config, commands, results), daemon=True)))
+    for _, process in shards:
+        process.start()
+
+    print(f"Driving {args.server} at {args.url}: ramp {ramp}, one report per {args.tick}s, "
+          f"{processes} client process(es) x {args.connections} connections")
+    report = []
+    try:
+        for tourists in ramp:
+            before = scrape_latency(args.url)
+            for s, (commands, _) in enumerate(shards):
+                commands.put(tourists // processes + (s < tourists % processes))
+            merged = merge(results.get() for _ in shards)
+            server = server_side(before, scrape_latency(args.url))
+            print_step(tourists, merged, 2 if args.server == 'mock' else 1, server)
+            report.append({
+                'tourists': tourists,
+                'seconds': merged['seconds'],
+                'requests': dict(merged['requests']),
+                'errors': dict(merged['errors']),
+                'late': merged['late'],
+                'visits': merged['visits'],
+                'client': {endpoint: {f'p{q}_ms': client_percentile(counts, q / 100) for q in (50, 95, 99)}
+                           for endpoint, counts in merged['latency'].items()},
+                'server': server,
+            })
+    finally:
+        for commands, process in shards:
+            commands.put(None)
+        for _, process in shards:
+            process.join(timeout=30)
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump({'config': vars(args), 'steps': report}, f, indent=2)
+        print(f"\n✅ Results saved to '{args.out}'.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# --- Compact Ring-Buffer Log Storage ---
+# Each tourist's log is a fixed-capacity ring buffer of typed NumPy columns
+# (float64 lat/lon, int64 epoch microseconds, uint8 status code) instead of a
+# list of dicts. Appends are O(1) and never copy; once the buffer is full the
+# oldest entry is overwritten and handed back to the caller.
+
+import time
+from datetime import datetime
+
+import numpy as np
+
+LOG_CAPACITY = 1000
+
+STATUS_NAMES = ["normal", "anomaly", "sos"]
+STATUS_CODES = {name: code for code, name in enumerate(STATUS_NAMES)}
+
+
+def now_us():
+    """Current wall-clock time as epoch microseconds."""
+    return time.time_ns() // 1000
+
+def to_epoch_us(value):
+    """Epoch microseconds from an ISO timestamp or epoch seconds (as sent in query strings)."""
+    try:
+        return int(float(value) * 1_000_000)
+    except ValueError:
+        return int(datetime.fromisoformat(value).timestamp() * 1_000_000)
+
+def to_iso(epoch_us):
+    return datetime.fromtimestamp(epoch_us / 1_000_000).isoformat()
+
+
+class TouristLogBuffer:
+    """Fixed-capacity ring buffer of one tourist's log points, oldest first."""
+
+    def __init__(self, capacity=LOG_CAPACITY):
+        self.capacity = capacity
+        self.lat = np.full(capacity, np.nan)
+        self.lon = np.full(capacity, np.nan)
+        self.timestamp = np.zeros(capacity, dtype=np.int64)
+        self.status = np.zeros(capacity, dtype=np.uint8)
+        self.start = 0  # slot of the oldest entry
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def append(self, lat, lon, status, timestamp_us=None):
+        """Add a point. Returns the evicted (lat, lon, status) when the buffer was full, else None."""
+        if self.size < self.capacity:
+            slot = (self.start + self.size) % self.capacity
+            self.size += 1
+            evicted = None
+        else:
+            slot = self.start
+            self.start = (self.start + 1) % self.capacity
+            evicted = self._point(slot)
+
+        self.lat[slot] = np.nan if lat is None else lat
+        self.lon[slot] = np.nan if lon is None else lon
+        self.timestamp[slot] = now_us() if timestamp_us is None else timestamp_us
+        self.status[slot] = STATUS_CODES.get(status, STATUS_CODES["normal"])
+        return evicted
+
+    def _point(self, slot):
+        lat, lon = self.lat[slot], self.lon[slot]
+        return (
+            None if np.isnan(lat) else float(lat),
+            None if np.isnan(lon) else float(lon),
+            STATUS_NAMES[self.status[slot]],
+        )
+
+    def slots(self, since=None, until=None, limit=None):
+        """Slots in time order, for entries after `since` and before `until` (epoch µs)."""
+        slots = (self.start + np.arange(self.size)) % self.capacity
+        # Entries are appended in time order, so the time range is a binary search away
+        times = self.timestamp[slots]
+        lo = 0 if since is None else np.searchsorted(times, since, side='right')
+        hi = self.size if until is None else np.searchsorted(times, until, side='left')
+        if limit is not None:
+            hi = min(hi, lo + limit)
+        return slots[lo:hi]
+
+    def columns(self, since=None, until=None):
+        """Copies of (lat, lon, timestamp, status) in time order, e.g. for a snapshot."""
+        slots = self.slots(since, until)
+        return self.lat[slots], self.lon[slots], self.timestamp[slots], self.status[slots]
+
+    @classmethod
+    def from_columns(cls, lat, lon, timestamp, status, capacity=LOG_CAPACITY):
+        """A buffer holding the last `capacity` of the given entries (oldest first)."""
+        buffer = cls(capacity)
+        n = min(len(lat), capacity)
+        buffer.lat[:n] = lat[len(lat) - n:]
+        buffer.lon[:n] = lon[len(lon) - n:]
+        buffer.timestamp[:n] = timestamp[len(timestamp) - n:]
+        buffer.status[:n] = status[len(status) - n:]
+        buffer.size = n
+        return buffer
+
+    def entries(self, tourist_id, since=None, until=None, limit=None):
+        """Log entries as the dicts /get_logs has always returned."""
+        entries = []
+        for slot in self.slots(since, until, limit):
+            lat, lon, status = self._point(slot)
+            entries.append({
+                "tourist_id": tourist_id,
+                "lat": lat,
+                "lon": lon,
+                "timestamp": to_iso(int(self.timestamp[slot])),
+                "status": status,
+            })
+        return entries
@@ -0,0 +1,282 @@
+# --- Prometheus-Style Metrics ---
+# A small, dependency-free metrics layer for both servers. instrument(app)
+# adds a GET /metrics endpoint in the Prometheus text format with:
+#   http_requests_total{method,route,status}           counter
+#   http_request_duration_seconds{method,route}        histogram (until the response object
+#                                                      is returned; streamed bodies excluded)
+#   <prefix>_stage_duration_seconds{stage}             histogram, from `with metrics.stage(...)`
+#   any gauges registered with gauge(), read at scrape time (process RSS is always there)
+# Routes are labelled by their URL rule ("/get_logs/<string:tourist_id>"), so
+# label cardinality stays fixed.
+#
+# With enabled=False (METRICS=0) no hooks or routes are installed and stage()
+# hands back one shared no-op context manager.
+#
+# SamplingProfiler is opt-in (PROFILER=1): GET /debug/profile?seconds=5&hz=100
+# samples every thread's stack and returns folded stacks, the input format of
+# flamegraph.pl and speedscope.
+#
+# Run this file directly for an overhead measurement.
+
+import contextlib
+import os
+import resource
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter as Tally
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+PROFILE_MAX_SECONDS = 60
+
+_NULL_STAGE = contextlib.nullcontext()
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name, self.help, self.label_names = name, help, tuple(labels)
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self.values.items())
+        for label_values, value in items:
+            lines.append(f"{self.name}{_labels(self.label_names, label_values)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.label_names = name, help, tuple(labels)
+        self.buckets = tuple(buckets)
+        self.series = {}  # label values -> [per-bucket counts (last is +Inf), sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self.series.get(label_values)
+            if series is None:
+                series = self.series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((key, ([*counts], total, count)) for key, (counts, total, count) in self.series.items())
+        for label_values, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                labels = _labels(self.label_names, label_values, [('le', _number(bound))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _labels(self.label_names, label_values)
+            lines.append(f"{self.name}_sum{labels} {_number(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Gauge:
+    """A value read from `fn` at scrape time."""
+
+    def __init__(self, name, help, fn):
+        self.name, self.help, self.fn = name, help, fn
+
+    def render(self):
+        try:
+            value = self.fn()
+        except Exception:
+            return []  # a failing gauge must not break the whole scrape
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge", f"{self.name} {_number(value)}"]
+
+
+class _StageTimer:
+    __slots__ = ('histogram', 'name', 'start')
+
+    def __init__(self, histogram, name):
+        self.histogram, self.name = histogram, name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, self.name)
+        return False
+
+
+def resident_memory_bytes():
+    """Current RSS from /proc, or the peak RSS where /proc is not available."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class Metrics:
+    """One server's metrics. `prefix` names its stage histogram, e.g. "predict"."""
+
+    def __init__(self, prefix, enabled=True):
+        self.enabled = enabled
+        self.metrics = []
+        self.requests = self.counter("http_requests_total", "HTTP requests served.", ("method", "route", "status"))
+        self.latency = self.histogram("http_request_duration_seconds", "HTTP request latency.", ("method", "route"))
+        self.stages = self.histogram(f"{prefix}_stage_duration_seconds", "Time per pipeline stage.", ("stage",))
+        self.gauge("process_resident_memory_bytes", "Resident set size of this process.", resident_memory_bytes)
+
+    def counter(self, name, help, labels=()):
+        metric = Counter(name, help, labels)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, help, labels, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def gauge(self, name, help, fn):
+        metric = Gauge(name, help, fn)
+        self.metrics.append(metric)
+        return metric
+
+    def stage(self, name):
+        """Context manager timing one pipeline stage (no-op when disabled)."""
+        if not self.enabled:
+            return _NULL_STAGE
+        return _StageTimer(self.stages, name)
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def instrument(self, app, profiler=False):
+        """Install the request hooks and /metrics (and /debug/profile when profiler is set) on a Flask app."""
+        from flask import Response, g, request
+
+        if profiler:
+            @app.route("/debug/profile")
+            def debug_profile():
+                try:
+                    seconds = min(float(request.args.get("seconds", 5)), PROFILE_MAX_SECONDS)
+                    hz = float(request.args.get("hz", 100))
+                except ValueError:
+                    return Response("Invalid seconds or hz\n", status=400, mimetype="text/plain")
+                return Response(SamplingProfiler(hz).run(seconds), mimetype="text/plain")
+
+        if not self.enabled:
+            return
+
+        @app.before_request
+        def start_timer():
+            g.metrics_start = time.perf_counter()
+
+        @app.after_request
+        def record_request(response):
+            start = g.pop('metrics_start', None)
+            if start is not None:
+                route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+                self.latency.observe(time.perf_counter() - start, request.method, route)
+                self.requests.inc(request.method, route, str(response.status_code))
+            return response
+
+        @app.route("/metrics")
+        def metrics():
+            return Response(self.render(), mimetype="text/plain; version=0.0.4")
+
+
+# --- Sampling Profiler ---
+class SamplingProfiler:
+    """Samples the stacks of all other threads `hz` times a second."""
+
+    def __init__(self, hz=100):
+        self.interval = 1.0 / max(hz, 1.0)
+
+    def run(self, seconds):
+        """Sample for `seconds`, then return folded stacks ("thread;file:function;... count" lines)."""
+        me = threading.get_ident()
+        stacks = Tally()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                calls = []
+                while frame is not None:
+                    code = frame.f_code
+                    calls.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                stacks[';'.join([names.get(ident, str(ident))] + calls[::-1])] += 1
+            time.sleep(self.interval)
+        return ''.join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+# --- Overhead Measurement ---
+# Times a trivial Flask route with and without instrumentation, and one
+# stage() block enabled and disabled.
+if __name__ == "__main__":
+    from flask import Flask
+
+    def make_app(metrics):
+        app = Flask(__name__)
+
+        @app.route("/ping/<string:name>")
+        def ping(name):
+            with metrics.stage("work"):
+                return "ok"
+
+        metrics.instrument(app)
+        return app
+
+    REQUESTS = 2000
+    clients = {enabled: make_app(Metrics("demo", enabled=enabled)).test_client() for enabled in (False, True)}
+    timings = {False: [], True: []}
+    for _ in range(5):  # alternate, best of five
+        for enabled, client in clients.items():
+            start = time.perf_counter()
+            for i in range(REQUESTS):
+                client.get(f"/ping/t{i}")
+            timings[enabled].append((time.perf_counter() - start) / REQUESTS)
+    timings = {enabled: min(values) for enabled, values in timings.items()}
+    print(f"Request through the test client: {timings[False] * 1e6:.0f} us uninstrumented, "
+          f"{timings[True] * 1e6:.0f} us instrumented (+{(timings[True] - timings[False]) * 1e6:.0f} us)")
+
+    for enabled in (False, True):
+        metrics = Metrics("demo", enabled=enabled)
+        start = time.perf_counter()
+        for _ in range(200000):
+            with metrics.stage("work"):
+                pass
+        print(f"stage() {'enabled' if enabled else 'disabled'}: {(time.perf_counter() - start) / 200000 * 1e9:.0f} ns")
+
+    text = clients[True].get("/metrics").get_data(as_text=True)
+    ok = 'demo_stage_duration_seconds_count{stage="work"}' in text and 'route="/ping/<string:name>"' in text
+    print("✅ /metrics renders requests, stages and RSS." if ok and "process_resident_memory_bytes" in text
+          else "❌ /metrics output is missing series.")
@@ -1,48 +1,150 @@
 # --- Mock API Server for SIH Project Simulation (Multi-Tourist Version) ---
 
-import pandas as pd
-from flask import Flask, jsonify, request
+from flask import Flask, jsonify, request, Response
 from flask_cors import CORS
+import os
 import time
-from datetime import datetime
-import threading
+import asyncio
+import numpy as np
+from heatmap_index import GridDensityIndex, DEFAULT_ZOOM, parse_bbox
+from log_buffer import to_epoch_us
+from live_events import LiveEventBroker, event_stream
+from state_store import TouristStateStore
+from alert_store import ALERT_CAPACITY, COALESCE_SECONDS
+from path_store import PathStore
+from async_inference import AsyncInferenceRunner
+from geofence import GEOFENCE_FILE, EXIT_FIXES, load_tracker
+from inactivity import InactivityDetector, DROP_OFF_SECONDS, INACTIVITY_SECONDS
+from persistence import StatePersistence, SNAPSHOT_SECONDS
+from wire_format import read_payload
+from geo_export import line_feature, METHODS
+from metrics import Metrics
+from nearby import PositionIndex, RESPONDERS_FILE, NEAREST_RESPONDERS, MAX_SEARCH_KM, load_responders
+from crowd_density import CrowdMonitor, CROWD_CAPACITY, WINDOWS, ALERT_WINDOW, DENSITY_ZOOM
 
 # --- Setup ---
 app = Flask(__name__)
 CORS(app)
 
 try:
-    df_simulation = pd.read_csv("simulation_paths.csv")
+    # Parsed once into per-tourist column slices (cached next to the CSV)
+    path_store = PathStore.load("simulation_paths.csv")
     print("✅ 'simulation_paths.csv' loaded successfully.")
 except FileNotFoundError:
     print("❌ CRITICAL ERROR: 'simulation_paths.csv' not found.")
-    df_simulation = None
+    path_store = None
 
 # --- In-Memory State Management for MULTIPLE tourists ---
-live_tourist_data = {}
-tourist_logs = {}  # New dictionary to store logs for each tourist
-safety_alerts = []  # Global list for safety alerts
-anomaly_detected_tourists = set()  # Track which tourists have already triggered anomaly alerts
-
-# --- Log Management Functions ---
-def add_log_entry(tourist_id, lat, lon, status):
-    """Add a new log entry for a tourist"""
-    if tourist_id not in tourist_logs:
-        tourist_logs[tourist_id] = []
-    
-    log_entry = {
-        "tourist_id": tourist_id,
-        "lat": lat,
-        "lon": lon,
-        "timestamp": datetime.now().isoformat(),
-        "status": status
-    }
-    
-    tourist_logs[tourist_id].append(log_entry)
-    
-    # Keep only the last 1000 entries to prevent memory issues
-    if len(tourist_logs[tourist_id]) > 1000:
-        tourist_logs[tourist_id] = tourist_logs[tourist_id][-1000:]
+# Live records, ring-buffer logs, anomaly flags and safety alerts live in a
+# sharded, lock-protected store so threaded handlers can't corrupt them.
+# Alerts keep the newest ALERT_CAPACITY; repeated SOS presses within
+# SOS_COALESCE_SECONDS (anomaly flags: ANOMALY_COALESCE_SECONDS) are merged.
+heatmap_index = GridDensityIndex()  # Grid-bucketed log density, kept in step with the logs
+live_events = LiveEventBroker()  # Sequenced live-state changes pushed to dashboards
+positions = PositionIndex()  # Current tourist positions for /nearby, moved in place on every update
+state = TouristStateStore(
+    heatmap_index=heatmap_index,
+    events=live_events,
+    position_index=positions,
+    alert_capacity=int(os.environ.get("ALERT_CAPACITY", ALERT_CAPACITY)),
+    coalesce_seconds={
+        "sos": float(os.environ.get("SOS_COALESCE_SECONDS", COALESCE_SECONDS["sos"])),
+        "anomaly": float(os.environ.get("ANOMALY_COALESCE_SECONDS", COALESCE_SECONDS["anomaly"])),
+    },
+)
+
+# --- Serving Process ---
+# `python mock_api_server.py` runs with the debug reloader: a parent process
+# that only watches the source files and restarts the child that actually
+# serves (WERKZEUG_RUN_MAIN=true). Journaling and the background detectors
+# run in the serving process only; two processes writing snapshots into the
+# same STATE_DIR would let the parent's empty state replace the real one.
+SERVING = __name__ != "__main__" or os.environ.get("WERKZEUG_RUN_MAIN") == "true"
+
+# --- Persistence ---
+# Opt-in: with STATE_DIR set (e.g. STATE_DIR=state), changes are journaled to a
+# write-ahead log there with periodic snapshots; on start the last snapshot is
+# loaded and the journal tail replayed. Without it the state is in memory only,
+# so in-process users (benchmark.py, tests) never touch a real state directory.
+STATE_DIRECTORY = os.environ.get("STATE_DIR", "")
+if STATE_DIRECTORY and SERVING:
+    persistence = StatePersistence(
+        state, STATE_DIRECTORY, snapshot_interval=float(os.environ.get("SNAPSHOT_SECONDS", SNAPSHOT_SECONDS))
+    )
+    persistence.recover()
+    persistence.start()
+else:
+    persistence = None
+
+# --- Prediction Serving Mode ---
+# "sync": /predict holds its worker thread for the simulated model latency.
+# "async": /predict queues the job on an asyncio loop and answers 202 at once;
+# the result reaches clients through the live status and the alert list.
+PREDICT_MODE = os.environ.get("PREDICT_MODE", "sync")
+PREDICT_LATENCY = float(os.environ.get("PREDICT_LATENCY", "0.1"))  # seconds
+inference_runner = AsyncInferenceRunner() if PREDICT_MODE == "async" else None
+
+async def run_prediction(tourist_id, is_anomaly):
+    await asyncio.sleep(PREDICT_LATENCY)  # stands in for model latency without blocking a thread
+    state.apply_prediction(tourist_id, is_anomaly)
+
+# --- Geofencing ---
+# Restricted / high-risk zones; entering or leaving one raises a safety alert.
+# Geofencing is off when the zone file is missing. A tourist leaves a zone after
+# GEOFENCE_EXIT_FIXES consecutive reports outside it (boundary jitter is ignored).
+geofences = load_tracker(os.environ.get("GEOFENCE_FILE", GEOFENCE_FILE),
+                         exit_fixes=int(os.environ.get("GEOFENCE_EXIT_FIXES", EXIT_FIXES)))
+
+def record_geofences(tourist_ids, located):
+    """Track zone membership for located positions and raise enter/exit alerts."""
+    for event, tourist_id, zone_id, name, zone_type in geofences.record(tourist_ids, located):
+        verb = "entered" if event == "enter" else "left"
+        state.add_alert(f"geofence_{event}", tourist_id, f"Tourist {verb} {zone_type.replace('_', '-')} zone '{name}' ({zone_id}).")
+
+# --- Inactivity / Drop-off Detection ---
+# Every report re-arms per-tourist deadlines on a timer wheel; a background
+# thread raises "drop_off" (no updates) and "inactivity" (no movement) alerts.
+inactivity = InactivityDetector(
+    state,
+    drop_off_seconds=float(os.environ.get("DROP_OFF_SECONDS", DROP_OFF_SECONDS)),
+    inactivity_seconds=float(os.environ.get("INACTIVITY_SECONDS", INACTIVITY_SECONDS)),
+)
+if SERVING:
+    inactivity.start()
+
+# --- Crowd Density ---
+# Distinct tourists per ~150 m cell over sliding windows (CROWD_WINDOWS, in
+# seconds), fed by /update_location. A cell reaching CROWD_CAPACITY tourists
+# within CROWD_ALERT_WINDOW raises an "overcrowding" alert.
+crowd = CrowdMonitor(
+    state,
+    capacity=int(os.environ.get("CROWD_CAPACITY", CROWD_CAPACITY)),
+    windows=[int(w) for w in os.environ.get("CROWD_WINDOWS", ",".join(map(str, WINDOWS))).split(",")],
+    alert_window=int(os.environ.get("CROWD_ALERT_WINDOW", ALERT_WINDOW)),
+    zoom=int(os.environ.get("CROWD_ZOOM", DENSITY_ZOOM)),
+)
+if SERVING:
+    crowd.start()
+
+# --- Responders ---
+# Police posts, rescue teams, ... from RESPONDERS_FILE plus any registered via
+# POST /responders (kept in memory only). Every SOS alert lists the nearest.
+responders = load_responders(os.environ.get("RESPONDERS_FILE", RESPONDERS_FILE))
+NEAREST_RESPONDER_COUNT = int(os.environ.get("NEAREST_RESPONDERS", NEAREST_RESPONDERS))
+
+# --- Metrics ---
+# Prometheus-style /metrics (metrics.py): route latencies, geofence check
+# timings and gauges for the in-memory state. METRICS=0 turns it off;
+# PROFILER=1 adds the sampling profiler at /debug/profile.
+metrics = Metrics("mock", enabled=os.environ.get("METRICS", "1") == "1")
+metrics.instrument(app, profiler=os.environ.get("PROFILER", "0") == "1")
+metrics.gauge("tourists_tracked", "Tourists with a live record.", lambda: state.stats()["tourists"])
+metrics.gauge("log_entries", "Entries held in the tourists' log ring buffers.", lambda: state.stats()["log_entries"])
+metrics.gauge("safety_alerts", "Alerts held in the alert store.", lambda: state.stats()["alerts"])
+metrics.gauge("live_events_published", "Live-state events published since start.", lambda: live_events.seq)
+metrics.gauge("crowd_active_cells", "Grid cells with a report in the longest crowd window.", lambda: len(crowd.cells))
+if inference_runner:
+    metrics.gauge("prediction_jobs_pending", "Queued or running async predictions.", lambda: inference_runner.pending)
 
 # --- API Endpoints ---
 
@@ -52,28 +154,20 @@ def home():
 
 @app.route("/reset_simulation", methods=["GET"])
 def reset_simulation():
-    global live_tourist_data, tourist_logs, safety_alerts, anomaly_detected_tourists
-    live_tourist_data = {}
-    tourist_logs = {}
-    safety_alerts = []
-    anomaly_detected_tourists = set()
+    state.reset()
+    inactivity.reset()
+    crowd.reset()
+    if geofences:
+        geofences.reset()
     return jsonify({"status": "Simulation reset"})
 
 @app.route("/get_tourist_ids")
 def get_tourist_ids():
-    if df_simulation is None:
+    if path_store is None:
         return jsonify({"error": "Dataset not loaded"}), 500
 
-    normal_ids = (
-        df_simulation[df_simulation["path_type"] == "normal"]["tourist_id"]
-        .unique()
-        .tolist()
-    )
-    anomaly_ids = (
-        df_simulation[df_simulation["path_type"] == "anomaly"]["tourist_id"]
-        .unique()
-        .tolist()
-    )
+    normal_ids = path_store.ids_by_type.get("normal", [])
+    anomaly_ids = path_store.ids_by_type.get("anomaly", [])
 
     return jsonify({"normal": normal_ids, "anomaly": anomaly_ids})
 
@@ -82,88 +176,89 @@ def get_path():
     tourist_id = request.args.get("id")
     req_type = request.args.get("type")
 
-    path_df = df_simulation[df_simulation["tourist_id"] == tourist_id]
+    if path_store is None:
+        return jsonify({"error": "Dataset not loaded"}), 500
 
-    if path_df.empty:
+    if tourist_id not in path_store:
         return jsonify({"error": "Tourist ID not found"}), 404
 
-    actual_type = path_df["path_type"].iloc[0]
+    path = path_store.path(tourist_id)
+    actual_type = path.path_type
     if req_type and req_type != actual_type:
         return jsonify({"error": "Path type mismatch"}), 400
 
-    path_data = path_df[["lat", "lon"]].to_dict("records")
+    path_data = [{"lat": lat, "lon": lon} for lat, lon in zip(path.lat.tolist(), path.lon.tolist())]
 
     # Initialize this tourist's data in our live state
-    live_tourist_data[tourist_id] = {
-        "lat": path_data[0]["lat"],
-        "lon": path_data[0]["lon"],
-        "status": "normal",   # default
-        "path_type": actual_type,
-        "timestamp": datetime.now().isoformat()
-    }
-    
-    # Add initial log entry
-    add_log_entry(tourist_id, path_data[0]["lat"], path_data[0]["lon"], "normal")
+    state.start_tourist(tourist_id, path_data[0]["lat"], path_data[0]["lon"], actual_type)
+    inactivity.forget(tourist_id)  # a new walk starts a fresh episode
+    inactivity.seen(tourist_id, path_data[0]["lat"], path_data[0]["lon"])
 
     return jsonify(
         {"tourist_id": tourist_id, "path_type": actual_type, "path": path_data}
     )
 
+@app.route("/start_tourist", methods=["POST"])
+def start_tourist():
+    """Begin tracking a tourist that is not in the dataset (the synthetic fleets of loadgen.py)."""
+    data = request.get_json(silent=True) or {}
+    tourist_id = data.get("tourist_id")
+    lat = data.get("lat")
+    lon = data.get("lon")
+    if not tourist_id or lat is None or lon is None:
+        return jsonify({"error": "tourist_id, lat and lon are required"}), 400
+    path_type = data.get("path_type", "normal")
+
+    state.start_tourist(tourist_id, lat, lon, path_type)
+    inactivity.forget(tourist_id)
+    inactivity.seen(tourist_id, lat, lon)
+    return jsonify({"tourist_id": tourist_id, "path_type": path_type})
+
 @app.route("/update_location", methods=["POST"])
 def update_location():
-    data = request.get_json()
+    # JSON, or a binary path frame whose last point is the position (see wire_format.py)
+    try:
+        data = read_payload(request)
+    except ValueError as e:
+        return jsonify({"error": f"Invalid path frame: {e}"}), 400
     tourist_id = data.get("tourist_id")
     lat = data.get("lat")
     lon = data.get("lon")
     status = data.get("status", "normal")
 
-    if tourist_id in live_tourist_data:
-        live_tourist_data[tourist_id]["lat"] = lat
-        live_tourist_data[tourist_id]["lon"] = lon
-        # Only update status if it's not SOS (SOS should persist until explicitly resolved)
-        if live_tourist_data[tourist_id]["status"] != "sos":
-            live_tourist_data[tourist_id]["status"] = status
-        live_tourist_data[tourist_id]["timestamp"] = datetime.now().isoformat()
-        
-        # Add log entry with current status
-        add_log_entry(tourist_id, lat, lon, live_tourist_data[tourist_id]["status"])
+    # Only moves tracked tourists; SOS persists until explicitly resolved
+    record = state.update_location(tourist_id, lat, lon, status)
+    if record is not None:
+        inactivity.seen(tourist_id, lat, lon)
+    if record is not None and geofences and lat is not None and lon is not None:
+        with metrics.stage("geofence"):
+            record_geofences([tourist_id], [geofences.index.contains(lat, lon)])
+    if record is not None:
+        with metrics.stage("crowd_density"):
+            crowd.observe(tourist_id, lat, lon)
 
     return jsonify({"status": "极速updated"})
 
 @app.route("/predict", methods=["POST"])
 def predict():
-    data = request.get_json()
+    try:
+        data = read_payload(request)
+    except ValueError as e:
+        return jsonify({"error": f"Invalid path frame: {e}"}), 400
     tourist_id = data.get("tourist_id")
     path_type = data.get("path_type")
     path_chunk = data.get("path", [])
 
-    if tourist_id in live_tourist_data and live_tourist_data[tourist_id]["status"] != "sos":
-        if path_type == "anomaly" and len(path_chunk) > 30:
-            live_tourist_data[tourist_id]["status"] = "anomaly"
-            
-            # Add anomaly alert only if this tourist hasn't triggered one before
-            if tourist_id not in anomaly_detected_tourists:
-                alert_message = f"You are on a wrong anomalous path. Return to the correct path immediately."
-                safety_alerts.append({
-                    "message": alert_message,
-                    "timestamp": datetime.now().isoformat(),
-                    "type": "anomaly",
-                    "tourist_id": tourist_id
-                })
-                anomaly_detected_tourists.add(tourist_id)
-        else:
-            live_tourist_data[tourist_id]["status"] = "normal"
-            
-        # Update timestamp and add log entry
-        live_tourist_data[tourist_id]["timestamp"] = datetime.now().isoformat()
-        add_log_entry(
-            tourist_id, 
-            live_tourist_data[tourist_id]["lat"], 
-            live_tourist_data[tourist_id]["lon"], 
-            live_tourist_data[tourist_id]["status"]
-        )
+    # Status is left alone while the tourist is in SOS; the first anomaly raises an alert
+    is_anomaly = path_type == "anomaly" and len(path_chunk) > 30
 
-    time.sleep(0.1)
+    if inference_runner:
+        if not inference_runner.submit(run_prediction(tourist_id, is_anomaly)):
+            return jsonify({"error": "Prediction queue full"}), 503
+        return jsonify({"status": "prediction queued"}), 202
+
+    state.apply_prediction(tourist_id, is_anomaly)
+    time.sleep(PREDICT_LATENCY)
     return jsonify({"status": "prediction processed"})
 
 @app.route("/sos", methods=["POST"])
@@ -175,33 +270,13 @@ def sos():
     
     print(f"🚨 SOS RECEIVED! From Tourist ID: {tourist_id} at {lat}, {lon}")
 
-    # If tourist doesn't exist in live data, create an entry
-    if tourist_id not in live_tourist_data:
-        live_tourist_data[tourist_id] = {
-            "lat": lat,
-            "lon": lon,
-            "status": "sos",
-            "timestamp": datetime.now().isoformat()
-        }
-    else:
-        # Update existing tourist with SOS status
-        live_tourist_data[tourist_id]["status"] = "sos"
-        live_tourist_data[tourist_id]["timestamp"] = datetime.now().isoformat()
-        if lat and lon:
-            live_tourist_data[tourist_id]["lat"] = lat
-            live_tourist_data[tourist_id]["lon"] = lon
-        
-    # Add log entry for SOS
-    add_log_entry(tourist_id, lat, lon, "sos")
-    
-    # Add SOS alert with user-friendly message
-    alert_message = f"You raised an SOS. Help is on the way! Stay where you are."
-    safety_alerts.append({
-        "message": alert_message,
-        "timestamp": datetime.now().isoformat(),
-        "type": "sos",
-        "tourist_id": tourist_id
-    })
+    # Creates the tourist if it isn't tracked yet and raises an SOS alert naming the nearest responders
+    point = (lat, lon) if lat is not None and lon is not None else positions.position(tourist_id)
+    details = None
+    if point and len(responders):
+        details = {"responders": responders.nearest(*point, k=NEAREST_RESPONDER_COUNT)}
+    state.raise_sos(tourist_id, lat, lon, details=details)
+    inactivity.seen(tourist_id, lat, lon)
 
     return jsonify({"status": "SOS Signal Received"})
 
@@ -212,59 +287,238 @@ def resolve_sos():
     
     print(f"✅ Resolving SOS for Tourist ID: {tourist_id}")
 
-    if tourist_id in live_tourist_data:
-        # Change status back to normal
-        live_tourist_data[tourist_id]["status"] = "normal"
-        live_tourist_data[tourist_id]["timestamp"] = datetime.now().isoformat()
-        
-        # Add log entry for SOS resolution
-        add_log_entry(
-            tourist_id, 
-            live_tourist_data[tourist_id]["lat"], 
-            live_tourist_data[tourist_id]["lon"], 
-            "normal"
-        )
+    state.resolve_sos(tourist_id)
 
     return jsonify({"status": "SOS Resolved"})
 
+@app.route("/nearby")
+def nearby():
+    """Tracked tourists and responders near a point, closest first.
+
+    Query parameters: lat, lon, and radius (km), k (max results per kind) or
+    both; k alone searches up to MAX_SEARCH_KM. kind=tourists|responders
+    limits the answer to one list, exclude skips one tourist (e.g. the caller).
+    """
+    try:
+        lat = float(request.args["lat"])
+        lon = float(request.args["lon"])
+        radius = request.args.get("radius")
+        radius = min(float(radius), MAX_SEARCH_KM) if radius else None
+        k = request.args.get("k")
+        k = int(k) if k else (None if radius else 10)
+    except (KeyError, ValueError):
+        return jsonify({"error": "lat and lon are required; radius and k must be numbers"}), 400
+    if (k is not None and k <= 0) or (radius is not None and radius <= 0):
+        return jsonify({"error": "radius and k must be positive"}), 400
+    kind = request.args.get("kind")
+
+    result = {}
+    if kind in (None, "tourists"):
+        result["tourists"] = []
+        for tourist_id, tourist_lat, tourist_lon, distance in positions.nearby(
+                lat, lon, radius_km=radius, k=k, exclude=request.args.get("exclude")):
+            record = state.get(tourist_id)
+            result["tourists"].append({
+                "tourist_id": tourist_id,
+                "lat": tourist_lat,
+                "lon": tourist_lon,
+                "status": record["status"] if record else None,
+                "distance_km": round(distance, 3),
+            })
+    if kind in (None, "responders"):
+        result["responders"] = responders.nearest(lat, lon, k=k, radius_km=radius)
+    return jsonify(result)
+
+@app.route("/responders", methods=["GET", "POST"])
+def responders_endpoint():
+    """GET: all responders. POST {"responder_id", "lat", "lon", "name", "kind"}: register or move one."""
+    if request.method == "GET":
+        return jsonify(responders.all())
+    try:
+        responder = responders.register(request.get_json() or {})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(responder)
+
 @app.route("/get_live_statuses")
 def get_live_statuses():
-    return jsonify(live_tourist_data)
+    return jsonify(state.snapshot())
+
+@app.route("/stream_live_statuses")
+def stream_live_statuses():
+    """Server-Sent Events: a "snapshot" of all tourists on connect, then
+    "location", "status", "resolve" and "reset" deltas as they happen.
+
+    Every message carries a sequence number as its id, so a reconnecting
+    EventSource resumes from Last-Event-ID without a new snapshot.
+    """
+    last_event_id = request.headers.get("Last-Event-ID")
+    last_event_id = int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+    stream = event_stream(live_events, state.snapshot, last_event_id)
+    return Response(
+        stream,
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @app.route("/get_logs/<string:tourist_id>")
 def get_logs(tourist_id):
-    if tourist_id in tourist_logs:
-        return jsonify(tourist_logs[tourist_id])
-    else:
-        return jsonify([])
+    """Log entries, oldest first.
+
+    Optional query parameters for paging: since (exclusive) and until as ISO
+    timestamps or epoch seconds, and limit. Pass the last timestamp of a page
+    as the next page's since.
+    """
+    try:
+        since = request.args.get("since")
+        until = request.args.get("until")
+        limit = request.args.get("limit")
+        entries = state.log_entries(
+            tourist_id,
+            since=to_epoch_us(since) if since else None,
+            until=to_epoch_us(until) if until else None,
+            limit=int(limit) if limit else None,
+        )
+    except ValueError:
+        return jsonify({"error": "Invalid since, until or limit"}), 400
+
+    return jsonify(entries)
+
+@app.route("/get_logs/<string:tourist_id>/geojson")
+def get_log_geojson(tourist_id):
+    """A tourist's log as one simplified GeoJSON LineString Feature, for drawing on a map.
+
+    Optional query parameters: tolerance in meters (default 5, 0 keeps every
+    point), method ("dp" Douglas-Peucker or "vw" Visvalingam-Whyatt),
+    precision (coordinate decimals) and since/until as for /get_logs.
+    """
+    try:
+        since = request.args.get("since")
+        until = request.args.get("until")
+        tolerance = float(request.args.get("tolerance", 5))
+        precision = min(max(int(request.args.get("precision", 6)), 0), 9)
+        columns = state.log_columns(
+            tourist_id,
+            since=to_epoch_us(since) if since else None,
+            until=to_epoch_us(until) if until else None,
+        )
+    except ValueError:
+        return jsonify({"error": "Invalid since, until, tolerance or precision"}), 400
+    method = request.args.get("method", "dp")
+    if method not in METHODS:
+        return jsonify({"error": f"Invalid method; use one of {list(METHODS)}"}), 400
+    if columns is None:
+        return jsonify({"error": "Tourist not found"}), 404
+
+    lat, lon, _, _ = columns
+    located = ~(np.isnan(lat) | np.isnan(lon))  # SOS entries may lack a position
+    feature = line_feature(lat[located], lon[located], {"tourist_id": tourist_id},
+                           tolerance=tolerance, method=method, precision=precision)
+    return Response(feature, mimetype="application/geo+json")
 
 @app.route("/get_safety_alerts")
 def get_safety_alerts():
-    return jsonify(safety_alerts)
+    """Alerts, oldest first. Each has an increasing id and a count of coalesced repeats.
+
+    Optional query parameters: since (exclusive alert id) and limit for
+    paging, tourist_id and type to filter. Pass the last id of a page (or of
+    the previous poll) as the next since; a coalesced repeat comes back under
+    a new id.
+    """
+    try:
+        since = request.args.get("since")
+        limit = request.args.get("limit")
+        alerts = state.alerts(
+            since=int(since) if since else None,
+            limit=int(limit) if limit else None,
+            tourist_id=request.args.get("tourist_id"),
+            alert_type=request.args.get("type"),
+        )
+    except ValueError:
+        return jsonify({"error": "Invalid since or limit"}), 400
+
+    return jsonify(alerts)
 
 @app.route("/clear_safety_alerts", methods=["POST"])
 def clear_safety_alerts():
-    global safety_alerts
-    safety_alerts = []
-    return jsonify({"status": "Alerts cleared"})
+    """Clear all alerts, or only those matching an optional JSON body {"tourist_id", "type", "up_to"}."""
+    data = request.get_json(silent=True) or {}
+    try:
+        up_to = int(data["up_to"]) if data.get("up_to") is not None else None
+    except (TypeError, ValueError):
+        return jsonify({"error": "Invalid up_to"}), 400
+    removed = state.clear_alerts(data.get("tourist_id"), data.get("type"), up_to)
+    return jsonify({"status": "Alerts cleared", "removed": removed})
+
+# Geofence endpoints
+@app.route("/get_geofences")
+def get_geofences():
+    if not geofences:
+        return jsonify([])
+    return jsonify([
+        {"id": zone["id"], "name": zone["name"], "zone_type": zone["zone_type"], "bbox": [float(v) for v in zone["bbox"]]}
+        for zone in geofences.index.zones
+    ])
+
+@app.route("/geofence/check", methods=["POST"])
+def geofence_check():
+    """Batch zone lookup: {"points": [{"tourist_id", "lat", "lon"}, ...]}.
+
+    Returns the zone ids containing each point, in order. Points that carry a
+    tourist_id also update that tourist's enter/exit tracking and alerts.
+    """
+    if not geofences:
+        return jsonify({"error": "Geofencing not enabled"}), 503
+    points = (request.get_json() or {}).get("points", [])
+    try:
+        lats = [float(point["lat"]) for point in points]
+        lons = [float(point["lon"]) for point in points]
+    except (KeyError, TypeError, ValueError):
+        return jsonify({"error": "Each point needs numeric lat and lon"}), 400
+
+    located = geofences.index.locate(lats, lons)
+    tracked = [i for i, point in enumerate(points) if point.get("tourist_id") is not None]
+    if tracked:
+        record_geofences([points[i]["tourist_id"] for i in tracked], [located[i] for i in tracked])
+    return jsonify({"results": [sorted(zones) for zones in located]})
 
 # Heatmap endpoints
 @app.route("/get_heatmap_data")
 def get_heatmap_data():
-    heatmap_data = []
-    
-    for tourist_id, logs in tourist_logs.items():
-        for log in logs:
-            # Assign intensity based on status
-            intensity = 0.3  # Default for normal
-            if log["status"] == "anomaly":
-                intensity = 0.6
-            elif log["status"] == "sos":
-                intensity = 1.0
-                
-            heatmap_data.append([log["lat"], log["lon"], intensity])
-    
-    return jsonify(heatmap_data)
+    """Pre-aggregated density cells as [lat, lon, intensity].
+
+    Optional query parameters: bbox=south,west,north,east and zoom (map zoom level).
+    Intensity is the status-weighted point count of the cell.
+    """
+    try:
+        bbox = parse_bbox(request.args.get("bbox"))
+        zoom = int(request.args.get("zoom", DEFAULT_ZOOM))
+    except ValueError:
+        return jsonify({"error": "Invalid bbox or zoom"}), 400
+
+    return jsonify(heatmap_index.query(zoom, bbox))
+
+@app.route("/get_crowd_density")
+def get_crowd_density():
+    """Distinct tourists per grid cell over a sliding window, busiest cells first.
+
+    Optional query parameters: window (seconds, one of CROWD_WINDOWS),
+    bbox=south,west,north,east and min_count.
+    """
+    try:
+        window = int(request.args.get("window", crowd.windows[0]))
+        bbox = parse_bbox(request.args.get("bbox"))
+        min_count = int(request.args.get("min_count", 1))
+    except ValueError:
+        return jsonify({"error": "Invalid window, bbox or min_count"}), 400
+    if window not in crowd.windows:
+        return jsonify({"error": f"window must be one of {list(crowd.windows)}"}), 400
+
+    return jsonify({
+        "window_seconds": window,
+        "capacity": crowd.capacity,
+        "cells": crowd.density(window, bbox, min_count),
+    })
 
 # Error handlers to ensure JSON responses
 @app.errorhandler(404)
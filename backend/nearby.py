@@ -0,0 +1,251 @@
+# --- Spatial Index over Live Positions ---
+# Current positions (tourists, responders) bucketed in a lat/lon grid of
+# CELL_DEGREES cells (about 1 km). Moving a key is O(1): it leaves one cell
+# dict and joins another, so /update_location keeps the index current in
+# place instead of rebuilding a tree. A query scans rings of cells outward
+# from the query point, computing haversine distances for one ring at a time,
+# and stops as soon as the requested radius is covered or the k nearest found
+# are closer than anything an unscanned ring could hold.
+#
+# Run this file directly for a correctness check against brute force and
+# query timings with 50k live positions.
+
+import json
+import math
+import threading
+
+import numpy as np
+
+from features import haversine
+
+CELL_DEGREES = 0.01
+KM_PER_DEGREE = 6371 * math.pi / 180  # same earth radius as features.haversine
+MAX_SEARCH_KM = 50.0  # k-nearest queries without a radius look no further
+
+
+class PositionIndex:
+    """Grid of the latest (lat, lon) per key, with radius and k-nearest queries."""
+
+    def __init__(self, cell_degrees=CELL_DEGREES):
+        self.cell_degrees = cell_degrees
+        self.cells = {}  # (row, col) -> {key: (lat, lon)}
+        self.where = {}  # key -> (row, col)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.where)
+
+    def __contains__(self, key):
+        return key in self.where
+
+    def _cell(self, lat, lon):
+        return math.floor(lat / self.cell_degrees), math.floor(lon / self.cell_degrees)
+
+    def update(self, key, lat, lon):
+        """Move (or add) a key. Positions without coordinates are ignored."""
+        if lat is None or lon is None:
+            return
+        cell = self._cell(lat, lon)
+        with self._lock:
+            old = self.where.get(key)
+            if old is not None and old != cell:
+                self._leave(key, old)
+            self.cells.setdefault(cell, {})[key] = (lat, lon)
+            self.where[key] = cell
+
+    def _leave(self, key, cell):
+        bucket = self.cells[cell]
+        del bucket[key]
+        if not bucket:
+            del self.cells[cell]
+
+    def remove(self, key):
+        with self._lock:
+            cell = self.where.pop(key, None)
+            if cell is not None:
+                self._leave(key, cell)
+
+    def clear(self):
+        with self._lock:
+            self.cells.clear()
+            self.where.clear()
+
+    def position(self, key):
+        with self._lock:
+            cell = self.where.get(key)
+            return self.cells[cell][key] if cell is not None else None
+
+    # --- Queries ---
+    def _ring(self, row, col, r):
+        if r == 0:
+            yield row, col
+            return
+        for c in range(col - r, col + r + 1):
+            yield row - r, c
+            yield row + r, c
+        for w in range(row - r + 1, row + r):
+            yield w, col - r
+            yield w, col + r
+
+    def nearby(self, lat, lon, radius_km=None, k=None, exclude=None):
+        """(key, lat, lon, distance_km) sorted by distance: within radius_km, the k nearest, or both.
+
+        Without a radius, the k nearest within MAX_SEARCH_KM are returned.
+        """
+        if radius_km is None and k is None:
+            raise ValueError("nearby() needs a radius, k or both")
+        limit_km = radius_km if radius_km is not None else MAX_SEARCH_KM
+        row, col = self._cell(lat, lon)
+        found = []  # (distance, key, lat, lon)
+        with self._lock:
+            r = 0
+            while True:
+                keys, lats, lons = [], [], []
+                if (2 * r + 1) ** 2 >= len(self.cells):
+                    # The ring block now spans more cells than are occupied: finish with all of them
+                    cells = (bucket for cell, bucket in self.cells.items()
+                             if max(abs(cell[0] - row), abs(cell[1] - col)) >= r)
+                    done = True
+                else:
+                    cells = (self.cells.get(cell) for cell in self._ring(row, col, r))
+                    done = False
+                for bucket in cells:
+                    if bucket:
+                        for key, (key_lat, key_lon) in bucket.items():
+                            if key != exclude:
+                                keys.append(key)
+                                lats.append(key_lat)
+                                lons.append(key_lon)
+                if keys:
+                    distances = haversine(lat, lon, np.array(lats), np.array(lons))
+                    found.extend(
+                        (float(d), key, key_lat, key_lon)
+                        for d, key, key_lat, key_lon in zip(distances, keys, lats, lons) if d <= limit_km
+                    )
+                if done:
+                    break
+                # Anything outside rings 0..r is at least r cell widths away (narrowest cell in the block)
+                widest_lat = min(abs(lat) + (r + 1) * self.cell_degrees, 89.0)
+                covered_km = r * self.cell_degrees * KM_PER_DEGREE * math.cos(math.radians(widest_lat))
+                if covered_km >= limit_km:
+                    break
+                if k is not None and len(found) >= k and sorted(d for d, *_ in found)[k - 1] <= covered_km:
+                    break
+                r += 1
+        found.sort(key=lambda item: item[0])
+        if k is not None:
+            found = found[:k]
+        return [(key, key_lat, key_lon, distance) for distance, key, key_lat, key_lon in found]
+
+
+# --- Responders ---
+RESPONDERS_FILE = 'responders.json'
+NEAREST_RESPONDERS = 3  # attached to every SOS alert
+
+
+class ResponderDirectory:
+    """Registered responders (police posts, rescue teams, ...) and their current positions."""
+
+    def __init__(self, responders=()):
+        self.index = PositionIndex()
+        self.info = {}  # responder_id -> {"responder_id", "name", "kind", "lat", "lon"}
+        for responder in responders:
+            self.register(responder)
+
+    def __len__(self):
+        return len(self.info)
+
+    def register(self, responder):
+        """Add or move a responder. Raises ValueError without an id or valid coordinates."""
+        responder_id = responder.get("responder_id") or responder.get("id")
+        if not responder_id:
+            raise ValueError("responder_id is required")
+        try:
+            lat, lon = float(responder["lat"]), float(responder["lon"])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError("lat and lon must be numbers")
+        info = self.info.get(responder_id, {})
+        self.info[responder_id] = {
+            "responder_id": responder_id,
+            "name": responder.get("name", info.get("name", responder_id)),
+            "kind": responder.get("kind", info.get("kind", "responder")),
+            "lat": lat,
+            "lon": lon,
+        }
+        self.index.update(responder_id, lat, lon)
+        return self.info[responder_id]
+
+    def all(self):
+        return list(self.info.values())
+
+    def nearest(self, lat, lon, k=NEAREST_RESPONDERS, radius_km=None):
+        """The nearest responders as dicts with a distance_km, closest first."""
+        return [
+            {**self.info[responder_id], "distance_km": round(distance, 3)}
+            for responder_id, _, _, distance in self.index.nearby(lat, lon, radius_km=radius_km, k=k)
+        ]
+
+
+def load_responders(path=RESPONDERS_FILE):
+    """Responders listed in a JSON file; an empty directory if the file is missing."""
+    try:
+        with open(path) as f:
+            directory = ResponderDirectory(json.load(f))
+    except FileNotFoundError:
+        print(f"ℹ️ No responder file '{path}' found; responders can still be registered via the API.")
+        return ResponderDirectory()
+    print(f"✅ Loaded {len(directory)} responders from '{path}'.")
+    return directory
+
+
+# --- Brute-Force Check and Timings ---
+if __name__ == "__main__":
+    import random
+    import time
+
+    NUM_POSITIONS = 50000
+    rng = random.Random(5)
+    index = PositionIndex()
+    # Tourists clustered around a few hubs, like the simulation area
+    hubs = [(27.33 + rng.uniform(-0.3, 0.3), 88.61 + rng.uniform(-0.3, 0.3)) for _ in range(20)]
+    positions = {}
+    start = time.perf_counter()
+    for i in range(NUM_POSITIONS):
+        hub = rng.choice(hubs)
+        positions[f"t{i}"] = (hub[0] + rng.gauss(0, 0.05), hub[1] + rng.gauss(0, 0.05))
+        index.update(f"t{i}", *positions[f"t{i}"])
+    for i in range(0, NUM_POSITIONS, 2):  # half of them move once
+        lat, lon = positions[f"t{i}"]
+        positions[f"t{i}"] = (lat + rng.uniform(-0.01, 0.01), lon + rng.uniform(-0.01, 0.01))
+        index.update(f"t{i}", *positions[f"t{i}"])
+    updates = NUM_POSITIONS * 1.5
+    print(f"{NUM_POSITIONS} positions: {(time.perf_counter() - start) / updates * 1e6:.1f} us per update")
+
+    keys = list(positions)
+    all_lat = np.array([positions[key][0] for key in keys])
+    all_lon = np.array([positions[key][1] for key in keys])
+    mismatches = 0
+    for _ in range(200):
+        lat, lon = positions[rng.choice(keys)]
+        lat, lon = lat + rng.uniform(-0.02, 0.02), lon + rng.uniform(-0.02, 0.02)
+        distances = haversine(lat, lon, all_lat, all_lon)
+        order = np.argsort(distances, kind='stable')
+        radius, k = rng.choice([0.2, 0.5, 1.0, 3.0]), rng.choice([1, 5, 20])
+        expected_radius = {keys[i] for i in np.flatnonzero(distances <= radius)}
+        expected_k = [round(float(distances[i]), 9) for i in order[:k]]
+        mismatches += {key for key, *_ in index.nearby(lat, lon, radius_km=radius)} != expected_radius
+        mismatches += [round(d, 9) for *_, d in index.nearby(lat, lon, k=k)] != expected_k
+
+    for label, kwargs in (("radius 1 km", {"radius_km": 1.0}), ("k=10", {"k": 10}),
+                          ("radius 2 km, k=5", {"radius_km": 2.0, "k": 5})):
+        queries = [(lat + rng.uniform(-0.01, 0.01), lon + rng.uniform(-0.01, 0.01))
+                   for lat, lon in (positions[rng.choice(keys)] for _ in range(2000))]
+        start = time.perf_counter()
+        results = sum(len(index.nearby(lat, lon, **kwargs)) for lat, lon in queries)
+        elapsed = (time.perf_counter() - start) / len(queries)
+        print(f"{label}: {elapsed * 1e6:.0f} us per query ({results / len(queries):.1f} results on average)")
+
+    if mismatches:
+        print(f"❌ {mismatches} queries differ from brute force.")
+    else:
+        print("✅ Radius and k-nearest queries match brute force.")
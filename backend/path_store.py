@@ -0,0 +1,159 @@
+# --- Indexed Simulation Path Store ---
+# simulation_paths.csv is parsed once into typed NumPy columns sorted by
+# tourist, with a tourist -> (start, end) offset index, so a tourist's path is
+# a slice of each column instead of a boolean scan over the whole dataset.
+# The parsed columns are cached in a .npz file next to the CSV and reused on
+# the next start for as long as the CSV is unchanged.
+
+import os
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+SIMULATION_FILE = 'simulation_paths.csv'
+
+# Columns of one tourist's path; every field is a view into the store's arrays
+Path = namedtuple('Path', ['tourist_id', 'path_type', 'lat', 'lon', 'timestamp', 'at_poi', 'anomaly_type'])
+
+
+def _cache_path(csv_path):
+    return os.path.splitext(csv_path)[0] + '.npz'
+
+def _source_signature(csv_path):
+    stat = os.stat(csv_path)
+    return np.array([stat.st_size, stat.st_mtime_ns], dtype=np.int64)
+
+
+class PathStore:
+    """Read-only, tourist-indexed columns of the simulation dataset."""
+
+    def __init__(self, columns):
+        self.tourist_ids = columns['tourist_ids'].tolist()  # in order of first appearance
+        self.path_types = columns['path_types'].tolist()
+        self.starts = columns['starts']
+        self.lat = columns['lat']
+        self.lon = columns['lon']
+        self.timestamp = columns['timestamp']  # epoch microseconds
+        self.at_poi = columns['at_poi']
+        self.anomaly_type = columns['anomaly_type']
+
+        self.index = {tourist_id: i for i, tourist_id in enumerate(self.tourist_ids)}
+        self.ids_by_type = {}
+        for tourist_id, path_type in zip(self.tourist_ids, self.path_types):
+            self.ids_by_type.setdefault(path_type, []).append(tourist_id)
+
+    # --- Loading ---
+    @classmethod
+    def from_csv(cls, csv_path=SIMULATION_FILE):
+        try:
+            df = pd.read_csv(csv_path)
+        except pd.errors.EmptyDataError:
+            df = pd.DataFrame()
+        if df.empty:
+            # Header only or an empty file: a store without tourists, for callers' own empty checks
+            return cls({
+                'tourist_ids': np.empty(0, dtype=str),
+                'path_types': np.empty(0, dtype=str),
+                'starts': np.zeros(1, dtype=np.int64),
+                'lat': np.empty(0, dtype=np.float64),
+                'lon': np.empty(0, dtype=np.float64),
+                'timestamp': np.empty(0, dtype=np.int64),
+                'at_poi': np.empty(0, dtype=bool),
+                'anomaly_type': np.empty(0, dtype=str),
+            })
+
+        # Group rows by tourist (stable, so each path keeps its CSV order)
+        codes, tourist_ids = pd.factorize(df['tourist_id'], sort=False)
+        order = np.argsort(codes, kind='stable')
+        codes = codes[order]
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1], True])
+
+        path_type = df['path_type'].to_numpy()[order]
+        timestamps = pd.to_datetime(df['timestamp']).to_numpy(dtype='datetime64[us]')[order]
+        return cls({
+            'tourist_ids': np.asarray(tourist_ids, dtype=str),
+            'path_types': path_type[starts[:-1]].astype(str),
+            'starts': starts,
+            'lat': np.ascontiguousarray(df['lat'].to_numpy(dtype=np.float64)[order]),
+            'lon': np.ascontiguousarray(df['lon'].to_numpy(dtype=np.float64)[order]),
+            'timestamp': timestamps.astype(np.int64),
+            'at_poi': df['at_poi'].to_numpy(dtype=bool)[order],
+            'anomaly_type': df['anomaly_type'].fillna('').to_numpy(dtype=str)[order],
+        })
+
+    @classmethod
+    def load(cls, csv_path=SIMULATION_FILE, use_cache=True):
+        """Load from the .npz cache if it matches the CSV, otherwise parse the CSV and refresh the cache."""
+        signature = _source_signature(csv_path)
+        cache_path = _cache_path(csv_path)
+
+        if use_cache and os.path.exists(cache_path):
+            try:
+                with np.load(cache_path, allow_pickle=False) as cached:
+                    if np.array_equal(cached['source_signature'], signature):
+                        return cls({name: cached[name] for name in cached.files})
+            except (OSError, ValueError, KeyError):
+                pass  # unreadable or outdated cache: rebuild it below
+
+        store = cls.from_csv(csv_path)
+        if use_cache:
+            try:
+                store.save(cache_path, signature)
+            except OSError as e:
+                print(f"❌ Could not write path cache '{cache_path}': {e}")
+        return store
+
+    def save(self, cache_path, signature):
+        np.savez(
+            cache_path,
+            source_signature=signature,
+            tourist_ids=np.asarray(self.tourist_ids, dtype=str),
+            path_types=np.asarray(self.path_types, dtype=str),
+            starts=self.starts,
+            lat=self.lat,
+            lon=self.lon,
+            timestamp=self.timestamp,
+            at_poi=self.at_poi,
+            anomaly_type=self.anomaly_type,
+        )
+
+    # --- Lookups ---
+    def __contains__(self, tourist_id):
+        return tourist_id in self.index
+
+    def __len__(self):
+        return len(self.lat)
+
+    def bounds(self, tourist_id):
+        i = self.index[tourist_id]
+        return int(self.starts[i]), int(self.starts[i + 1])
+
+    def path_type(self, tourist_id):
+        return self.path_types[self.index[tourist_id]]
+
+    def path(self, tourist_id):
+        """A tourist's path as column views (no copying). Raises KeyError for unknown tourists."""
+        i = self.index[tourist_id]
+        start, end = self.starts[i], self.starts[i + 1]
+        return Path(
+            tourist_id,
+            self.path_types[i],
+            self.lat[start:end],
+            self.lon[start:end],
+            self.timestamp[start:end],
+            self.at_poi[start:end],
+            self.anomaly_type[start:end],
+        )
+
+    def timestamps_iso(self, tourist_id):
+        """A tourist's timestamps as ISO strings, the form /predict accepts."""
+        return np.datetime_as_string(self.path(tourist_id).timestamp.astype('datetime64[us]')).tolist()
+
+    def records(self, tourist_id):
+        """Point dicts (tourist_id, lat, lon, timestamp) as posted to app.py's /predict."""
+        path = self.path(tourist_id)
+        return [
+            {'tourist_id': tourist_id, 'lat': lat, 'lon': lon, 'timestamp': timestamp}
+            for lat, lon, timestamp in zip(path.lat.tolist(), path.lon.tolist(), self.timestamps_iso(tourist_id))
+        ]
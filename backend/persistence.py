@@ -0,0 +1,362 @@
+# --- Write-Ahead Log and Snapshots for the Live State ---
+# Every change to the TouristStateStore (tourist started, moved, predicted,
+# SOS raised/resolved, alert added, alerts cleared, reset) is journaled as one
+# small binary record with its timestamp. Request threads only append the
+# record's fields to an in-memory batch; a background thread encodes and
+# writes the batch and fsyncs once per FLUSH_SECONDS (group commit), so neither
+# encoding nor fsync sits on a request. A crash loses at most the last batch.
+#
+# Every SNAPSHOT_SECONDS the store is exported in one consistent cut (flat
+# NumPy log columns + JSON records) to snapshot-<segment>.npz, and the journal
+# moves on to a new segment at the same cut. Recovery loads the newest snapshot
+# and replays only the segments after it through the store's own transitions.
+# Before a /reset_simulation the state is archived to archive/, so resets keep
+# the incident history.
+#
+# Layout of STATE_DIR:
+#   wal-<segment>.log        journal segments, replayed in order
+#   snapshot-<segment>.npz   state as of the start of that segment
+#   archive/reset-<time>.npz state just before each reset
+#
+# Run this file directly for a crash/recovery check and timings.
+
+import glob
+import os
+import re
+import struct
+import threading
+import time
+import zlib
+from datetime import datetime
+
+import numpy as np
+
+STATE_DIR = 'state'
+FLUSH_SECONDS = 0.05
+SNAPSHOT_SECONDS = 60.0
+
+# Journal operations; the code stored on disk is the position in this tuple (append only)
+OPS = ("start", "location", "prediction", "sos", "resolve", "alert", "clear_alerts", "reset", "detailed_alert")
+OP_CODES = {op: code for code, op in enumerate(OPS)}
+
+# Record: frame (payload length, crc32) + payload (op, at_us, lat, lon, flag, three string lengths) + strings
+_FRAME = struct.Struct('<II')
+_FIELDS = struct.Struct('<BqddBHHH')
+
+
+def encode_record(op, at_us, tourist_id, lat=None, lon=None, flag=0, text1=None, text2=None):
+    strings = [(value or '').encode() for value in (tourist_id, text1, text2)]
+    payload = _FIELDS.pack(
+        OP_CODES[op], at_us,
+        np.nan if lat is None else lat, np.nan if lon is None else lon,
+        flag, *(len(s) for s in strings),
+    ) + b''.join(strings)
+    return _FRAME.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def read_segment(path):
+    """Decoded records of one journal segment, stopping at a torn or corrupt tail."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    records = []
+    offset = 0
+    while offset + _FRAME.size <= len(data):
+        length, crc = _FRAME.unpack_from(data, offset)
+        payload = data[offset + _FRAME.size:offset + _FRAME.size + length]
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            break  # the crash happened mid-write; everything before is intact
+        code, at_us, lat, lon, flag, *lengths = _FIELDS.unpack_from(payload)
+        strings, position = [], _FIELDS.size
+        for size in lengths:
+            strings.append(payload[position:position + size].decode())
+            position += size
+        records.append((
+            OPS[code], at_us, strings[0],
+            None if lat != lat else lat, None if lon != lon else lon,  # NaN marks a missing coordinate
+            flag, strings[1] or None, strings[2] or None,
+        ))
+        offset += _FRAME.size + length
+    return records
+
+
+def _segment_number(path):
+    return int(re.search(r'-(\d+)\.', os.path.basename(path)).group(1))
+
+
+def write_snapshot(path, state, segment=0):
+    """Write an exported state atomically (temp file, fsync, rename)."""
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        np.savez(f, wal_segment=segment, **state)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class WriteAheadLog:
+    """Append-only journal segments with batched writes and one fsync per batch."""
+
+    def __init__(self, directory, segment, flush_interval=FLUSH_SECONDS):
+        self.directory = directory
+        self.segment = segment  # segment new records go to
+        self.flush_interval = flush_interval
+        self._pending = []  # record field tuples; None marks a switch to the next segment
+        self._lock = threading.Lock()  # guards _pending (held only for list operations)
+        self._io_lock = threading.Lock()  # serializes writers of the files
+        self._file_segment = segment
+        self._file = open(self._path(segment), 'ab')
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="wal-flusher", daemon=True)
+        self._thread.start()
+
+    def _path(self, segment):
+        return os.path.join(self.directory, f"wal-{segment:08d}.log")
+
+    def append(self, entry):
+        """Queue one record's fields (see encode_record) for the next batch."""
+        with self._lock:
+            self._pending.append(entry)
+
+    def rotate(self):
+        """Start a new segment at this point of the record stream. Returns its number."""
+        with self._lock:
+            self._pending.append(None)
+            self.segment += 1
+            return self.segment
+
+    def flush(self):
+        """Write and fsync everything appended so far."""
+        with self._io_lock:
+            with self._lock:
+                pending, self._pending = self._pending, []
+            chunk = []
+            for entry in pending:
+                if entry is None:
+                    self._file.write(b''.join(chunk))
+                    chunk = []
+                    self._sync()
+                    self._file.close()
+                    self._file_segment += 1
+                    self._file = open(self._path(self._file_segment), 'ab')
+                else:
+                    chunk.append(encode_record(*entry))
+            if chunk:
+                self._file.write(b''.join(chunk))
+                self._sync()
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except OSError as e:
+                print(f"❌ Write-ahead log flush failed: {e}")
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+        self.flush()
+        self._file.close()
+
+
+class StatePersistence:
+    """Journals a TouristStateStore, snapshots it periodically and recovers it on start."""
+
+    def __init__(self, store, directory=STATE_DIR, snapshot_interval=SNAPSHOT_SECONDS, flush_interval=FLUSH_SECONDS):
+        self.store = store
+        self.directory = directory
+        self.snapshot_interval = snapshot_interval
+        self.flush_interval = flush_interval
+        self.wal = None
+        self._snapshot_lock = threading.Lock()
+        self._stop = threading.Event()
+        os.makedirs(os.path.join(directory, 'archive'), exist_ok=True)
+
+    # --- Journal hooks (called by the store with its locks held) ---
+    def record(self, op, at_us, tourist_id, lat=None, lon=None, flag=0, text1=None, text2=None):
+        self.wal.append((op, at_us, tourist_id, lat, lon, flag, text1, text2))
+
+    def archive(self, state):
+        """Write a pre-reset export to archive/ in the background."""
+        name = f"reset-{datetime.now().strftime('%Y%m%dT%H%M%S%f')}.npz"
+        path = os.path.join(self.directory, 'archive', name)
+        threading.Thread(target=write_snapshot, args=(path, state), daemon=True).start()
+
+    # --- Recovery ---
+    def recover(self):
+        """Load the newest snapshot, replay the later journal segments and start journaling."""
+        start = time.perf_counter()
+        # Replay without per-point heatmap updates or live events; the heatmap is recounted once at the end
+        heatmap_index, events = self.store.heatmap_index, self.store.events
+        self.store.heatmap_index = self.store.events = None
+        snapshots = sorted(glob.glob(os.path.join(self.directory, 'snapshot-*.npz')), key=_segment_number)
+        first_segment = 0
+        if snapshots:
+            with np.load(snapshots[-1], allow_pickle=False) as snapshot:
+                state = {name: snapshot[name] for name in snapshot.files}
+            first_segment = int(state.pop('wal_segment'))
+            self.store.load({k: (str(v) if v.dtype.kind == 'U' else v) for k, v in state.items()})
+
+        replayed = 0
+        segments = sorted(glob.glob(os.path.join(self.directory, 'wal-*.log')), key=_segment_number)
+        for path in segments:
+            if _segment_number(path) >= first_segment:
+                for op, at_us, tourist_id, lat, lon, flag, text1, text2 in read_segment(path):
+                    self.store.replay(op, at_us, tourist_id, lat, lon, flag, text1, text2)
+                    replayed += 1
+        self.store.heatmap_index, self.store.events = heatmap_index, events
+        self.store.rebuild_heatmap()
+
+        # New records go to a fresh segment, after any torn tail of the last one
+        next_segment = max([first_segment] + [_segment_number(p) + 1 for p in segments])
+        self.wal = WriteAheadLog(self.directory, next_segment, self.flush_interval)
+        self.store.journal = self
+        elapsed = time.perf_counter() - start
+        stats = self.store.stats()
+        print(f"✅ Recovered {stats['tourists']} tourists and {stats['log_entries']} log entries "
+              f"({'snapshot + ' if snapshots else ''}{replayed} journal records) in {elapsed:.2f}s.")
+        return replayed
+
+    # --- Snapshots ---
+    def snapshot(self):
+        """Export the store at a new segment boundary, then drop the segments and snapshots it covers."""
+        with self._snapshot_lock:
+            segment, state = self.store.checkpoint(self.wal.rotate)
+            write_snapshot(os.path.join(self.directory, f"snapshot-{segment:08d}.npz"), state, segment)
+            self.wal.flush()  # closes the covered segments before they are removed
+            for path in glob.glob(os.path.join(self.directory, 'wal-*.log')):
+                if _segment_number(path) < segment:
+                    os.remove(path)
+            for path in glob.glob(os.path.join(self.directory, 'snapshot-*.npz')):
+                if _segment_number(path) < segment:
+                    os.remove(path)
+            return segment
+
+    def start(self):
+        """Take a snapshot every snapshot_interval seconds in the background."""
+        def run():
+            while not self._stop.wait(self.snapshot_interval):
+                try:
+                    self.snapshot()
+                except OSError as e:
+                    print(f"❌ State snapshot failed: {e}")
+        threading.Thread(target=run, name="state-snapshots", daemon=True).start()
+        return self
+
+    def close(self):
+        self._stop.set()
+        if self.wal is not None:
+            self.wal.close()
+
+
+# --- Crash / Recovery Check ---
+# Drives a journaled store, snapshots midway, keeps going, then "crashes"
+# (no final snapshot, plus a torn record at the end of the journal) and
+# recovers into a fresh store, which must equal the original.
+if __name__ == "__main__":
+    import random
+    import shutil
+    import tempfile
+    from heatmap_index import GridDensityIndex
+    from state_store import TouristStateStore
+
+    NUM_TOURISTS = 2000
+    OPS_BEFORE_SNAPSHOT = int(os.environ.get("OPS", 1_000_000))
+    OPS_AFTER_SNAPSHOT = OPS_BEFORE_SNAPSHOT // 10
+
+    def drive(store, ops, rng):
+        # Tourists walk in small steps from random starting points
+        positions = {}
+        for _ in range(ops):
+            tourist_id = f"t{rng.randrange(NUM_TOURISTS)}"
+            lat, lon = positions.get(tourist_id) or (27 + rng.random(), 88 + rng.random())
+            lat, lon = positions[tourist_id] = (lat + rng.uniform(-5e-4, 5e-4), lon + rng.uniform(-5e-4, 5e-4))
+            roll = rng.random()
+            if roll < 0.8:
+                store.update_location(tourist_id, lat, lon)
+            elif roll < 0.97:
+                store.apply_prediction(tourist_id, rng.random() < 0.3)
+            elif roll < 0.98:
+                store.raise_sos(tourist_id, lat, lon, details={"responders": [{"responder_id": "r1", "distance_km": 0.5}]})
+            elif roll < 0.99:
+                store.resolve_sos(tourist_id)
+            elif roll < 0.998:
+                store.add_alert("geofence_enter", tourist_id, "Entered a sample zone.")
+            elif roll < 0.999:
+                store.add_alert("overcrowding", None, "About 60 tourists around here.",
+                                details={"lat": lat, "lon": lon, "crowd_count": 60, "capacity": 50})
+            else:
+                store.clear_alerts(tourist_id=tourist_id)
+
+    def exported(store):
+        return store.checkpoint(lambda: None)[1]
+
+    directory = tempfile.mkdtemp(prefix="state-check-")
+    try:
+        rng = random.Random(3)
+        store = TouristStateStore(heatmap_index=GridDensityIndex())
+        persistence = StatePersistence(store, directory)
+        persistence.recover()
+        for i in range(NUM_TOURISTS):
+            store.start_tourist(f"t{i}", 27.0, 88.0, "normal")
+
+        start = time.perf_counter()
+        drive(store, OPS_BEFORE_SNAPSHOT, rng)
+        journaled = time.perf_counter() - start
+        plain = TouristStateStore(heatmap_index=GridDensityIndex())
+        for i in range(NUM_TOURISTS):
+            plain.start_tourist(f"t{i}", 27.0, 88.0, "normal")
+        start = time.perf_counter()
+        drive(plain, OPS_BEFORE_SNAPSHOT, random.Random(3))
+        unjournaled = time.perf_counter() - start
+        print(f"{OPS_BEFORE_SNAPSHOT} transitions: {journaled / OPS_BEFORE_SNAPSHOT * 1e6:.1f} us each journaled, "
+              f"{unjournaled / OPS_BEFORE_SNAPSHOT * 1e6:.1f} us without")
+
+        start = time.perf_counter()
+        persistence.snapshot()
+        print(f"Snapshot of {store.stats()['log_entries']} log entries in {time.perf_counter() - start:.2f}s")
+        drive(store, OPS_AFTER_SNAPSHOT, rng)
+
+        # Crash: flush what the batcher has, append half a record, never snapshot again
+        persistence.close()
+        expected = exported(store)
+        last_segment = sorted(glob.glob(os.path.join(directory, 'wal-*.log')), key=_segment_number)[-1]
+        with open(last_segment, 'ab') as f:
+            f.write(encode_record("location", 0, "t0", 1.0, 2.0)[:-5])
+
+        heatmap = GridDensityIndex()
+        recovered = TouristStateStore(heatmap_index=heatmap)
+        recovered_persistence = StatePersistence(recovered, directory)
+        recovered_persistence.recover()
+        actual = exported(recovered)
+
+        same = all(
+            np.array_equal(expected[key], actual[key], equal_nan=True) if isinstance(expected[key], np.ndarray)
+            else expected[key] == actual[key]
+            for key in expected
+        )
+        heatmap_total = sum(cell[0] for cell in heatmap.levels[heatmap.max_zoom].values())
+        if same and heatmap_total == recovered.stats()['log_entries']:
+            print("✅ Recovered state matches the state before the crash.")
+        else:
+            print("❌ Recovered state differs from the state before the crash.")
+
+        # A reset archives the state it is about to drop
+        recovered.reset()
+        archive_dir = os.path.join(directory, 'archive')
+        deadline = time.monotonic() + 30
+        while not glob.glob(os.path.join(archive_dir, 'reset-*.npz')) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        recovered_persistence.close()
+        with np.load(glob.glob(os.path.join(archive_dir, 'reset-*.npz'))[0], allow_pickle=False) as archived:
+            archived_ok = (str(archived['live']) == actual['live']
+                           and np.array_equal(archived['log_offsets'], actual['log_offsets']))
+        if archived_ok and recovered.stats()['tourists'] == 0:
+            print("✅ Reset archive holds the state from before the reset.")
+        else:
+            print("❌ Reset archive does not match the state from before the reset.")
+    finally:
+        shutil.rmtree(directory)
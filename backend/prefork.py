@@ -0,0 +1,285 @@
+# --- Pre-Fork Worker Pool ---
+# app.run() serves from one process, so pandas and the sklearn wrapper cap
+# /predict at about one core. PreforkServer binds the listening socket in
+# the parent, which has already imported app.py and loaded the model and
+# scaler. It then forks `workers` processes that accept on that shared
+# socket. The model pages are shared copy-on-write; gc.freeze() before the
+# fork keeps the garbage collector from touching (and so copying) them.
+#
+# Each worker is a synchronous WSGI server that handles one request at a time.
+# on_worker_start(index, threads) runs in the child right after the fork, with
+# threads = cores // workers (at least 1). The app uses it to pin its booster
+# to that many threads, so N workers never run more XGBoost threads than there
+# are cores. With pin_cpus the worker is also bound to its own core(s).
+#
+# Signals to the parent:
+#   SIGHUP          graceful reload: on_reload() loads the new model in the parent;
+#                   if that succeeds a new generation of workers is forked and the
+#                   old ones finish their current request and exit. The socket
+#                   stays open throughout, so no connection is refused.
+#   SIGTERM/SIGINT  graceful shutdown: workers finish their request and exit.
+# Workers that die are replaced. A draining worker answers is_draining() = True,
+# which the app's /ready probe turns into a 503.
+#
+# Per-process state (metrics, streaming feature state) is per worker.
+#
+# Run this file directly to measure /predict throughput of app.py with
+# 1..N workers.
+
+import gc
+import os
+import signal
+import socket
+import time
+import traceback
+
+GRACEFUL_TIMEOUT = 30  # seconds a stopping worker gets before it is killed
+POLL_INTERVAL = 0.5  # how often idle workers and the parent check for signals
+
+_draining = False
+
+
+def is_draining():
+    """True in a worker that has been told to stop and is finishing its last request."""
+    return _draining
+
+
+def available_cpus():
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except AttributeError:  # not on Linux
+        return list(range(os.cpu_count() or 1))
+
+
+class PreforkServer:
+    """Forks `workers` copies of a WSGI app that share one listening socket."""
+
+    def __init__(self, app, host='0.0.0.0', port=5000, workers=2, on_worker_start=None, on_reload=None,
+                 pin_cpus=False):
+        self.app = app
+        self.host, self.port = host, port
+        self.workers = workers
+        self.on_worker_start = on_worker_start
+        self.on_reload = on_reload
+        self.pin_cpus = pin_cpus
+        self.cpus = available_cpus()
+        self.threads = max(1, len(self.cpus) // workers)
+        self.socket = None
+        self.children = {}  # pid -> (generation, index)
+        self.stopping = {}  # pid -> kill deadline
+        self.generation = 0
+        self._signals = []
+
+    # --- Parent ---
+    def serve(self):
+        self.socket = socket.create_server((self.host, self.port), backlog=1024)
+        # Idle workers all wait on this socket; the losers of an accept race must not block
+        self.socket.setblocking(False)
+        for signum in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda signum, frame: self._signals.append(signum))
+        print(f"✅ Serving on {self.host}:{self.port} with {self.workers} workers "
+              f"({self.threads} inference thread(s) each, parent pid {os.getpid()}).")
+        gc.freeze()
+        self._spawn_generation()
+        try:
+            while True:
+                while self._signals:
+                    signum = self._signals.pop(0)
+                    if signum == signal.SIGHUP:
+                        self._reload()
+                    else:
+                        self._shutdown()
+                        return
+                self._reap()
+                self._respawn()
+                time.sleep(POLL_INTERVAL)
+        finally:
+            self.socket.close()
+
+    def _spawn_generation(self):
+        self.generation += 1
+        for index in range(self.workers):
+            self._spawn(index)
+
+    def _spawn(self, index):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                self._run_worker(index)
+            except BaseException:
+                traceback.print_exc()
+                os._exit(1)
+            os._exit(0)
+        self.children[pid] = (self.generation, index)
+
+    def _reload(self):
+        print("ℹ️ Reload requested.")
+        if self.on_reload is not None and not self.on_reload():
+            print("❌ Reload failed; the current workers keep serving.")
+            return
+        old = [pid for pid, (generation, _) in self.children.items() if generation == self.generation]
+        gc.freeze()
+        self._spawn_generation()
+        self._stop(old)
+        print(f"✅ Generation {self.generation} started; {len(old)} old workers are draining.")
+
+    def _stop(self, pids):
+        deadline = time.monotonic() + GRACEFUL_TIMEOUT
+        for pid in pids:
+            self.stopping[pid] = deadline
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def _reap(self):
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                break
+            self.children.pop(pid, None)
+            if self.stopping.pop(pid, None) is None:
+                print(f"❌ Worker {pid} exited unexpectedly (status {status}); replacing it.")
+        now = time.monotonic()
+        for pid, deadline in list(self.stopping.items()):
+            if now > deadline:
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+
+    def _respawn(self):
+        running = {index for generation, index in self.children.values() if generation == self.generation}
+        for index in range(self.workers):
+            if index not in running:
+                self._spawn(index)
+
+    def _shutdown(self):
+        print("ℹ️ Shutting down workers...")
+        self._stop(list(self.children))
+        while self.children:
+            self._reap()
+            time.sleep(0.05)
+        print("✅ All workers stopped.")
+
+    # --- Worker ---
+    def _run_worker(self, index):
+        global _draining
+        from werkzeug.serving import make_server
+
+        stop = []
+
+        def drain(signum, frame):
+            global _draining
+            _draining = True
+            stop.append(signum)
+
+        signal.signal(signal.SIGTERM, drain)
+        signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl-C reaches the whole group; the parent decides
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        _draining = False
+
+        if self.pin_cpus:
+            first = index * self.threads % len(self.cpus)
+            os.sched_setaffinity(0, self.cpus[first:first + self.threads])
+        if self.on_worker_start is not None:
+            self.on_worker_start(index, self.threads)
+
+        server = make_server(self.host, self.port, self.app, fd=self.socket.fileno())
+        server.timeout = POLL_INTERVAL
+        while not stop:
+            server.handle_request()
+        server.socket.close()
+
+
+# --- Scaling Measurement ---
+# Starts app.py with WORKERS=1..N on a spare port and drives /predict from
+# CLIENTS client processes (one short-lived connection per request, like the
+# simulator) for a few seconds per worker count.
+if __name__ == "__main__":
+    import argparse
+    import http.client
+    import json
+    import subprocess
+    import sys
+    from multiprocessing import Process, Queue
+
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description="Measure app.py /predict throughput with 1..N pre-fork workers")
+    parser.add_argument('--workers', default=None, help="comma-separated worker counts (default: 1,2,4,... up to the cores)")
+    parser.add_argument('--clients', type=int, default=None, help="client processes (default: 2 per worker)")
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--port', type=int, default=5057)
+    args = parser.parse_args()
+
+    cores = len(available_cpus())
+    counts = ([int(n) for n in args.workers.split(',')] if args.workers
+              else sorted({1, *(2 ** i for i in range(1, cores.bit_length()) if 2 ** i <= cores), cores}))
+
+    df = pd.read_csv('simulation_paths.csv')
+    tourist = df['tourist_id'].iloc[0]
+    body = json.dumps({'path': df[df['tourist_id'] == tourist][['tourist_id', 'lat', 'lon', 'timestamp']]
+                       .head(60).to_dict('records')})
+
+    def post(port):
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+        connection.request('POST', '/predict', body, {'Content-Type': 'application/json'})
+        response = connection.getresponse()
+        response.read()
+        connection.close()
+        return response.status
+
+    def client(port, seconds, results):
+        done = failed = 0
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            try:
+                done += post(port) == 200
+            except OSError:
+                failed += 1
+        results.put((done, failed))
+
+    def wait_ready(port, timeout=60):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+                connection.request('GET', '/ready')
+                if connection.getresponse().status == 200:
+                    return True
+            except OSError:
+                pass
+            time.sleep(0.2)
+        return False
+
+    print(f"{cores} core(s) available")
+    baseline = None
+    for n in counts:
+        env = dict(os.environ, WORKERS=str(n), PORT=str(args.port), METRICS='0')
+        server = subprocess.Popen([sys.executable, 'app.py'], env=env,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            if not wait_ready(args.port):
+                print(f"❌ Server with {n} workers did not become ready.")
+                continue
+            for _ in range(2 * n):  # warm every worker
+                post(args.port)
+            results = Queue()
+            clients = [Process(target=client, args=(args.port, args.seconds, results))
+                       for _ in range(args.clients or 2 * n)]
+            for p in clients:
+                p.start()
+            totals = [results.get() for _ in clients]
+            for p in clients:
+                p.join()
+        finally:
+            server.send_signal(signal.SIGTERM)
+            server.wait(timeout=GRACEFUL_TIMEOUT)
+        rate = sum(done for done, _ in totals) / args.seconds
+        failed = sum(failed for _, failed in totals)
+        baseline = baseline or rate
+        print(f"{n} worker(s): {rate:,.0f} req/s ({rate / baseline:.2f}x), {failed} failed")
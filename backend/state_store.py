@@ -0,0 +1,520 @@
+# --- Thread-Safe Live State Store ---
+# Live tourist records, their logs and the anomaly flags are split into shards
+# by tourist_id, each with its own lock, so concurrent requests for different
+# tourists never wait on each other. Every status transition (including the
+# SOS-sticky rule) happens under the tourist's shard lock, and snapshot/reset
+# take all shard locks in a fixed order so they see or change one consistent
+# state.
+#
+# Run this file directly for a multi-threaded stress test.
+
+import json
+import threading
+
+import numpy as np
+
+from alert_store import AlertStore, ALERT_CAPACITY, COALESCE_SECONDS
+from heatmap_index import STATUS_WEIGHTS
+from log_buffer import TouristLogBuffer, LOG_CAPACITY, STATUS_NAMES, now_us, to_iso
+
+NUM_SHARDS = 16
+
+ANOMALY_ALERT_MESSAGE = "You are on a wrong anomalous path. Return to the correct path immediately."
+SOS_ALERT_MESSAGE = "You raised an SOS. Help is on the way! Stay where you are."
+
+
+class _Shard:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.live = {}  # tourist_id -> live record
+        self.logs = {}  # tourist_id -> TouristLogBuffer
+        self.anomaly_flagged = set()  # tourists that already raised an anomaly alert
+
+
+class TouristStateStore:
+    """Sharded, lock-protected live state for the mock API server."""
+
+    def __init__(self, heatmap_index=None, events=None, num_shards=NUM_SHARDS, log_capacity=LOG_CAPACITY,
+                 alert_capacity=ALERT_CAPACITY, coalesce_seconds=COALESCE_SECONDS, position_index=None):
+        self.heatmap_index = heatmap_index
+        self.position_index = position_index  # optional PositionIndex (nearby.py) of current positions
+        self.events = events
+        self.log_capacity = log_capacity
+        self._shards = [_Shard() for _ in range(num_shards)]
+        self._alerts = AlertStore(alert_capacity, coalesce_seconds)
+        self._alerts_lock = threading.Lock()
+        self.journal = None  # optional StatePersistence (persistence.py) recording every change
+
+    def _shard(self, tourist_id):
+        return self._shards[hash(tourist_id) % len(self._shards)]
+
+    # --- Helpers (caller holds the shard lock) ---
+    def _log(self, shard, tourist_id, lat, lon, status, at_us):
+        if tourist_id not in shard.logs:
+            shard.logs[tourist_id] = TouristLogBuffer(self.log_capacity)
+        # The ring buffer keeps only the last log_capacity entries; the one it
+        # overwrites is taken back out of the heatmap
+        evicted = shard.logs[tourist_id].append(lat, lon, status, at_us)
+        if self.heatmap_index is not None:
+            self.heatmap_index.add(lat, lon, status)
+            if evicted:
+                self.heatmap_index.remove(*evicted)
+
+    def _place(self, tourist_id, record):
+        if self.position_index is not None:
+            if record["lat"] is None or record["lon"] is None:
+                self.position_index.remove(tourist_id)
+            else:
+                self.position_index.update(tourist_id, record["lat"], record["lon"])
+
+    def _publish(self, shard, event, tourist_id):
+        if self.events is not None:
+            self.events.publish(event, {"tourist_id": tourist_id, **shard.live[tourist_id]})
+
+    def _record(self, *entry):
+        # Written while the transition's locks are held, so the journal sees
+        # each tourist's changes (and the alert list) in the order they happened
+        if self.journal is not None:
+            self.journal.record(*entry)
+
+    def _add_alert(self, alert_type, tourist_id, message, at_us, entry=None, details=None):
+        with self._alerts_lock:
+            self._alerts.add(alert_type, tourist_id, message, at_us, details)
+            if entry is not None:
+                self._record(*entry)
+
+    def add_alert(self, alert_type, tourist_id, message, at_us=None, details=None):
+        at_us = now_us() if at_us is None else at_us
+        if details:
+            entry = ("detailed_alert", at_us, tourist_id, None, None, 0, alert_type,
+                     json.dumps({"message": message, "details": details}))
+        else:
+            entry = ("alert", at_us, tourist_id, None, None, 0, alert_type, message)
+        self._add_alert(alert_type, tourist_id, message, at_us, entry, details)
+
+    # --- Transitions ---
+    # at_us (epoch microseconds) defaults to now; replaying a journal passes the recorded time.
+    def start_tourist(self, tourist_id, lat, lon, path_type, at_us=None):
+        """Begin tracking a tourist at the first point of its path."""
+        at_us = now_us() if at_us is None else at_us
+        shard = self._shard(tourist_id)
+        with shard.lock:
+            shard.live[tourist_id] = {
+                "lat": lat,
+                "lon": lon,
+                "status": "normal",   # default
+                "path_type": path_type,
+                "timestamp": to_iso(at_us)
+            }
+            self._log(shard, tourist_id, lat, lon, "normal", at_us)
+            self._place(tourist_id, shard.live[tourist_id])
+            self._publish(shard, "location", tourist_id)
+            self._record("start", at_us, tourist_id, lat, lon, 0, path_type)
+
+    def update_location(self, tourist_id, lat, lon, status="normal", at_us=None):
+        """Move a tracked tourist. SOS persists until explicitly resolved. Returns the record or None."""
+        at_us = now_us() if at_us is None else at_us
+        shard = self._shard(tourist_id)
+        with shard.lock:
+            record = shard.live.get(tourist_id)
+            if record is None:
+                return None
+            previous_status = record["status"]
+            record["lat"] = lat
+            record["lon"] = lon
+            if previous_status != "sos":
+                record["status"] = status
+            record["timestamp"] = to_iso(at_us)
+
+            self._log(shard, tourist_id, lat, lon, record["status"], at_us)
+            self._place(tourist_id, record)
+            self._publish(shard, "status" if record["status"] != previous_status else "location", tourist_id)
+            self._record("location", at_us, tourist_id, lat, lon, 0, status)
+            return dict(record)
+
+    def apply_prediction(self, tourist_id, is_anomaly, at_us=None):
+        """Set a tracked tourist's status from a prediction, unless it is in SOS. Returns the record or None."""
+        at_us = now_us() if at_us is None else at_us
+        shard = self._shard(tourist_id)
+        with shard.lock:
+            record = shard.live.get(tourist_id)
+            if record is None or record["status"] == "sos":
+                return None
+            previous_status = record["status"]
+            record["status"] = "anomaly" if is_anomaly else "normal"
+            record["timestamp"] = to_iso(at_us)
+
+            # Alert only the first time this tourist is flagged
+            entry = ("prediction", at_us, tourist_id, None, None, int(bool(is_anomaly)))
+            if is_anomaly and tourist_id not in shard.anomaly_flagged:
+                shard.anomaly_flagged.add(tourist_id)
+                self._add_alert("anomaly", tourist_id, ANOMALY_ALERT_MESSAGE, at_us, entry)
+            else:
+                self._record(*entry)
+
+            self._log(shard, tourist_id, record["lat"], record["lon"], record["status"], at_us)
+            if record["status"] != previous_status:
+                self._publish(shard, "status", tourist_id)
+            return dict(record)
+
+    def raise_sos(self, tourist_id, lat, lon, at_us=None, details=None):
+        """Put a tourist (tracked or not) into SOS and raise an SOS alert, with optional extra alert fields."""
+        at_us = now_us() if at_us is None else at_us
+        shard = self._shard(tourist_id)
+        with shard.lock:
+            record = shard.live.get(tourist_id)
+            if record is None:
+                record = shard.live[tourist_id] = {
+                    "lat": lat,
+                    "lon": lon,
+                    "status": "sos",
+                    "timestamp": to_iso(at_us)
+                }
+            else:
+                record["status"] = "sos"
+                record["timestamp"] = to_iso(at_us)
+                if lat and lon:
+                    record["lat"] = lat
+                    record["lon"] = lon
+
+            self._log(shard, tourist_id, lat, lon, "sos", at_us)
+            self._place(tourist_id, record)
+            self._publish(shard, "status", tourist_id)
+            entry = ("sos", at_us, tourist_id, lat, lon, 0, json.dumps(details) if details else None)
+            self._add_alert("sos", tourist_id, SOS_ALERT_MESSAGE, at_us, entry, details)
+            return dict(record)
+
+    def resolve_sos(self, tourist_id, at_us=None):
+        """Return a tracked tourist to normal. Returns the record or None."""
+        at_us = now_us() if at_us is None else at_us
+        shard = self._shard(tourist_id)
+        with shard.lock:
+            record = shard.live.get(tourist_id)
+            if record is None:
+                return None
+            record["status"] = "normal"
+            record["timestamp"] = to_iso(at_us)
+            self._log(shard, tourist_id, record["lat"], record["lon"], "normal", at_us)
+            self._publish(shard, "resolve", tourist_id)
+            self._record("resolve", at_us, tourist_id, None, None, 0)
+            return dict(record)
+
+    def replay(self, op, at_us, tourist_id, lat, lon, flag, text1, text2):
+        """Re-apply one journal entry (see persistence.py) with its recorded time."""
+        if op == "start":
+            self.start_tourist(tourist_id, lat, lon, text1, at_us)
+        elif op == "location":
+            self.update_location(tourist_id, lat, lon, text1, at_us)
+        elif op == "prediction":
+            self.apply_prediction(tourist_id, bool(flag), at_us)
+        elif op == "sos":
+            self.raise_sos(tourist_id, lat, lon, at_us, json.loads(text1) if text1 else None)
+        elif op == "resolve":
+            self.resolve_sos(tourist_id, at_us)
+        elif op == "alert":
+            self.add_alert(text1, tourist_id, text2, at_us)
+        elif op == "detailed_alert":
+            alert = json.loads(text2)
+            self.add_alert(text1, tourist_id or None, alert["message"], at_us, alert["details"])
+        elif op == "clear_alerts":
+            self.clear_alerts(tourist_id or None, text1, int(text2) if text2 else None)
+        elif op == "reset":
+            self.reset()
+
+    # --- Reads ---
+    def get(self, tourist_id):
+        shard = self._shard(tourist_id)
+        with shard.lock:
+            record = shard.live.get(tourist_id)
+            return dict(record) if record is not None else None
+
+    def log_entries(self, tourist_id, since=None, until=None, limit=None):
+        shard = self._shard(tourist_id)
+        with shard.lock:
+            logs = shard.logs.get(tourist_id)
+            return logs.entries(tourist_id, since, until, limit) if logs is not None else []
+
+    def log_columns(self, tourist_id, since=None, until=None):
+        """(lat, lon, timestamp, status) arrays of a tourist's log, or None if it has none."""
+        shard = self._shard(tourist_id)
+        with shard.lock:
+            logs = shard.logs.get(tourist_id)
+            return logs.columns(since, until) if logs is not None else None
+
+    def snapshot(self):
+        """Copies of all live records, taken while every shard is locked."""
+        self._lock_all()
+        try:
+            return {
+                tourist_id: dict(record)
+                for shard in self._shards
+                for tourist_id, record in shard.live.items()
+            }
+        finally:
+            self._unlock_all()
+
+    def alerts(self, since=None, limit=None, tourist_id=None, alert_type=None):
+        """Alerts after id `since` (exclusive), oldest first, optionally for one tourist and/or type."""
+        with self._alerts_lock:
+            return self._alerts.query(since, limit, tourist_id, alert_type)
+
+    def clear_alerts(self, tourist_id=None, alert_type=None, up_to=None):
+        """Drop all alerts, or only a tourist's, a type's and/or those up to an id. Returns how many."""
+        with self._alerts_lock:
+            removed = self._alerts.remove(tourist_id, alert_type, up_to)
+            self._record("clear_alerts", now_us(), tourist_id or "", None, None, 0,
+                         alert_type, None if up_to is None else str(up_to))
+            return removed
+
+    def stats(self):
+        """Tracked tourists and stored log entries."""
+        self._lock_all()
+        try:
+            return {
+                "tourists": sum(len(shard.live) for shard in self._shards),
+                "log_entries": sum(len(logs) for shard in self._shards for logs in shard.logs.values()),
+                "alerts": len(self._alerts),
+            }
+        finally:
+            self._unlock_all()
+
+    # --- Reset ---
+    def reset(self):
+        """Drop all state atomically with respect to in-flight transitions."""
+        # Under the locks the state is only swapped for empty containers; the
+        # detached pre-reset state is archived afterwards, so serializing it
+        # does not hold up requests
+        detached = []
+        self._lock_all()
+        try:
+            for shard in self._shards:
+                old = _Shard()
+                old.live, old.logs, old.anomaly_flagged = shard.live, shard.logs, shard.anomaly_flagged
+                shard.live, shard.logs, shard.anomaly_flagged = {}, {}, set()
+                detached.append(old)
+            if self.heatmap_index is not None:
+                self.heatmap_index.clear()
+            if self.position_index is not None:
+                self.position_index.clear()
+            with self._alerts_lock:
+                old_alerts = self._alerts
+                self._alerts = AlertStore(old_alerts.capacity, old_alerts.coalesce_seconds)
+                self._alerts.next_id = old_alerts.next_id  # ids keep counting across resets
+                self._record("reset", now_us(), "", None, None, 0)
+            if self.events is not None:
+                self.events.publish("reset", {})
+        finally:
+            self._unlock_all()
+        if self.journal is not None:
+            # The pre-reset state is archived, so a reset no longer loses incident history
+            self.journal.archive(self._export(detached, old_alerts))
+
+    # --- Snapshots ---
+    def checkpoint(self, mark):
+        """Call mark() and export the state in one consistent cut. Returns (mark(), state)."""
+        self._lock_all()
+        try:
+            with self._alerts_lock:
+                return mark(), self._export()
+        finally:
+            self._unlock_all()
+
+    def _export(self, shards=None, alerts=None):
+        # Caller holds every shard lock and the alert lock, or passes state
+        # detached from the store. Logs become flat columns plus offsets.
+        shards = self._shards if shards is None else shards
+        alerts = self._alerts if alerts is None else alerts
+        log_ids, offsets, columns = [], [0], [[], [], [], []]
+        for shard in shards:
+            for tourist_id, logs in shard.logs.items():
+                log_ids.append(tourist_id)
+                for column, values in zip(columns, logs.columns()):
+                    column.append(values)
+                offsets.append(offsets[-1] + len(logs))
+        lat, lon, timestamp, status = (
+            np.concatenate(column) if column else np.empty(0, dtype=dtype)
+            for column, dtype in zip(columns, (np.float64, np.float64, np.int64, np.uint8))
+        )
+        return {
+            "live": json.dumps({t: r for shard in shards for t, r in shard.live.items()}),
+            "anomaly_flagged": json.dumps(sorted(t for shard in shards for t in shard.anomaly_flagged)),
+            "alerts": json.dumps(alerts.query()),
+            "alert_next_id": alerts.next_id,
+            "log_capacity": self.log_capacity,
+            "log_tourists": json.dumps(log_ids),
+            "log_offsets": np.asarray(offsets, dtype=np.int64),
+            "log_lat": lat,
+            "log_lon": lon,
+            "log_timestamp": timestamp,
+            "log_status": status,
+        }
+
+    def load(self, snapshot):
+        """Replace the whole state with an exported one. The heatmap is not touched; see rebuild_heatmap()."""
+        self._lock_all()
+        try:
+            for shard in self._shards:
+                shard.live.clear()
+                shard.logs.clear()
+                shard.anomaly_flagged.clear()
+            if self.position_index is not None:
+                self.position_index.clear()
+            for tourist_id, record in json.loads(snapshot["live"]).items():
+                self._shard(tourist_id).live[tourist_id] = record
+                self._place(tourist_id, record)
+            for tourist_id in json.loads(snapshot["anomaly_flagged"]):
+                self._shard(tourist_id).anomaly_flagged.add(tourist_id)
+
+            offsets = snapshot["log_offsets"]
+            lat, lon = snapshot["log_lat"], snapshot["log_lon"]
+            timestamp, status = snapshot["log_timestamp"], snapshot["log_status"]
+            if int(snapshot["log_capacity"]) > self.log_capacity:
+                # Smaller buffers than when the snapshot was taken: keep each tourist's newest entries
+                keep = np.concatenate([np.arange(max(a, b - self.log_capacity), b)
+                                       for a, b in zip(offsets[:-1], offsets[1:])] or [np.empty(0, dtype=np.int64)])
+                lat, lon, timestamp, status = lat[keep], lon[keep], timestamp[keep], status[keep]
+                offsets = np.r_[0, np.cumsum(np.minimum(np.diff(offsets), self.log_capacity))]
+            for i, tourist_id in enumerate(json.loads(snapshot["log_tourists"])):
+                a, b = offsets[i], offsets[i + 1]
+                self._shard(tourist_id).logs[tourist_id] = TouristLogBuffer.from_columns(
+                    lat[a:b], lon[a:b], timestamp[a:b], status[a:b], self.log_capacity)
+            with self._alerts_lock:
+                # Snapshots from before alert ids have no alert_next_id
+                next_id = snapshot["alert_next_id"] if "alert_next_id" in snapshot else None
+                self._alerts.load(json.loads(snapshot["alerts"]), next_id)
+        finally:
+            self._unlock_all()
+
+    def rebuild_heatmap(self):
+        """Recount the heatmap from the current logs in one vectorized pass."""
+        if self.heatmap_index is None:
+            return
+        self._lock_all()
+        try:
+            self.heatmap_index.clear()
+            columns = [logs.columns() for shard in self._shards for logs in shard.logs.values()]
+            if columns:
+                lat, lon, _, status = (np.concatenate(column) for column in zip(*columns))
+                weights = np.array([STATUS_WEIGHTS[name] for name in STATUS_NAMES])
+                self.heatmap_index.add_many(lat, lon, weights[status])
+        finally:
+            self._unlock_all()
+
+    # Shard locks are always taken in index order, and the alerts lock only
+    # after a shard lock, so multi-shard operations cannot deadlock.
+    def _lock_all(self):
+        for shard in self._shards:
+            shard.lock.acquire()
+
+    def _unlock_all(self):
+        for shard in reversed(self._shards):
+            shard.lock.release()
+
+
+# --- Stress Test ---
+# Hammers one store from many threads, then checks that nothing was lost or
+# corrupted: log counts, heatmap totals, the SOS-sticky rule and single
+# anomaly alerts per tourist.
+if __name__ == "__main__":
+    import random
+    import time
+    from heatmap_index import GridDensityIndex
+    from live_events import LiveEventBroker
+
+    NUM_THREADS = 32
+    NUM_TOURISTS = 200
+    OPS_PER_THREAD = 2000
+
+    heatmap = GridDensityIndex()
+    store = TouristStateStore(heatmap_index=heatmap, events=LiveEventBroker(), log_capacity=50)
+    tourist_ids = [f"stress_{i}" for i in range(NUM_TOURISTS)]
+    failures = []
+
+    def check(condition, message):
+        if not condition:
+            failures.append(message)
+
+    def hammer(seed, ops, allow_sos):
+        rng = random.Random(seed)
+        for _ in range(ops):
+            tourist_id = rng.choice(tourist_ids)
+            roll = rng.random()
+            if roll < 0.5:
+                store.update_location(tourist_id, 27 + rng.random(), 88 + rng.random(), "normal")
+            elif roll < 0.85:
+                store.apply_prediction(tourist_id, rng.random() < 0.5)
+            elif roll < 0.9 and allow_sos:
+                store.raise_sos(tourist_id, 27 + rng.random(), 88 + rng.random())
+            elif roll < 0.95 and allow_sos:
+                store.resolve_sos(tourist_id)
+            else:
+                snapshot = store.snapshot()
+                check(all(r["status"] in ("normal", "anomaly", "sos") for r in snapshot.values()),
+                      "snapshot contained an unknown status")
+
+    def keep_resetting():
+        for _ in range(50):
+            store.reset()
+            time.sleep(0.001)
+
+    def flag_everyone():
+        for tourist_id in tourist_ids * 5:
+            store.apply_prediction(tourist_id, True)
+
+    def run_threads(targets):
+        threads = [threading.Thread(target=target) for target in targets]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    start = time.perf_counter()
+
+    # Phase 1: mixed traffic while another thread keeps resetting
+    for tourist_id in tourist_ids:
+        store.start_tourist(tourist_id, 27.0, 88.0, "normal")
+    run_threads([keep_resetting] + [
+        lambda seed=i: hammer(seed, OPS_PER_THREAD, True) for i in range(NUM_THREADS - 1)
+    ])
+    store.reset()
+    check(store.stats() == {"tourists": 0, "log_entries": 0, "alerts": 0}, "state left over after reset")
+    check(not any(heatmap.levels[heatmap.max_zoom]), "heatmap left over after reset")
+
+    # Phase 2: mixed traffic without resets
+    for tourist_id in tourist_ids:
+        store.start_tourist(tourist_id, 27.0, 88.0, "normal")
+    run_threads([lambda seed=i: hammer(seed, OPS_PER_THREAD, True) for i in range(NUM_THREADS)])
+
+    # Phase 3: everyone in SOS, then updates and predictions only: SOS must stick
+    for tourist_id in tourist_ids:
+        store.raise_sos(tourist_id, 27.0, 88.0)
+    run_threads([lambda seed=i: hammer(1000 + seed, OPS_PER_THREAD, False) for i in range(NUM_THREADS)])
+    snapshot = store.snapshot()
+    check(all(r["status"] == "sos" for r in snapshot.values()), "an SOS status was overwritten")
+
+    # Phase 4: resolve, then concurrent anomaly predictions: one alert per tourist
+    store.clear_alerts()
+    for tourist_id in tourist_ids:
+        store.resolve_sos(tourist_id)
+    store.reset()
+    for tourist_id in tourist_ids:
+        store.start_tourist(tourist_id, 27.0, 88.0, "normal")
+    run_threads([flag_everyone] * NUM_THREADS)
+    anomaly_alerts = [a for a in store.alerts() if a["type"] == "anomaly"]
+    check(len(anomaly_alerts) == NUM_TOURISTS, f"{len(anomaly_alerts)} anomaly alerts for {NUM_TOURISTS} tourists")
+
+    # Logs and heatmap must agree entry for entry
+    stats = store.stats()
+    heatmap_total = sum(cell[0] for cell in heatmap.levels[heatmap.max_zoom].values())
+    check(stats["log_entries"] == heatmap_total,
+          f"heatmap counts {heatmap_total} points but logs hold {stats['log_entries']}")
+    check(stats["log_entries"] == NUM_TOURISTS * 50, "log buffers are not all full")
+    alert_ids = [a["id"] for a in store.alerts()]
+    check(alert_ids == sorted(set(alert_ids)), "alert ids are not unique and increasing")
+
+    elapsed = time.perf_counter() - start
+    print(f"{NUM_THREADS} threads, {NUM_TOURISTS} tourists, finished in {elapsed:.1f}s")
+    if failures:
+        print(f"❌ Stress test failed: {sorted(set(failures))}")
+    else:
+        print("✅ State store stayed consistent under concurrent load.")
@@ -2,43 +2,41 @@
 
 import requests
 import json
-import pandas as pd
 import random
+from path_store import PathStore
 
 # The URL of your locally running Flask server
 API_URL = "http://127.0.0.1:5000/predict"
 
 # --- Load the curated simulation dataset ---
 try:
-    df_simulation = pd.read_csv('simulation_paths.csv')
+    path_store = PathStore.load('simulation_paths.csv')
     print("✅ Successfully loaded 'simulation_paths.csv'.")
 
     # Separate the paths for testing
-    df_normal_paths = df_simulation[df_simulation['path_type'] == 'normal']
-    df_anomalous_paths = df_simulation[df_simulation['path_type'] == 'anomaly']
+    normal_ids = path_store.ids_by_type.get('normal', [])
+    anomalous_ids = path_store.ids_by_type.get('anomaly', [])
 
 except FileNotFoundError:
     print("❌ Error: 'simulation_paths.csv' not found. Please run 'create_simulation_data.py' first.")
-    df_simulation = None
+    path_store = None
 
 # --- Prepare a realistic normal path from the simulation file ---
-if df_simulation is not None and not df_normal_paths.empty:
-    normal_tourist_id = random.choice(df_normal_paths['tourist_id'].unique())
-    realistic_normal_path = df_normal_paths[df_normal_paths['tourist_id'] == normal_tourist_id]
+if path_store is not None and normal_ids:
+    normal_tourist_id = random.choice(normal_ids)
 
     normal_path_data = {
-        "path": realistic_normal_path[['tourist_id', 'lat', 'lon', 'timestamp']].to_dict('records')
+        "path": path_store.records(normal_tourist_id)
     }
 else:
     normal_path_data = None
 
 # --- Prepare a realistic anomalous path from the simulation file ---
-if df_simulation is not None and not df_anomalous_paths.empty:
-    anomalous_tourist_id = random.choice(df_anomalous_paths['tourist_id'].unique())
-    realistic_anomalous_path = df_anomalous_paths[df_anomalous_paths['tourist_id'] == anomalous_tourist_id]
+if path_store is not None and anomalous_ids:
+    anomalous_tourist_id = random.choice(anomalous_ids)
 
     anomalous_path_data = {
-        "path": realistic_anomalous_path[['tourist_id', 'lat', 'lon', 'timestamp']].to_dict('records')
+        "path": path_store.records(anomalous_tourist_id)
     }
 else:
     anomalous_path_data = None
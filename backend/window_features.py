@@ -0,0 +1,255 @@
+# --- Sliding-Window Trajectory Features ---
+# Whole-path aggregates dilute local events: a long normal walk hides a recent
+# stop or burst of speed. WindowFeatureState extends the streaming
+# PathFeatureState with rolling windows over the last 1, 5 and 15 minutes of a
+# tourist's segments (a segment joins two consecutive points and is stamped
+# with the later point's time). Each window keeps running sums plus a
+# monotonic deque for the max, so adding a point and expiring old segments is
+# amortized O(1).
+#
+# Per window:      speed mean/std/max, distance, dwell time (time spent below
+#                  DWELL_SPEED_KMH) and mean absolute heading change.
+# Per tourist:     distance from the path walked before the longest window
+#                  (visited-cell grid, bounded ring search).
+#
+# The same class serves /predict online (app.py, WINDOW_FEATURES=1) and the
+# offline per-point table for retraining (run this file directly).
+
+import math
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from features import FEATURE_COLUMNS, PathFeatureState, haversine
+
+WINDOWS = (('1m', 60), ('5m', 300), ('15m', 900))  # (column suffix, seconds)
+DWELL_SPEED_KMH = 1.0  # slower segments count as dwelling
+MOVING_DISTANCE_KM = 0.005  # shorter segments have no meaningful heading
+PATH_CELL_DEGREES = 0.01  # about 1 km; visited-path grid resolution
+PATH_SEARCH_RINGS = 3  # cells searched around the current one
+PATH_DISTANCE_CAP_KM = 5.0  # reported when no earlier path is within the searched rings
+
+WINDOW_FEATURE_COLUMNS = [
+    f"{name}_{suffix}"
+    for suffix, _ in WINDOWS
+    for name in ('speed_mean', 'speed_std', 'speed_max', 'distance', 'dwell_seconds', 'heading_change', 'num_segments')
+] + ['distance_from_path']
+
+
+def heading(lat1, lon1, lat2, lon2):
+    """Initial bearing from point 1 to point 2 in degrees [0, 360)."""
+    lat1, lat2 = math.radians(lat1), math.radians(lat2)
+    d_lon = math.radians(lon2 - lon1)
+    x = math.sin(d_lon) * math.cos(lat2)
+    y = math.cos(lat1) * math.sin(lat2) - math.sin(lat1) * math.cos(lat2) * math.cos(d_lon)
+    return math.degrees(math.atan2(x, y)) % 360
+
+
+class SlidingWindow:
+    """Running statistics over the segments of the last `seconds` seconds."""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.segments = deque()  # (end_time, distance, speed, dwell, turn)
+        self.maxima = deque()  # (end_time, speed), speeds decreasing
+        self._zero()
+
+    def _zero(self):
+        # Reset when the window empties, so float drift from add/subtract never accumulates
+        self.speed_sum = 0.0
+        self.speed_sq_sum = 0.0
+        self.distance = 0.0
+        self.dwell = 0.0
+        self.turn_sum = 0.0
+        self.turn_count = 0
+
+    def add(self, end_time, time_delta, distance, speed, turn):
+        # A gap longer than the window only contributes the window's worth of dwelling
+        dwell = min(time_delta, self.seconds) if speed < DWELL_SPEED_KMH else 0.0
+        self.segments.append((end_time, distance, speed, dwell, turn))
+        self.speed_sum += speed
+        self.speed_sq_sum += speed * speed
+        self.distance += distance
+        self.dwell += dwell
+        if turn is not None:
+            self.turn_sum += turn
+            self.turn_count += 1
+        while self.maxima and self.maxima[-1][1] <= speed:
+            self.maxima.pop()
+        self.maxima.append((end_time, speed))
+        self.expire(end_time)
+
+    def expire(self, now):
+        """Drop segments that ended `seconds` or more before `now`. Returns them."""
+        cutoff = now - self.seconds
+        expired = []
+        while self.segments and self.segments[0][0] <= cutoff:
+            segment = self.segments.popleft()
+            _, distance, speed, dwell, turn = segment
+            self.speed_sum -= speed
+            self.speed_sq_sum -= speed * speed
+            self.distance -= distance
+            self.dwell -= dwell
+            if turn is not None:
+                self.turn_sum -= turn
+                self.turn_count -= 1
+            expired.append(segment)
+        while self.maxima and self.maxima[0][0] <= cutoff:
+            self.maxima.popleft()
+        if not self.segments:
+            self._zero()
+        return expired
+
+    def features(self, suffix):
+        n = len(self.segments)
+        mean = self.speed_sum / n if n else 0.0
+        # Sample std like the whole-path aggregate; 0 rather than NaN so responses stay valid JSON
+        variance = (self.speed_sq_sum - n * mean * mean) / (n - 1) if n > 1 else 0.0
+        return {
+            f'speed_mean_{suffix}': mean,
+            f'speed_std_{suffix}': math.sqrt(max(variance, 0.0)),
+            f'speed_max_{suffix}': self.maxima[0][1] if self.maxima else 0.0,
+            f'distance_{suffix}': max(self.distance, 0.0),
+            f'dwell_seconds_{suffix}': max(self.dwell, 0.0),
+            f'heading_change_{suffix}': self.turn_sum / self.turn_count if self.turn_count else 0.0,
+            f'num_segments_{suffix}': n,
+        }
+
+
+class WindowFeatureState(PathFeatureState):
+    """PathFeatureState plus rolling 1/5/15-minute windows and distance from the earlier path."""
+
+    columns = FEATURE_COLUMNS + WINDOW_FEATURE_COLUMNS
+
+    def clear(self):
+        super().clear()
+        self.windows = [(suffix, SlidingWindow(seconds)) for suffix, seconds in WINDOWS]
+        self.pending = deque()  # points still inside the longest window, not yet in the path grid
+        self.visited = {}  # (cy, cx) from _cell(lat, lon) -> [lat_sum, lon_sum, count] of older points
+        self.last_heading = None
+        self.distance_from_path = 0.0
+
+    def add_point(self, lat, lon, timestamp):
+        previous = (self.last_lat, self.last_lon, self.last_time)
+        if not super().add_point(lat, lon, timestamp):
+            return False
+        now = self.last_time.value / 1e9
+
+        if self.num_points > 1:
+            prev_lat, prev_lon, prev_time = previous
+            time_delta = (self.last_time - prev_time).total_seconds()
+            distance = float(haversine(prev_lat, prev_lon, lat, lon))
+            speed = distance / (time_delta / 3600) if time_delta else 0.0
+            turn = None
+            if distance >= MOVING_DISTANCE_KM:
+                bearing = heading(prev_lat, prev_lon, lat, lon)
+                if self.last_heading is not None:
+                    turn = abs((bearing - self.last_heading + 180) % 360 - 180)
+                self.last_heading = bearing
+            for _, window in self.windows:
+                window.add(now, time_delta, distance, speed, turn)
+        else:
+            for _, window in self.windows:
+                window.expire(now)
+
+        # Points older than the longest window become "the path so far"
+        longest = WINDOWS[-1][1]
+        while self.pending and self.pending[0][0] <= now - longest:
+            _, old_lat, old_lon = self.pending.popleft()
+            cell = self.visited.setdefault(self._cell(old_lat, old_lon), [0.0, 0.0, 0])
+            cell[0] += old_lat
+            cell[1] += old_lon
+            cell[2] += 1
+        self.pending.append((now, lat, lon))
+        self.distance_from_path = self._path_distance(lat, lon)
+        return True
+
+    def _cell(self, lat, lon):
+        return int(lat // PATH_CELL_DEGREES), int(lon // PATH_CELL_DEGREES)
+
+    def _path_distance(self, lat, lon):
+        """Distance (km) to the nearest visited cell's mean position, 0 before any path exists."""
+        if not self.visited:
+            return 0.0
+        cy, cx = self._cell(lat, lon)
+        best = PATH_DISTANCE_CAP_KM
+        for dy in range(-PATH_SEARCH_RINGS, PATH_SEARCH_RINGS + 1):
+            for dx in range(-PATH_SEARCH_RINGS, PATH_SEARCH_RINGS + 1):
+                cell = self.visited.get((cy + dy, cx + dx))
+                if cell is not None:
+                    best = min(best, float(haversine(cell[0] / cell[2], cell[1] / cell[2], lat, lon)))
+        return best
+
+    def features(self):
+        row = super().features()
+        for suffix, window in self.windows:
+            row.update(window.features(suffix))
+        row['distance_from_path'] = self.distance_from_path
+        return row
+
+
+# --- Offline Table ---
+def calculate_window_features(df):
+    """One row per point: running whole-path aggregates and window features as of that point.
+
+    Built with the same WindowFeatureState the server uses online, so training
+    rows match what /predict sees. Extra input columns (anomaly_type,
+    path_type, ...) are carried over as labels.
+    """
+    df = df.assign(timestamp_dt=pd.to_datetime(df['timestamp']))
+    df = df.sort_values(['tourist_id', 'timestamp_dt'], kind='stable')
+    labels = [c for c in df.columns if c not in ('tourist_id', 'lat', 'lon', 'timestamp', 'timestamp_dt')]
+
+    rows = []
+    for tourist_id, group in df.groupby('tourist_id', sort=False):
+        state = WindowFeatureState()
+        for lat, lon, ts, *extra in zip(group['lat'], group['lon'], group['timestamp_dt'],
+                                        *(group[c] for c in labels)):
+            if state.add_point(lat, lon, ts):
+                rows.append({'tourist_id': tourist_id, 'timestamp': ts, **state.features(),
+                             **dict(zip(labels, extra))})
+    return pd.DataFrame(rows, columns=['tourist_id', 'timestamp'] + WindowFeatureState.columns + labels)
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+    from features import FeatureStateStore
+
+    parser = argparse.ArgumentParser(description="Per-point window features of simulation_paths.csv for retraining")
+    parser.add_argument('--csv', default='simulation_paths.csv')
+    parser.add_argument('--out', help="write the feature table to this CSV")
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.csv)
+    start = time.perf_counter()
+    table = calculate_window_features(df)
+    elapsed = time.perf_counter() - start
+    print(f"{len(table)} rows x {len(WindowFeatureState.columns)} features in {elapsed:.2f}s "
+          f"({len(table) / elapsed:,.0f} points/s)")
+
+    # Online parity: feed each path tick by tick, as the simulator re-sends it
+    store = FeatureStateStore(WindowFeatureState)
+    mismatches = 0
+    for tourist_id, group in df.groupby('tourist_id', sort=False):
+        points = group[['lat', 'lon', 'timestamp']].to_dict('records')
+        expected = table[table['tourist_id'] == tourist_id][WindowFeatureState.columns].to_numpy(float)
+        for i in range(len(points)):
+            online = store.update(tourist_id, points[:i + 1])[WindowFeatureState.columns].to_numpy(float)[0]
+            if not np.allclose(online, expected[i], rtol=1e-9, atol=1e-9, equal_nan=True):
+                mismatches += 1
+    if mismatches:
+        print(f"❌ {mismatches} online rows differ from the offline table.")
+    else:
+        print("✅ Online (tick by tick) features match the offline table.")
+
+    # How the local features separate the labelled events
+    summary_columns = ['speed_mean_5m', 'dwell_seconds_5m', 'heading_change_5m', 'distance_from_path']
+    label = table['anomaly_type'].fillna('none') if 'anomaly_type' in table else None
+    if label is not None:
+        print(table.groupby(label)[summary_columns].mean().round(2).to_string())
+
+    if args.out:
+        table.to_csv(args.out, index=False)
+        print(f"✅ Wrote {args.out}")
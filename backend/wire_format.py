@@ -0,0 +1,225 @@
+# --- Binary Path Frames ---
+# Compact alternative to the JSON point lists posted to /update_location,
+# /predict and /predict_batch, negotiated by Content-Type. A frame carries one
+# tourist's points as columns:
+#
+#   header   magic "PF", version, flags, id length (u16), attrs length (u16), point count (u32)
+#   id       tourist_id, UTF-8
+#   attrs    optional URL-encoded extras, e.g. "path_type=anomaly&status=normal"
+#   coords   first lat/lon as int32 micro-degrees, then per-point deltas as
+#            int16 (FLAG_SHORT_DELTAS, steps under ~3.6 km) or int32
+#   times    (FLAG_TIMESTAMPS) first epoch ms as int64, then int32 ms deltas
+#
+# About 6 bytes per point with timestamps instead of ~90 bytes of JSON. A body
+# may hold several frames back to back (one per tourist, for /predict_batch).
+# Decoding is a few np.frombuffer + cumsum calls; no per-point Python objects.
+# Coordinates are rounded to 1e-6 degrees (~0.1 m) and times to milliseconds.
+
+import struct
+from collections.abc import Sequence
+from urllib.parse import parse_qsl, urlencode
+
+import numpy as np
+
+CONTENT_TYPE = 'application/x-path-frame'
+MAGIC = b'PF'
+VERSION = 1
+COORD_SCALE = 1_000_000  # int units per degree
+
+FLAG_TIMESTAMPS = 1
+FLAG_SHORT_DELTAS = 2
+
+_HEADER = struct.Struct('<2sBBHHI')
+_ORIGIN = struct.Struct('<ii')
+_TIME_ORIGIN = struct.Struct('<q')
+
+
+class PathFrame(Sequence):
+    """One decoded frame: NumPy columns, readable as a list of /predict point dicts."""
+
+    def __init__(self, tourist_id, lat, lon, timestamp_ms=None, attrs=None):
+        self.tourist_id = tourist_id
+        self.lat = lat
+        self.lon = lon
+        self.timestamp_ms = timestamp_ms  # int64 epoch ms, or None
+        self.attrs = attrs or {}
+        self._timestamps = None
+
+    def __len__(self):
+        return len(self.lat)
+
+    def __getitem__(self, i):
+        # Built on demand, so code that only looks at the newest points (streaming features) stays cheap
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        point = {'tourist_id': self.tourist_id, 'lat': float(self.lat[i]), 'lon': float(self.lon[i])}
+        if self.timestamp_ms is not None:
+            point['timestamp'] = self.timestamps()[i]
+        return point
+
+    def timestamps(self):
+        """Timestamps as datetime64[ms]."""
+        if self._timestamps is None:
+            self._timestamps = self.timestamp_ms.astype('datetime64[ms]')
+        return self._timestamps
+
+
+def is_path_frame(content_type):
+    return (content_type or '').split(';')[0].strip().lower() == CONTENT_TYPE
+
+
+def encode_frame(tourist_id, lat, lon, timestamp_ms=None, attrs=None):
+    """Encode one tourist's points. timestamp_ms: epoch milliseconds (int) or None.
+
+    Raises ValueError if two consecutive timestamps are more than ~24.8 days (int32 ms) apart.
+    """
+    lat_units = np.round(np.asarray(lat, dtype=np.float64) * COORD_SCALE).astype(np.int64)
+    lon_units = np.round(np.asarray(lon, dtype=np.float64) * COORD_SCALE).astype(np.int64)
+    n = len(lat_units)
+    deltas = np.concatenate([np.diff(lat_units), np.diff(lon_units)])
+    flags = 0
+    if n < 2 or np.abs(deltas).max() <= np.iinfo(np.int16).max:
+        flags |= FLAG_SHORT_DELTAS
+    if timestamp_ms is not None:
+        flags |= FLAG_TIMESTAMPS
+
+    tourist_bytes = str(tourist_id).encode()
+    attrs_bytes = urlencode(attrs or {}).encode()
+    parts = [_HEADER.pack(MAGIC, VERSION, flags, len(tourist_bytes), len(attrs_bytes), n), tourist_bytes, attrs_bytes]
+    if n:
+        parts.append(_ORIGIN.pack(lat_units[0], lon_units[0]))
+        parts.append(deltas.astype('<i2' if flags & FLAG_SHORT_DELTAS else '<i4').tobytes())
+        if timestamp_ms is not None:
+            times = np.asarray(timestamp_ms, dtype=np.int64)
+            time_deltas = np.diff(times)
+            if n > 1 and np.abs(time_deltas).max() > np.iinfo(np.int32).max:
+                raise ValueError("Timestamp gap too large for a path frame (over ~24.8 days)")
+            parts.append(_TIME_ORIGIN.pack(times[0]))
+            parts.append(time_deltas.astype('<i4').tobytes())
+    return b''.join(parts)
+
+
+def decode_frames(data):
+    """All frames in a request body. Raises ValueError on malformed input."""
+    frames = []
+    view = memoryview(data)
+    offset = 0
+    while offset < len(view):
+        try:
+            magic, version, flags, id_length, attrs_length, n = _HEADER.unpack_from(view, offset)
+        except struct.error:
+            raise ValueError("Truncated path frame header")
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not a version 1 path frame")
+        offset += _HEADER.size
+        tourist_id = bytes(view[offset:offset + id_length]).decode()
+        offset += id_length
+        attrs = dict(parse_qsl(bytes(view[offset:offset + attrs_length]).decode()))
+        offset += attrs_length
+
+        lat = lon = np.empty(0)
+        timestamp_ms = np.empty(0, dtype=np.int64) if flags & FLAG_TIMESTAMPS else None
+        if n:
+            delta_type = np.dtype('<i2' if flags & FLAG_SHORT_DELTAS else '<i4')
+            size = _ORIGIN.size + 2 * (n - 1) * delta_type.itemsize
+            if flags & FLAG_TIMESTAMPS:
+                size += _TIME_ORIGIN.size + 4 * (n - 1)
+            if offset + size > len(view):
+                raise ValueError("Truncated path frame")
+
+            lat0, lon0 = _ORIGIN.unpack_from(view, offset)
+            offset += _ORIGIN.size
+            deltas = np.frombuffer(view, dtype=delta_type, count=2 * (n - 1), offset=offset).astype(np.int64)
+            offset += deltas.size * delta_type.itemsize
+            lat = np.cumsum(np.r_[lat0, deltas[:n - 1]]) / COORD_SCALE
+            lon = np.cumsum(np.r_[lon0, deltas[n - 1:]]) / COORD_SCALE
+            if flags & FLAG_TIMESTAMPS:
+                (t0,) = _TIME_ORIGIN.unpack_from(view, offset)
+                offset += _TIME_ORIGIN.size
+                time_deltas = np.frombuffer(view, dtype='<i4', count=n - 1, offset=offset)
+                offset += 4 * (n - 1)
+                timestamp_ms = np.cumsum(np.r_[np.int64(t0), time_deltas.astype(np.int64)])
+        frames.append(PathFrame(tourist_id, lat, lon, timestamp_ms, attrs))
+    return frames
+
+
+def read_payload(request):
+    """A Flask request's body as a dict: parsed JSON, or the same keys built from path frames.
+
+    For frames: tourist_id, path (the first frame), lat/lon (its last point),
+    paths (tourist_id -> frame), frames, plus the first frame's attrs.
+    Raises ValueError for malformed frames.
+    """
+    if not is_path_frame(request.content_type):
+        return request.get_json()
+    frames = decode_frames(request.get_data())
+    if not frames:
+        raise ValueError("Empty path frame body")
+    first = frames[0]
+    payload = dict(first.attrs)
+    if 'stream' in payload:
+        payload['stream'] = payload['stream'].lower() in ('1', 'true')
+    payload.update({
+        'tourist_id': first.tourist_id,
+        'path': first,
+        'lat': float(first.lat[-1]) if len(first) else None,
+        'lon': float(first.lon[-1]) if len(first) else None,
+        'paths': {frame.tourist_id: frame for frame in frames},
+        'frames': frames,
+    })
+    return payload
+
+
+def frames_to_arrays(frames):
+    """Concatenated (tourist_ids, lat, lon, timestamps as datetime64[ms]) of timestamped frames."""
+    return (
+        np.concatenate([np.full(len(frame), frame.tourist_id, dtype=object) for frame in frames]),
+        np.concatenate([frame.lat for frame in frames]),
+        np.concatenate([frame.lon for frame in frames]),
+        np.concatenate([frame.timestamps() for frame in frames]),
+    )
+
+
+# --- Size and Parse-Time Comparison ---
+if __name__ == "__main__":
+    import json
+    import time
+    import pandas as pd
+    from path_store import PathStore
+
+    store = PathStore.load()
+    json_bytes = frame_bytes = 0
+    json_time = frame_time = 0.0
+    max_error = 0.0
+    for tourist_id in store.tourist_ids:
+        records = store.records(tourist_id)
+        path = store.path(tourist_id)
+        body_json = json.dumps({'path': records, 'tourist_id': tourist_id}).encode()
+        body_frame = encode_frame(tourist_id, path.lat, path.lon, path.timestamp // 1000)
+        json_bytes += len(body_json)
+        frame_bytes += len(body_frame)
+
+        t0 = time.perf_counter()
+        points = json.loads(body_json)['path']
+        pd.to_datetime(pd.DataFrame(points)['timestamp'])
+        t1 = time.perf_counter()
+        (frame,) = decode_frames(body_frame)
+        frame.timestamps()
+        t2 = time.perf_counter()
+        json_time += t1 - t0
+        frame_time += t2 - t1
+        max_error = max(max_error, np.abs(frame.lat - path.lat).max(), np.abs(frame.lon - path.lon).max())
+
+    print(f"{len(store)} points: JSON {json_bytes / len(store):.1f} B/point, "
+          f"frames {frame_bytes / len(store):.1f} B/point ({json_bytes / frame_bytes:.1f}x smaller)")
+    print(f"Parse: JSON + to_datetime {json_time * 1000:.1f} ms, frames {frame_time * 1000:.1f} ms")
+    if max_error <= 0.5 / COORD_SCALE + 1e-12:
+        print(f"✅ Coordinates round-trip within {max_error:.1e} degrees.")
+    else:
+        print(f"❌ Coordinate error {max_error:.1e} exceeds the 1e-6 degree quantization.")
+
+    try:
+        encode_frame("gap", [27.0, 27.0], [88.0, 88.0], [0, 2 ** 31])
+        print("❌ A timestamp gap beyond int32 ms was encoded without an error.")
+    except ValueError:
+        print("✅ Timestamp gaps beyond int32 ms are rejected.")